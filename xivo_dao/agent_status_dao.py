@@ -1,10 +1,13 @@
-# Copyright 2007-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2007-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
 from datetime import datetime
 from typing import NamedTuple, Union
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import aliased
 from sqlalchemy.sql.expression import case, true, false
 from xivo_dao.alchemy.agent_login_status import AgentLoginStatus
 from xivo_dao.alchemy.agent_membership_status import AgentMembershipStatus
@@ -38,44 +41,57 @@ class _AgentStatus(NamedTuple):
 
 @daosession
 def get_status(session, agent_id, tenant_uuids=None):
-    login_status = _get_login_status_by_id(session, agent_id, tenant_uuids=tenant_uuids)
-    if not login_status:
+    row = _get_login_status_by_id(session, agent_id, tenant_uuids=tenant_uuids)
+    if not row:
         return None
 
-    return _to_agent_status(login_status, _get_queues_for_agent(session, agent_id))
+    return _to_agent_status(*row, _get_queues_for_agent(session, agent_id))
 
 
 @daosession
 def get_status_by_number(session, agent_number, tenant_uuids=None):
-    login_status = _get_login_status_by_number(
-        session, agent_number, tenant_uuids=tenant_uuids
-    )
-    if not login_status:
+    row = _get_login_status_by_number(session, agent_number, tenant_uuids=tenant_uuids)
+    if not row:
         return None
 
+    login_status, user_ids = row
     return _to_agent_status(
-        login_status, _get_queues_for_agent(session, login_status.agent_id)
+        login_status, user_ids, _get_queues_for_agent(session, login_status.agent_id)
     )
 
 
 @daosession
 def get_status_by_user(session, user_uuid, tenant_uuids=None):
-    login_status = _get_login_status_by_user(
-        session, user_uuid, tenant_uuids=tenant_uuids
-    )
-    if not login_status:
+    row = _get_login_status_by_user(session, user_uuid, tenant_uuids=tenant_uuids)
+    if not row:
         return None
 
+    login_status, user_ids = row
     return _to_agent_status(
-        login_status, _get_queues_for_agent(session, login_status.agent_id)
+        login_status, user_ids, _get_queues_for_agent(session, login_status.agent_id)
     )
 
 
-def _get_login_status_by_id(session, agent_id, tenant_uuids=None):
-    login_status = (
-        session.query(AgentLoginStatus)
+def _login_statuses_query(session):
+    '''
+    Login statuses with the ids of the users of their agent, aggregated in the
+    same query instead of lazy loading the agent and its users for each row
+    '''
+    agent_user = aliased(UserFeatures)
+    user_ids = func.array_remove(
+        func.array_agg(aggregate_order_by(agent_user.id, agent_user.id)), None
+    )
+    return (
+        session.query(AgentLoginStatus, user_ids.label('user_ids'))
         .outerjoin((AgentFeatures, AgentFeatures.id == AgentLoginStatus.agent_id))
-        .filter(AgentLoginStatus.agent_id == agent_id)
+        .outerjoin((agent_user, agent_user.agentid == AgentFeatures.id))
+        .group_by(AgentLoginStatus.agent_id)
+    )
+
+
+def _get_login_status_by_id(session, agent_id, tenant_uuids=None):
+    login_status = _login_statuses_query(session).filter(
+        AgentLoginStatus.agent_id == agent_id
     )
     if tenant_uuids is not None:
         login_status = login_status.filter(AgentFeatures.tenant_uuid.in_(tenant_uuids))
@@ -83,10 +99,8 @@ def _get_login_status_by_id(session, agent_id, tenant_uuids=None):
 
 
 def _get_login_status_by_number(session, agent_number, tenant_uuids=None):
-    login_status = (
-        session.query(AgentLoginStatus)
-        .outerjoin((AgentFeatures, AgentFeatures.id == AgentLoginStatus.agent_id))
-        .filter(AgentLoginStatus.agent_number == agent_number)
+    login_status = _login_statuses_query(session).filter(
+        AgentLoginStatus.agent_number == agent_number
     )
     if tenant_uuids is not None:
         login_status = login_status.filter(AgentFeatures.tenant_uuid.in_(tenant_uuids))
@@ -95,8 +109,7 @@ def _get_login_status_by_number(session, agent_number, tenant_uuids=None):
 
 def _get_login_status_by_user(session, user_uuid, tenant_uuids=None):
     login_status = (
-        session.query(AgentLoginStatus)
-        .outerjoin((AgentFeatures, AgentFeatures.id == AgentLoginStatus.agent_id))
+        _login_statuses_query(session)
         .join((UserFeatures, AgentFeatures.id == UserFeatures.agentid))
         .filter(UserFeatures.uuid == user_uuid)
     )
@@ -174,11 +187,11 @@ def get_statuses_for_queue(session, queue_id):
         .filter(QueueFeatures.id == queue_id)
         .filter(QueueMember.usertype == 'agent')
     )
-    query = session.query(AgentLoginStatus).filter(
+    query = _login_statuses_query(session).filter(
         AgentLoginStatus.agent_id.in_(subquery)
     )
 
-    return [_to_agent_status(q, None) for q in query]
+    return [_to_agent_status(*row, None) for row in query]
 
 
 @daosession
@@ -193,11 +206,11 @@ def get_statuses_to_add_to_queue(session, queue_id):
         AgentMembershipStatus.queue_id == queue_id
     )
     agent_ids_to_add = q1.except_(q2)
-    query = session.query(AgentLoginStatus).filter(
+    query = _login_statuses_query(session).filter(
         AgentLoginStatus.agent_id.in_(agent_ids_to_add)
     )
 
-    return [_to_agent_status(q, None) for q in query]
+    return [_to_agent_status(*row, None) for row in query]
 
 
 @daosession
@@ -212,11 +225,11 @@ def get_statuses_to_remove_from_queue(session, queue_id):
         .filter(QueueMember.usertype == 'agent')
     )
     agent_ids_to_remove = q1.except_(q2)
-    query = session.query(AgentLoginStatus).filter(
+    query = _login_statuses_query(session).filter(
         AgentLoginStatus.agent_id.in_(agent_ids_to_remove)
     )
 
-    return [_to_agent_status(q, None) for q in query]
+    return [_to_agent_status(*row, None) for row in query]
 
 
 @daosession
@@ -231,9 +244,7 @@ def get_logged_agent_ids(session, tenant_uuids=None):
     return [q.agent_id for q in query]
 
 
-def _to_agent_status(agent_login_status, queues):
-    agent = agent_login_status.agent
-    user_ids = [user.id for user in agent.users] if agent else []
+def _to_agent_status(agent_login_status, user_ids, queues):
     return _AgentStatus(
         agent_login_status.agent_id,
         agent_login_status.agent_number,
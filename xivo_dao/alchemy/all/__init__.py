@@ -1,4 +1,4 @@
-# Copyright 2016-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao.alchemy.accessfeatures import AccessFeatures
@@ -28,6 +28,7 @@ from xivo_dao.alchemy.dialpattern import DialPattern
 from xivo_dao.alchemy.endpoint_sip import EndpointSIP, EndpointSIPTemplate
 from xivo_dao.alchemy.endpoint_sip_section import EndpointSIPSection
 from xivo_dao.alchemy.endpoint_sip_section_option import EndpointSIPSectionOption
+from xivo_dao.alchemy.endpoint_sip_options import EndpointSIPOptions
 from xivo_dao.alchemy.endpoint_sip_options_view import EndpointSIPOptionsView
 from xivo_dao.alchemy.extension import Extension
 from xivo_dao.alchemy.external_app import ExternalApp
@@ -98,6 +99,7 @@ from xivo_dao.alchemy.session import Session
 from xivo_dao.alchemy.stat_agent import StatAgent
 from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
 from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
+from xivo_dao.alchemy.stat_period_checkpoint import StatPeriodCheckpoint
 from xivo_dao.alchemy.stat_queue import StatQueue
 from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
 from xivo_dao.alchemy.stat_switchboard_queue import StatSwitchboardQueue
@@ -147,6 +149,7 @@ __all__ = [
     "EndpointSIP",
     "EndpointSIPSection",
     "EndpointSIPSectionOption",
+    "EndpointSIPOptions",
     "EndpointSIPOptionsView",
     "EndpointSIPTemplate",
     "Extension",
@@ -218,6 +221,7 @@ __all__ = [
     "StatAgent",
     "StatAgentPeriodic",
     "StatCallOnQueue",
+    "StatPeriodCheckpoint",
     "StatQueue",
     "StatQueuePeriodic",
     "StatSwitchboardQueue",
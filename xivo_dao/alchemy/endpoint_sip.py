@@ -1,4 +1,4 @@
-# Copyright 2020-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2020-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
@@ -85,7 +85,7 @@ class EndpointSIP(Base):
     _options = column_property(
         select([column('options')])
         .where(column('root') == uuid)
-        .select_from(table('endpoint_sip_options_view'))
+        .select_from(table('endpoint_sip_options'))
         .as_scalar()
     )
     _aor_section = relationship(
@@ -0,0 +1,198 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from sqlalchemy import select, join, cast, literal, func, or_, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID, aggregate_order_by
+from sqlalchemy.event import listens_for
+from sqlalchemy.schema import Column, ForeignKey
+
+from xivo_dao.helpers.db_manager import Base, Session
+
+from .endpoint_sip import EndpointSIP, EndpointSIPTemplate
+from .endpoint_sip_section import EndpointSIPSection
+from .endpoint_sip_section_option import EndpointSIPSectionOption
+
+
+def options_selectable(roots=None):
+    '''
+    Options of each endpoint, merged with the options of its templates. When
+    `roots` is given, only the options of those endpoints are computed.
+    '''
+    base = select(
+        [
+            EndpointSIP.uuid.label('uuid'),
+            literal(0).label('level'),
+            literal('0', String).label('path'),
+            EndpointSIP.uuid.label('root'),
+        ]
+    )
+    if roots is not None:
+        base = base.where(EndpointSIP.uuid.in_(roots))
+    cte = base.cte(recursive=True)
+
+    endpoints = cte.union_all(
+        select(
+            [
+                EndpointSIPTemplate.parent_uuid.label('uuid'),
+                (cte.c.level + 1).label('level'),
+                (
+                    cte.c.path
+                    + cast(
+                        func.row_number().over(
+                            partition_by='level',
+                            order_by=EndpointSIPTemplate.priority,
+                        ),
+                        String,
+                    )
+                ).label('path'),
+                (cte.c.root),
+            ]
+        ).select_from(
+            join(cte, EndpointSIPTemplate, cte.c.uuid == EndpointSIPTemplate.child_uuid)
+        )
+    )
+
+    return (
+        select(
+            [
+                endpoints.c.root,
+                cast(
+                    func.jsonb_object(
+                        func.array_agg(
+                            aggregate_order_by(
+                                EndpointSIPSectionOption.key,
+                                endpoints.c.path.desc(),
+                            )
+                        ),
+                        func.array_agg(
+                            aggregate_order_by(
+                                EndpointSIPSectionOption.value,
+                                endpoints.c.path.desc(),
+                            )
+                        ),
+                    ),
+                    JSONB,
+                ).label('options'),
+            ]
+        )
+        .select_from(
+            join(
+                endpoints,
+                EndpointSIPSection,
+                EndpointSIPSection.endpoint_sip_uuid == endpoints.c.uuid,
+            ).join(
+                EndpointSIPSectionOption,
+                EndpointSIPSectionOption.endpoint_sip_section_uuid
+                == EndpointSIPSection.uuid,
+            )
+        )
+        .group_by('root')
+    )
+
+
+class EndpointSIPOptions(Base):
+    '''
+    Same content as the endpoint_sip_options_view, maintained at each flush for
+    the modified endpoints and the endpoints that inherit from them only.
+    '''
+
+    __tablename__ = 'endpoint_sip_options'
+
+    root = Column(
+        UUID(as_uuid=True),
+        ForeignKey('endpoint_sip.uuid', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    options = Column(JSONB, nullable=False)
+
+    @classmethod
+    def get_option_value(cls, option):
+        return cls.options[option].astext
+
+    @classmethod
+    def refresh(cls, session=None, roots=None):
+        '''
+        Recompute the options of `roots`, or of every endpoint when None
+        '''
+        session = session or Session()
+        table = cls.__table__
+        if roots is None:
+            session.execute(table.delete())
+        else:
+            roots = list(roots)
+            if not roots:
+                return
+            session.execute(table.delete().where(table.c.root.in_(roots)))
+        session.execute(
+            table.insert().from_select(['root', 'options'], options_selectable(roots))
+        )
+
+    @classmethod
+    def inheriting_endpoints(cls, session, endpoint_uuids=(), section_uuids=()):
+        '''
+        The given endpoints, the endpoints of the given sections and every
+        endpoint that inherits from them, directly or not
+        '''
+        seeds = []
+        if endpoint_uuids:
+            seeds.append(EndpointSIP.uuid.in_(list(endpoint_uuids)))
+        if section_uuids:
+            sections = select([EndpointSIPSection.endpoint_sip_uuid]).where(
+                EndpointSIPSection.uuid.in_(list(section_uuids))
+            )
+            seeds.append(EndpointSIP.uuid.in_(sections))
+        if not seeds:
+            return set()
+
+        cte = (
+            select([EndpointSIP.uuid.label('uuid')])
+            .where(or_(*seeds))
+            .cte(recursive=True)
+        )
+        # UNION rather than UNION ALL so that a template loop terminates
+        descendants = cte.union(
+            select([EndpointSIPTemplate.child_uuid]).where(
+                EndpointSIPTemplate.parent_uuid == cte.c.uuid
+            )
+        )
+        return {uuid for uuid, in session.execute(select([descendants.c.uuid]))}
+
+
+def _modified_endpoints(objects):
+    endpoint_uuids, section_uuids = set(), set()
+    for obj in objects:
+        if isinstance(obj, EndpointSIP):
+            endpoint_uuids.add(obj.uuid)
+        elif isinstance(obj, EndpointSIPSection):
+            endpoint_uuids.add(obj.endpoint_sip_uuid)
+        elif isinstance(obj, EndpointSIPTemplate):
+            endpoint_uuids.add(obj.child_uuid)
+        elif isinstance(obj, EndpointSIPSectionOption):
+            section_uuids.add(obj.endpoint_sip_section_uuid)
+    endpoint_uuids.discard(None)
+    section_uuids.discard(None)
+    return endpoint_uuids, section_uuids
+
+
+@listens_for(Session, 'before_flush')
+def _find_endpoints_before_flush(session, flush_context, instances):
+    # Deleting an endpoint deletes the template relations of its children in
+    # the database, so the children are found before the flush
+    objects = [obj for obj in session.dirty | session.deleted if obj not in session.new]
+    endpoint_uuids, section_uuids = _modified_endpoints(objects)
+    if endpoint_uuids or section_uuids:
+        roots = EndpointSIPOptions.inheriting_endpoints(
+            session, endpoint_uuids, section_uuids
+        )
+        session.info.setdefault('endpoint_sip_options_roots', set()).update(roots)
+
+
+@listens_for(Session, 'after_flush')
+def _refresh_endpoint_sip_options(session, flush_context):
+    roots = session.info.pop('endpoint_sip_options_roots', set())
+    objects = session.dirty | session.new | session.deleted
+    endpoint_uuids, section_uuids = _modified_endpoints(objects)
+    roots |= EndpointSIPOptions.inheriting_endpoints(
+        session, endpoint_uuids, section_uuids
+    )
+    EndpointSIPOptions.refresh(session, roots)
@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import re
@@ -27,7 +27,7 @@ from xivo_dao.helpers.exception import InputError
 from xivo_dao.helpers.db_manager import Base
 
 from .sccpline import SCCPLine
-from .endpoint_sip_options_view import EndpointSIPOptionsView
+from .endpoint_sip_options import EndpointSIPOptions
 from .context import Context
 
 
@@ -383,7 +383,7 @@ class LineFeatures(Base):
 
     @classmethod
     def _sip_query_option(cls, option, regex_filter=None):
-        attr = EndpointSIPOptionsView.get_option_value(option)
+        attr = EndpointSIPOptions.get_option_value(option)
         if regex_filter:
             attr = func.unnest(
                 func.regexp_matches(
@@ -393,7 +393,7 @@ class LineFeatures(Base):
 
         return (
             select([attr])
-            .where(EndpointSIPOptionsView.root == cls.endpoint_sip_uuid)
+            .where(EndpointSIPOptions.root == cls.endpoint_sip_uuid)
             .as_scalar()
         )
 
@@ -0,0 +1,22 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from sqlalchemy.schema import Column, PrimaryKeyConstraint
+from sqlalchemy.types import DateTime, Integer, Interval
+
+from xivo_dao.helpers.db_manager import Base
+
+
+class StatPeriodCheckpoint(Base):
+    '''
+    Number and highest id of the queue_log rows of a statistics period of a
+    given interval when its statistics were last computed
+    '''
+
+    __tablename__ = 'stat_period_checkpoint'
+    __table_args__ = (PrimaryKeyConstraint('time', 'interval'),)
+
+    time = Column(DateTime(timezone=True), nullable=False)
+    interval = Column(Interval, nullable=False)
+    queue_log_count = Column(Integer, nullable=False)
+    queue_log_max_id = Column(Integer, nullable=False)
@@ -0,0 +1,95 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from hamcrest import (
+    assert_that,
+    contains_inanyorder,
+    equal_to,
+    has_entries,
+    none,
+    not_,
+    has_key,
+)
+
+from xivo_dao.tests.test_dao import DAOTestCase
+from ..endpoint_sip_options import EndpointSIPOptions
+
+
+class TestEndpointSIPOptions(DAOTestCase):
+    def _options(self, sip):
+        row = self.session.query(EndpointSIPOptions).get(sip.uuid)
+        return row.options if row else None
+
+    def test_updated_on_flush(self):
+        sip = self.add_endpoint_sip()
+        sip.endpoint_section_options = [('key', 'value')]
+
+        self.session.flush()
+
+        assert_that(self._options(sip), has_entries(key='value'))
+
+    def test_template_change_updates_children(self):
+        template = self.add_endpoint_sip()
+        sip = self.add_endpoint_sip(templates=[template])
+        other = self.add_endpoint_sip(endpoint_section_options=[('other', 'value')])
+
+        template.endpoint_section_options = [('key', 'template')]
+        self.session.flush()
+
+        assert_that(self._options(sip), has_entries(key='template'))
+        assert_that(self._options(other), has_entries(other='value'))
+
+        template.endpoint_section_options = [('key', 'updated')]
+        self.session.flush()
+
+        assert_that(self._options(template), has_entries(key='updated'))
+        assert_that(self._options(sip), has_entries(key='updated'))
+
+    def test_option_value_updated(self):
+        sip = self.add_endpoint_sip(endpoint_section_options=[('key', 'old')])
+
+        sip._endpoint_section._options[0].value = 'new'
+        self.session.flush()
+
+        assert_that(self._options(sip), has_entries(key='new'))
+
+    def test_template_removed(self):
+        template = self.add_endpoint_sip(endpoint_section_options=[('key', 'value')])
+        sip = self.add_endpoint_sip(
+            templates=[template], endpoint_section_options=[('own', 'value')]
+        )
+
+        sip.templates = []
+        self.session.flush()
+
+        assert_that(self._options(sip), not_(has_key('key')))
+
+    def test_template_deleted(self):
+        template = self.add_endpoint_sip(endpoint_section_options=[('key', 'value')])
+        sip = self.add_endpoint_sip(templates=[template])
+
+        self.session.delete(template)
+        self.session.flush()
+
+        assert_that(self._options(sip), none())
+
+    def test_inheriting_endpoints(self):
+        template = self.add_endpoint_sip()
+        child = self.add_endpoint_sip(templates=[template])
+        grandchild = self.add_endpoint_sip(templates=[child])
+        self.add_endpoint_sip()
+
+        result = EndpointSIPOptions.inheriting_endpoints(self.session, [template.uuid])
+
+        assert_that(
+            result, contains_inanyorder(template.uuid, child.uuid, grandchild.uuid)
+        )
+
+    def test_refresh_all(self):
+        sip = self.add_endpoint_sip(endpoint_section_options=[('key', 'value')])
+        self.session.query(EndpointSIPOptions).delete()
+
+        EndpointSIPOptions.refresh(self.session)
+
+        assert_that(self._options(sip), has_entries(key='value'))
+        assert_that(sip.get_option_value('key'), equal_to('value'))
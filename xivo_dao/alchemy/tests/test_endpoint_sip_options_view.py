@@ -1,17 +1,43 @@
-# Copyright 2021-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2021-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from hamcrest import (
     assert_that,
+    contains_exactly,
+    empty,
     equal_to,
     has_entries,
 )
 
+from xivo_dao.helpers.db_views import refresh_scheduler
 from xivo_dao.tests.test_dao import DAOTestCase
 from ..endpoint_sip_options_view import EndpointSIPOptionsView
 
 
 class TestView(DAOTestCase):
+    def test_refresh_deferred_after_commit(self):
+        assert_that(EndpointSIPOptionsView.autorefresh, equal_to(True))
+        assert_that(
+            refresh_scheduler.policy_of(EndpointSIPOptionsView), equal_to('debounce')
+        )
+
+    def test_not_refreshed_at_flush(self):
+        sip = self.add_endpoint_sip()
+        sip.endpoint_section_options = [('key', 'value')]
+
+        self.session.flush()
+
+        assert_that(
+            refresh_scheduler.dirty_views(self.session),
+            contains_exactly(EndpointSIPOptionsView),
+        )
+        assert_that(
+            self.session.query(EndpointSIPOptionsView)
+            .filter(EndpointSIPOptionsView.root == sip.uuid)
+            .all(),
+            empty(),
+        )
+
     def test_refresh(self):
         sip = self.add_endpoint_sip()
         sip.endpoint_section_options = [('key', 'value')]
@@ -60,6 +86,7 @@ class TestView(DAOTestCase):
         sip.endpoint_section_options = [('first', 'value1')]
 
         self.session.flush()
+        EndpointSIPOptionsView.refresh()
 
         result = (
             self.session
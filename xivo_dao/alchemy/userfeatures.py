@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import datetime
@@ -29,6 +29,7 @@ from sqlalchemy.types import (
 )
 
 from xivo_dao.helpers.db_manager import Base
+from xivo_dao.helpers.search_document import SearchDocument
 from xivo_dao.helpers.uuid import new_uuid
 
 from . import enum
@@ -803,3 +804,17 @@ class UserFeatures(Base):
     @property
     def country(self):
         return self.tenant.country
+
+
+search_document = SearchDocument(
+    UserFeatures.firstname + " " + UserFeatures.lastname,
+    UserFeatures.callerid,
+    UserFeatures.description,
+    UserFeatures.userfield,
+    UserFeatures.email,
+    UserFeatures.mobilephonenumber,
+    UserFeatures.preprocess_subroutine,
+    UserFeatures.outcallerid,
+    UserFeatures.loginclient,
+)
+search_document.index('userfeatures__idx__search_document')
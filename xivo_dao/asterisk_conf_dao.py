@@ -1,10 +1,11 @@
-# Copyright 2013-2025 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
 from typing import NamedTuple
 from collections import defaultdict
+from uuid import UUID
 
 from sqlalchemy import bindparam
 from sqlalchemy.orm import joinedload
@@ -20,7 +21,7 @@ from sqlalchemy.ext import baked
 from sqlalchemy.types import Integer
 
 from xivo_dao.alchemy.feature_extension import FeatureExtension
-from xivo_dao.helpers.db_manager import daosession
+from xivo_dao.helpers.db_manager import read_only_daosession
 from xivo_dao.alchemy.useriax import UserIAX
 from xivo_dao.alchemy.linefeatures import LineFeatures
 from xivo_dao.alchemy.user_line import UserLine
@@ -52,6 +53,23 @@ from xivo_dao.alchemy.agentqueueskill import AgentQueueSkill
 from xivo_dao.alchemy.func_key_mapping import FuncKeyMapping
 from xivo_dao.alchemy.func_key_dest_custom import FuncKeyDestCustom
 from xivo_dao.alchemy.trunkfeatures import TrunkFeatures
+from xivo_dao.alchemy.endpoint_sip import EndpointSIP, EndpointSIPTemplate
+from xivo_dao.alchemy.endpoint_sip_section import EndpointSIPSection
+from xivo_dao.alchemy.endpoint_sip_section_option import EndpointSIPSectionOption
+from xivo_dao.alchemy.pjsip_transport import PJSIPTransport
+from xivo_dao.alchemy.pjsip_transport_option import PJSIPTransportOption
+
+STREAM_BATCH_SIZE = 1000
+
+SIP_SECTION_TYPES = (
+    'aor',
+    'auth',
+    'endpoint',
+    'identify',
+    'outbound_auth',
+    'registration',
+    'registration_outbound_auth',
+)
 
 
 class Member(NamedTuple):
@@ -61,7 +79,76 @@ class Member(NamedTuple):
     state_interface: str
 
 
-@daosession
+class _PJSIPTransport(NamedTuple):
+    uuid: UUID
+    name: str
+    options: list
+
+
+class _PJSIPEndpoint:
+    def __init__(
+        self,
+        uuid,
+        name,
+        label,
+        template,
+        asterisk_id,
+        tenant_uuid,
+        transport_uuid,
+        transport,
+    ):
+        self.uuid = uuid
+        self.name = name
+        self.label = label
+        self.template = template
+        self.asterisk_id = asterisk_id
+        self.tenant_uuid = tenant_uuid
+        self.transport_uuid = transport_uuid
+        self.transport = transport
+        self.templates = []
+        for section in SIP_SECTION_TYPES:
+            setattr(self, f'{section}_section_options', [])
+
+
+class _PJSIPVoicemail(NamedTuple):
+    number: str
+    context: str
+
+
+class _PJSIPUser(NamedTuple):
+    id: int
+    uuid: str
+    enableonlinerec: int
+    simultcalls: int
+    voicemail: _PJSIPVoicemail | None
+
+
+class _PJSIPExtension(NamedTuple):
+    exten: str
+    context: str
+
+
+class _PJSIPLine(NamedTuple):
+    id: int
+    context: str
+    application_uuid: str | None
+    endpoint_sip: _PJSIPEndpoint
+    users: list[_PJSIPUser]
+    extensions: list[_PJSIPExtension]
+
+
+class _PJSIPTrunk(NamedTuple):
+    context: str | None
+    endpoint_sip: _PJSIPEndpoint
+
+
+class _PJSIPMeeting(NamedTuple):
+    uuid: UUID
+    name: str
+    guest_endpoint_sip: _PJSIPEndpoint
+
+
+@read_only_daosession
 def find_sccp_general_settings(session):
     rows = session.query(SCCPGeneralSettings).all()
 
@@ -96,7 +183,7 @@ def find_sccp_general_settings(session):
     return res
 
 
-@daosession
+@read_only_daosession
 def find_sccp_line_settings(session):
     sccp_pickup_members = find_pickup_members('sccp')
 
@@ -195,7 +282,7 @@ def find_sccp_line_settings(session):
         yield line_config(*row)
 
 
-@daosession
+@read_only_daosession
 def find_sccp_device_settings(session):
     query = (
         session.query(
@@ -238,7 +325,7 @@ def find_sccp_device_settings(session):
     return devices
 
 
-@daosession
+@read_only_daosession
 def find_sccp_speeddial_settings(session):
     invalid_chars = '\n\r\t;'
     query = (
@@ -295,7 +382,7 @@ def find_sccp_speeddial_settings(session):
     ]
 
 
-@daosession
+@read_only_daosession
 def find_features_settings(session):
     rows = (
         session.query(
@@ -338,7 +425,7 @@ def find_features_settings(session):
     }
 
 
-@daosession
+@read_only_daosession
 def find_exten_conferences_settings(session, context_name):
     rows = (
         session.query(Extension.exten)
@@ -355,7 +442,7 @@ def find_exten_conferences_settings(session, context_name):
     return [{'exten': row[0]} for row in rows]
 
 
-@daosession
+@read_only_daosession
 def find_exten_xivofeatures_setting(session):
     rows = (
         session.query(FeatureExtension)
@@ -369,7 +456,7 @@ def find_exten_xivofeatures_setting(session):
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
 def find_extenfeatures_settings(session, features):
     query = (
         session.query(FeatureExtension)
@@ -384,6 +471,16 @@ def find_extenfeatures_settings(session, features):
     return query.all()
 
 
+exten_settings_filter = and_(
+    Extension.commented == 0,
+    Extension.typeval != '0',
+    Extension.type != 'parking',
+    or_(
+        LineExtension.line_id.is_(None),
+        LineFeatures.commented == 0,
+    ),
+)
+
 exten_settings_bakery = baked.bakery()
 exten_settings_query = exten_settings_bakery(
     lambda s: s.query(
@@ -397,23 +494,13 @@ exten_settings_query = exten_settings_bakery(
         LineFeatures,
         LineFeatures.id == LineExtension.line_id,
     )
-    .filter(
-        and_(
-            Extension.commented == 0,
-            Extension.typeval != '0',
-            Extension.type != 'parking',
-            or_(
-                LineExtension.line_id.is_(None),
-                LineFeatures.commented == 0,
-            ),
-        )
-    )
+    .filter(exten_settings_filter)
     .order_by('exten')
 )
 exten_settings_query += lambda q: q.filter(Extension.context == bindparam('context'))
 
 
-@daosession
+@read_only_daosession
 def find_exten_settings(session, context_name):
     rows = exten_settings_query(session).params(context=context_name).all()
     return [
@@ -421,13 +508,79 @@ def find_exten_settings(session, context_name):
     ]
 
 
-@daosession
+@read_only_daosession
+def stream_exten_settings(session, context_name):
+    '''
+    Same as find_exten_settings but yields the extensions as they are read from a
+    server-side cursor instead of loading them all in memory.
+    '''
+    query = _exten_settings_rows(session).filter(Extension.context == context_name)
+    for row in _stream(query.order_by(Extension.exten)):
+        yield _exten_settings_row_to_dict(row)
+
+
+@read_only_daosession
+def find_exten_settings_by_context(session, context_names=None):
+    '''
+    Batched version of find_exten_settings. Returns the extensions of all the
+    given contexts (or of every context when None) in a single query:
+
+    {context_name: [extension, ...], ...}
+    '''
+    query = _exten_settings_rows(session)
+    if context_names is not None:
+        query = query.filter(Extension.context.in_(context_names))
+
+    res = defaultdict(list)
+    for row in query.order_by(Extension.context, Extension.exten):
+        extension = _exten_settings_row_to_dict(row)
+        res[extension['context']].append(extension)
+    return res
+
+
+def _exten_settings_rows(session):
+    return (
+        session.query(*Extension.__table__.columns, Context.tenant_uuid)
+        .select_from(Extension)
+        .outerjoin(
+            LineExtension,
+            Extension.id == LineExtension.extension_id,
+        )
+        .outerjoin(
+            LineFeatures,
+            LineFeatures.id == LineExtension.line_id,
+        )
+        .outerjoin(
+            Context,
+            Context.name == Extension.context,
+        )
+        .filter(exten_settings_filter)
+    )
+
+
+def _exten_settings_row_to_dict(row):
+    extension = _columns_to_dict(Extension.__table__.columns, row[:-1])
+    extension['tenant_uuid'] = row[-1]
+    return extension
+
+
+@read_only_daosession
 def find_context_settings(session):
     rows = session.query(Context).filter(Context.commented == 0).order_by('name').all()
 
     return [row.todict() for row in rows]
 
 
+@read_only_daosession
+def stream_context_settings(session):
+    columns = Context.__table__.columns
+    query = (
+        session.query(*columns).filter(Context.commented == 0).order_by(Context.name)
+    )
+    for row in _stream(query):
+        yield _columns_to_dict(columns, row)
+
+
 context_include_bakery = baked.bakery()
 context_include_query = context_include_bakery(
     lambda s: s.query(ContextInclude).order_by('priority')
@@ -437,20 +590,57 @@ context_include_query += lambda q: q.filter(
 )
 
 
-@daosession
+@read_only_daosession
 def find_contextincludes_settings(session, context_name):
     rows = context_include_query(session).params(context=context_name).all()
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
+def find_contextincludes_settings_by_context(session, context_names=None):
+    '''
+    Batched version of find_contextincludes_settings:
+
+    {context_name: [include, ...], ...}
+    '''
+    columns = ContextInclude.__table__.columns
+    query = session.query(*columns).order_by(
+        ContextInclude.context, ContextInclude.priority
+    )
+    if context_names is not None:
+        query = query.filter(ContextInclude.context.in_(context_names))
+
+    res = defaultdict(list)
+    for row in query:
+        include = _columns_to_dict(columns, row)
+        res[include['context']].append(include)
+    return res
+
+
+@read_only_daosession
 def find_voicemail_activated(session):
     rows = session.query(Voicemail).filter(Voicemail.commented == 0).all()
 
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
+def stream_voicemail_activated(session):
+    columns = Voicemail.__table__.columns
+    query = session.query(*columns).filter(Voicemail.commented == 0)
+    for row in _stream(query):
+        yield _columns_to_dict(columns, row)
+
+
+def _stream(query):
+    return query.yield_per(STREAM_BATCH_SIZE)
+
+
+def _columns_to_dict(columns, row):
+    return {column.name: value for column, value in zip(columns, row)}
+
+
+@read_only_daosession
 def find_voicemail_general_settings(session):
     rows = session.query(StaticVoicemail).filter(StaticVoicemail.commented == 0).all()
 
@@ -816,7 +1006,30 @@ def merge_endpoints_and_template(items, Klass, endpoint_field, *args):
     return [endpoint_config.resolve() for endpoint_config in endpoint_configs]
 
 
-@daosession
+def iter_merge_endpoints_and_template(items, Klass, endpoint_field, *args):
+    '''
+    Same as merge_endpoints_and_template but resolves and yields each item as
+    soon as it is read. Only the resolvers of the templates are kept between
+    items.
+    '''
+    parents = {}
+
+    def add_parent_configurations(endpoint):
+        for parent in endpoint.templates:
+            if parent.uuid in parents:
+                continue
+            add_parent_configurations(parent)
+            parents[parent.uuid] = _SIPEndpointResolver(parent, parents)
+
+    for item in items:
+        endpoint = getattr(item, endpoint_field)
+        if endpoint.template:
+            continue
+        add_parent_configurations(endpoint)
+        yield Klass(item, parents, *args).resolve()
+
+
+@read_only_daosession
 def find_sip_meeting_guests_settings(session):
     query = (
         session.query(
@@ -861,7 +1074,7 @@ def find_sip_meeting_guests_settings(session):
     )
 
 
-@daosession
+@read_only_daosession
 def find_sip_user_settings(session):
     pickup_members = find_pickup_members('sip')
     query = (
@@ -915,7 +1128,25 @@ def find_sip_user_settings(session):
     )
 
 
-@daosession
+@read_only_daosession
+def stream_sip_user_settings(session):
+    '''
+    Same as find_sip_user_settings but yields each line as soon as it is resolved.
+
+    Endpoints and their options are read with the column-only queries of
+    find_pjsip_settings, lines are read from a server-side cursor and no ORM
+    object is created.
+    '''
+    pickup_members = find_pickup_members('sip')
+    transports = _find_pjsip_transports(session)
+    endpoints = _find_pjsip_endpoints(session, transports)
+    lines = _find_pjsip_lines(session, endpoints)
+    yield from iter_merge_endpoints_and_template(
+        lines, _EndpointSIPLineResolver, 'endpoint_sip', pickup_members
+    )
+
+
+@read_only_daosession
 def find_sip_trunk_settings(session):
     query = (
         session.query(
@@ -962,7 +1193,193 @@ def find_sip_trunk_settings(session):
     )
 
 
-@daosession
+@read_only_daosession
+def find_pjsip_settings(session):
+    '''
+    Returns the whole pjsip configuration in a fixed number of queries, whatever
+    the number of endpoints. Each table is read once and the objects are
+    assembled in Python.
+
+    {'lines': [...],           # same as find_sip_user_settings
+     'trunks': [...],          # same as find_sip_trunk_settings
+     'meeting_guests': [...],  # same as find_sip_meeting_guests_settings
+     'templates': [...],       # unresolved template endpoints
+     'transports': [{'uuid': ..., 'name': ..., 'options': [...]}, ...],
+     'pickup_members': {...},  # same as find_pickup_members('sip')
+    }
+    '''
+    pickup_members = find_pickup_members('sip')
+    transports = _find_pjsip_transports(session)
+    endpoints = _find_pjsip_endpoints(session, transports)
+    lines = _find_pjsip_lines(session, endpoints)
+
+    trunks = [
+        _PJSIPTrunk(context=row.context, endpoint_sip=endpoints[row.endpoint_sip_uuid])
+        for row in session.query(
+            TrunkFeatures.context,
+            TrunkFeatures.endpoint_sip_uuid,
+        ).filter(TrunkFeatures.endpoint_sip_uuid.isnot(None))
+    ]
+
+    meetings = [
+        _PJSIPMeeting(
+            uuid=row.uuid,
+            name=row.name,
+            guest_endpoint_sip=endpoints[row.guest_endpoint_sip_uuid],
+        )
+        for row in session.query(
+            Meeting.uuid,
+            Meeting.name,
+            Meeting.guest_endpoint_sip_uuid,
+        ).filter(Meeting.guest_endpoint_sip_uuid.isnot(None))
+    ]
+
+    return {
+        'lines': merge_endpoints_and_template(
+            lines, _EndpointSIPLineResolver, 'endpoint_sip', pickup_members
+        ),
+        'trunks': merge_endpoints_and_template(
+            trunks, _EndpointSIPTrunkResolver, 'endpoint_sip'
+        ),
+        'meeting_guests': merge_endpoints_and_template(
+            meetings, _EndpointSIPMeetingResolver, 'guest_endpoint_sip'
+        ),
+        'templates': [
+            _SIPEndpointResolver._endpoint_to_dict(endpoint)
+            for endpoint in endpoints.values()
+            if endpoint.template
+        ],
+        'transports': [transport._asdict() for transport in transports.values()],
+        'pickup_members': pickup_members,
+    }
+
+
+def _find_pjsip_transports(session):
+    transports = {
+        row.uuid: _PJSIPTransport(uuid=row.uuid, name=row.name, options=[])
+        for row in session.query(PJSIPTransport.uuid, PJSIPTransport.name)
+    }
+
+    query = session.query(
+        PJSIPTransportOption.pjsip_transport_uuid,
+        PJSIPTransportOption.key,
+        PJSIPTransportOption.value,
+    ).order_by(PJSIPTransportOption.id)
+    for row in query:
+        transports[row.pjsip_transport_uuid].options.append([row.key, row.value])
+
+    return transports
+
+
+def _find_pjsip_endpoints(session, transports):
+    query = session.query(
+        EndpointSIP.uuid,
+        EndpointSIP.name,
+        EndpointSIP.label,
+        EndpointSIP.template,
+        EndpointSIP.asterisk_id,
+        EndpointSIP.tenant_uuid,
+        EndpointSIP.transport_uuid,
+    )
+    endpoints = {
+        row.uuid: _PJSIPEndpoint(
+            transport=transports.get(row.transport_uuid), **row._asdict()
+        )
+        for row in query
+    }
+
+    query = session.query(
+        EndpointSIPSection.endpoint_sip_uuid,
+        EndpointSIPSection.type,
+        EndpointSIPSectionOption.key,
+        EndpointSIPSectionOption.value,
+    ).join(
+        EndpointSIPSectionOption,
+        EndpointSIPSectionOption.endpoint_sip_section_uuid == EndpointSIPSection.uuid,
+    )
+    for row in query:
+        options = getattr(
+            endpoints[row.endpoint_sip_uuid], f'{row.type}_section_options'
+        )
+        options.append([row.key, row.value])
+
+    query = session.query(
+        EndpointSIPTemplate.child_uuid,
+        EndpointSIPTemplate.parent_uuid,
+    ).order_by(EndpointSIPTemplate.priority)
+    for row in query:
+        endpoints[row.child_uuid].templates.append(endpoints[row.parent_uuid])
+
+    return endpoints
+
+
+def _find_pjsip_lines(session, endpoints):
+    users = defaultdict(list)
+    query = (
+        session.query(
+            UserLine.line_id,
+            UserFeatures.id,
+            UserFeatures.uuid,
+            UserFeatures.enableonlinerec,
+            UserFeatures.simultcalls,
+            Voicemail.mailbox,
+            Voicemail.context,
+        )
+        .join(UserFeatures, UserFeatures.id == UserLine.user_id)
+        .join(LineFeatures, LineFeatures.id == UserLine.line_id)
+        .outerjoin(Voicemail, Voicemail.uniqueid == UserFeatures.voicemailid)
+        .filter(LineFeatures.endpoint_sip_uuid.isnot(None))
+        .order_by(UserLine.main_user.desc())
+    )
+    for row in query:
+        voicemail = None
+        if row.mailbox is not None:
+            voicemail = _PJSIPVoicemail(number=row.mailbox, context=row.context)
+        users[row.line_id].append(
+            _PJSIPUser(
+                id=row.id,
+                uuid=row.uuid,
+                enableonlinerec=row.enableonlinerec,
+                simultcalls=row.simultcalls,
+                voicemail=voicemail,
+            )
+        )
+
+    extensions = defaultdict(list)
+    query = (
+        session.query(
+            LineExtension.line_id,
+            Extension.exten,
+            Extension.context,
+        )
+        .join(Extension, Extension.id == LineExtension.extension_id)
+        .join(LineFeatures, LineFeatures.id == LineExtension.line_id)
+        .filter(LineFeatures.endpoint_sip_uuid.isnot(None))
+        .order_by(LineExtension.main_extension.desc())
+    )
+    for row in query:
+        extensions[row.line_id].append(
+            _PJSIPExtension(exten=row.exten, context=row.context)
+        )
+
+    query = session.query(
+        LineFeatures.id,
+        LineFeatures.context,
+        LineFeatures.application_uuid,
+        LineFeatures.endpoint_sip_uuid,
+    ).filter(LineFeatures.endpoint_sip_uuid.isnot(None))
+    for row in _stream(query):
+        yield _PJSIPLine(
+            id=row.id,
+            context=row.context,
+            application_uuid=row.application_uuid,
+            endpoint_sip=endpoints[row.endpoint_sip_uuid],
+            users=users.pop(row.id, []),
+            extensions=extensions.pop(row.id, []),
+        )
+
+
+@read_only_daosession
 def find_pickup_members(session, protocol):
     '''
     Returns a map:
@@ -1085,7 +1502,7 @@ def find_pickup_members(session, protocol):
     return res
 
 
-@daosession
+@read_only_daosession
 def find_iax_general_settings(session):
     rows = session.query(StaticIAX).filter(StaticIAX.commented == 0).all()
 
@@ -1101,7 +1518,7 @@ def find_iax_general_settings(session):
     return res
 
 
-@daosession
+@read_only_daosession
 def find_iax_trunk_settings(session):
     rows = (
         session.query(UserIAX)
@@ -1117,14 +1534,14 @@ def find_iax_trunk_settings(session):
     return rows
 
 
-@daosession
+@read_only_daosession
 def find_iax_calllimits_settings(session):
     rows = session.query(IAXCallNumberLimits).all()
 
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
 def find_queue_general_settings(session):
     rows = (
         session.query(StaticQueue)
@@ -1140,7 +1557,7 @@ def find_queue_general_settings(session):
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
 def find_queue_settings(session):
     rows = (
         session.query(Queue)
@@ -1158,14 +1575,14 @@ def find_queue_settings(session):
     return result
 
 
-@daosession
+@read_only_daosession
 def find_queue_skillrule_settings(session):
     rows = session.query(QueueSkillRule).all()
 
     return [row.todict() for row in rows]
 
 
-@daosession
+@read_only_daosession
 def find_queue_members_settings(session, queue_name):
     user_members = (
         session.query(
@@ -1210,7 +1627,7 @@ def find_queue_members_settings(session, queue_name):
     return res
 
 
-@daosession
+@read_only_daosession
 def find_agent_queue_skills_settings(session):
     rows = (
         session.query(
@@ -0,0 +1,26 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from xivo_dao.alchemy.endpoint_sip_options import EndpointSIPOptions
+from xivo_dao.helpers.db_manager import daosession, init_db_from_config
+from xivo_dao.helpers.db_utils import session_scope
+
+
+@daosession
+def backfill(session):
+    '''
+    Compute the options of every SIP endpoint in the endpoint_sip_options
+    table. Run it once after the migration that creates the table: endpoints
+    and lines have no SIP options until it is filled.
+    '''
+    EndpointSIPOptions.refresh(session)
+
+
+def main():
+    init_db_from_config()
+    with session_scope():
+        backfill()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,35 @@
-# Copyright 2022-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2022-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from datetime import datetime, timezone
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
 
 
 def utcnow_with_tzinfo() -> datetime:
     return datetime.now(timezone.utc)
+
+
+def split_by_period(
+    begin: datetime,
+    end: datetime,
+    start: datetime,
+    periods_end: datetime,
+    interval: timedelta,
+) -> Iterator[tuple[datetime, timedelta]]:
+    '''
+    Time spent in [begin, end] during each period between start and
+    periods_end, the period of a time being found by its offset from start: a
+    time on the boundary of two periods belongs to the later one
+    '''
+    begin = begin if begin > start else start
+    end = end if end < periods_end else periods_end
+    if begin >= end:
+        return
+
+    period = start + (begin - start) // interval * interval
+    while period < end:
+        next_period = period + interval
+        period_begin = begin if begin > period else period
+        period_end = end if end < next_period else next_period
+        yield period, period_end - period_begin
+        period = next_period
@@ -1,9 +1,18 @@
-# Copyright 2015-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import io
+import itertools
+import time
+
 from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import func, select
+
 from xivo_dao.helpers import db_manager
 from xivo_dao.helpers.db_manager import daosession
+from xivo_dao.helpers.instrumentation import dao_instrumentation
 
 
 @contextmanager
@@ -24,6 +33,8 @@ def get_dao_session(session):
 @contextmanager
 def session_scope(read_only=False):
     session = db_manager.Session()
+    if read_only:
+        session.info['read_only'] = True
     try:
         yield session
         if not read_only:
@@ -33,3 +44,80 @@ def session_scope(read_only=False):
         raise
     finally:
         db_manager.Session.remove()
+
+
+def next_ids(session, column, count):
+    '''
+    Reserve `count` values of the sequence of a serial column in one query.
+
+    Objects that already have their primary key are inserted with executemany
+    by the flush instead of one INSERT ... RETURNING per object.
+    '''
+    if count <= 0:
+        return []
+    sequence = func.pg_get_serial_sequence(column.table.name, column.name)
+    query = select([func.nextval(sequence)]).select_from(func.generate_series(1, count))
+    return [id_ for id_, in session.execute(query)]
+
+
+COPY_BATCH_SIZE = 10000
+
+
+def copy_rows(session, table, columns, rows, batch_size=COPY_BATCH_SIZE):
+    '''
+    Insert `rows`, tuples of values of `columns`, without the ORM.
+
+    With psycopg2, the rows are sent with COPY FROM, otherwise with an
+    executemany INSERT. `rows` may be any iterable: it is consumed by batches of
+    `batch_size` rows.
+
+    COPY is run on the DBAPI cursor, out of sight of the session and engine
+    events: the session is marked as having written and each batch is recorded
+    in the DAO instrumentation here.
+    '''
+    session.flush()
+    connection = session.connection()
+    if connection.dialect.driver == 'psycopg2':
+        session.info['has_writes'] = True
+        preparer = connection.dialect.identifier_preparer
+        statement = 'COPY {} ({}) FROM STDIN'.format(
+            preparer.format_table(table),
+            ', '.join(preparer.quote(column) for column in columns),
+        )
+        with connection.connection.cursor() as cursor:
+            for batch in _batches(rows, batch_size):
+                lines = (
+                    '\t'.join(_copy_value(value) for value in row) for row in batch
+                )
+                start = time.perf_counter()
+                cursor.copy_expert(statement, io.StringIO('\n'.join(lines) + '\n'))
+                dao_instrumentation.add_statement(
+                    statement, cursor.rowcount, time.perf_counter() - start
+                )
+    else:
+        for batch in _batches(rows, batch_size):
+            session.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
+def _copy_value(value):
+    # Text format of COPY: NULL is \N and backslashes, tabs and newlines are
+    # escaped
+    if value is None:
+        return '\\N'
+    if isinstance(value, timedelta):
+        return f'{value.total_seconds()} seconds'
+    if isinstance(value, date):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
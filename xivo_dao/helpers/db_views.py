@@ -1,18 +1,25 @@
-# Copyright 2021-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2021-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import logging
+import threading
+from collections import defaultdict
 from collections.abc import Callable
+from contextlib import contextmanager
 
 from sqlalchemy import Table, text
 from sqlalchemy.event import listens_for, contains
 from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm.session import SessionTransaction
 from sqlalchemy.orm.unitofwork import UOWTransaction
 from sqlalchemy_utils.view import refresh_materialized_view
 
 from .db_manager import Base, Session
 
+logger = logging.getLogger(__name__)
+
 
 class MaterializedView(Base):
     """
@@ -27,6 +34,8 @@ class MaterializedView(Base):
 
     __abstract__ = True
     __view_dependencies__: tuple[type[Base], ...] = tuple()
+    # refresh policy of the view, the policy of refresh_scheduler when None
+    __refresh_policy__: str | None = None
     _view_dependencies_handler: Callable[[Session, str, bool], None] | None
 
     def __init_subclass__(cls) -> None:
@@ -34,27 +43,24 @@ class MaterializedView(Base):
             raise InvalidRequestError(
                 f"Class '{cls}' '__table__' attribute must be created with 'create_materialized_view'"
             )
+        if cls.__refresh_policy__ not in (None, *RefreshScheduler.POLICIES):
+            raise InvalidRequestError(
+                f"Class '{cls}' has an unknown refresh policy: {cls.__refresh_policy__}"
+            )
         super().__init_subclass__()
 
         if targets := cls.__view_dependencies__:
 
             @listens_for(Session, 'after_flush')
-            def _before_session_commit_handler(
+            def _after_flush_handler(
                 session: Session, flush_context: UOWTransaction
             ) -> None:
                 for obj in session.dirty | session.new | session.deleted:
                     if isinstance(obj, targets):
-                        # Cannot call `refresh_materialized_view` as it will try to flush again.
-                        session.execute(
-                            text(
-                                f'REFRESH MATERIALIZED VIEW CONCURRENTLY {cls.__table__.fullname}'
-                            )
-                        )
+                        refresh_scheduler.mark_dirty(session, cls)
                         return
 
-            cls._view_dependencies_handler = staticmethod(
-                _before_session_commit_handler
-            )
+            cls._view_dependencies_handler = staticmethod(_after_flush_handler)
         else:
             cls._view_dependencies_handler = None
 
@@ -68,3 +74,183 @@ class MaterializedView(Base):
     @classmethod
     def refresh(cls, concurrently: bool = True) -> None:
         refresh_materialized_view(Session(), cls.__table__.fullname, concurrently)
+
+    @classmethod
+    def refresh_statement(cls) -> str:
+        return f'REFRESH MATERIALIZED VIEW CONCURRENTLY {cls.__table__.fullname}'
+
+
+class RefreshScheduler:
+    """
+    Decides when the materialized views modified by a flush are refreshed
+
+    Policies:
+
+    - flush: refresh after each flush that modifies a view dependency
+    - commit: mark the view dirty and refresh it once, before the commit
+    - debounce: refresh in a new session `delay` seconds after the commit,
+      coalescing the commits made in the meantime
+    - manual: only refresh when `refresh_dirty` is called. The dirty views are
+      kept by the scheduler, across transactions, until then
+
+    A view may set its own policy in `__refresh_policy__`.
+    """
+
+    POLICIES = ('flush', 'commit', 'debounce', 'manual')
+
+    def __init__(self, policy: str = 'flush', delay: float = 1.0) -> None:
+        self.policy = policy
+        self.delay = delay
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: set[type[MaterializedView]] = set()
+        self._manual: set[type[MaterializedView]] = set()
+        self._timer: threading.Timer | None = None
+
+    def configure(self, policy: str | None = None, delay: float | None = None) -> None:
+        if policy is not None:
+            if policy not in self.POLICIES:
+                raise ValueError(f'Unknown materialized view refresh policy: {policy}')
+            self.policy = policy
+        if delay is not None:
+            self.delay = delay
+
+    @property
+    def suspended(self) -> bool:
+        return getattr(self._local, 'suspended', 0) > 0
+
+    @contextmanager
+    def suspend(self):
+        """
+        Do not refresh any view in this block, e.g. during a bulk import
+
+        Views modified in the block stay dirty even when the block commits.
+        They are refreshed when the block exits, as prescribed by their policy:
+        right away for 'flush', at the next commit for 'commit', after the
+        delay for 'debounce' and by `refresh_dirty` for 'manual'.
+        """
+        self._local.suspended = getattr(self._local, 'suspended', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.suspended -= 1
+            if not self.suspended:
+                self._resume()
+
+    def _suspended_views(self) -> set[type[MaterializedView]]:
+        if not hasattr(self._local, 'views'):
+            self._local.views = set()
+        return self._local.views
+
+    def policy_of(self, view: type[MaterializedView]) -> str:
+        return getattr(view, '__refresh_policy__', None) or self.policy
+
+    def _resume(self) -> None:
+        views, self._local.views = self._suspended_views(), set()
+        by_policy = defaultdict(set)
+        for view in views:
+            by_policy[self.policy_of(view)].add(view)
+
+        if by_policy['debounce']:
+            self._schedule(by_policy['debounce'])
+        with self._lock:
+            self._manual.update(by_policy['manual'])
+        if by_policy['commit'] or by_policy['flush']:
+            session = Session()
+            session.info.setdefault('dirty_views', set()).update(by_policy['commit'])
+            if by_policy['flush']:
+                session.flush()
+                self._refresh(session, by_policy['flush'])
+
+    def mark_dirty(self, session: Session, view: type[MaterializedView]) -> None:
+        if self.suspended:
+            self._suspended_views().add(view)
+            return
+        policy = self.policy_of(view)
+        if policy == 'flush':
+            # Cannot call `refresh_materialized_view` as it will try to flush again.
+            session.execute(text(view.refresh_statement()))
+            return
+        if policy == 'manual':
+            with self._lock:
+                self._manual.add(view)
+            return
+        session.info.setdefault('dirty_views', set()).add(view)
+
+    def dirty_views(self, session: Session) -> set[type[MaterializedView]]:
+        with self._lock:
+            return set(session.info.get('dirty_views', ())) | self._manual
+
+    def refresh_dirty(self, session: Session) -> None:
+        session.flush()
+        views = session.info.pop('dirty_views', set())
+        with self._lock:
+            views |= self._manual
+            self._manual = set()
+        self._refresh(session, views)
+
+    def _refresh(self, session: Session, views: set[type[MaterializedView]]) -> None:
+        for view in sorted(views, key=lambda view: view.__table__.fullname):
+            session.execute(text(view.refresh_statement()))
+
+    def _before_commit(self, session: Session) -> None:
+        if self.suspended:
+            # keep the views dirty after the end of the transaction
+            self._suspended_views().update(session.info.pop('dirty_views', ()))
+            return
+        # flush now to know which views are modified by the commit
+        session.flush()
+        views = session.info.get('dirty_views', set())
+        if committed := {view for view in views if self.policy_of(view) == 'commit'}:
+            views -= committed
+            self._refresh(session, committed)
+
+    def _after_commit(self, session: Session) -> None:
+        if self.suspended:
+            return
+        # only the debounced views are left dirty after _before_commit
+        if views := session.info.pop('dirty_views', None):
+            self._schedule(views)
+
+    def _schedule(self, views: set[type[MaterializedView]]) -> None:
+        with self._lock:
+            self._pending.update(views)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._refresh_pending)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _refresh_pending(self) -> None:
+        with self._lock:
+            views, self._pending = self._pending, set()
+            self._timer = None
+
+        session = Session()
+        try:
+            for view in sorted(views, key=lambda view: view.__table__.fullname):
+                session.execute(text(view.refresh_statement()))
+            session.commit()
+        except Exception:
+            logger.exception('Failed to refresh materialized views')
+            session.rollback()
+        finally:
+            Session.remove()
+
+
+refresh_scheduler = RefreshScheduler()
+
+
+@listens_for(Session, 'before_commit')
+def _refresh_dirty_views_before_commit(session: Session) -> None:
+    refresh_scheduler._before_commit(session)
+
+
+@listens_for(Session, 'after_commit')
+def _refresh_dirty_views_after_commit(session: Session) -> None:
+    refresh_scheduler._after_commit(session)
+
+
+@listens_for(Session, 'after_transaction_end')
+def _forget_dirty_views(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop('dirty_views', None)
@@ -0,0 +1,234 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+
+class CallStats:
+    def __init__(self, name):
+        self.name = name
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.python_time = 0.0
+        self.duration = 0.0
+        self.n_plus_one = None
+        self._statement_counts = Counter()
+
+    def add_statement(self, statement, rows, elapsed):
+        self.statements += 1
+        self.rows += rows
+        self.db_time += elapsed
+        self._statement_counts[statement] += 1
+
+    def finish(self, duration, n_plus_one_threshold):
+        self.duration = duration
+        self.python_time = max(duration - self.db_time, 0.0)
+        for statement, count in self._statement_counts.most_common(1):
+            if count > n_plus_one_threshold:
+                self.n_plus_one = (statement, count)
+
+
+class Instrumentation:
+    '''
+    Records, for each DAO function call, the number of SQL statements, the
+    number of rows returned, the time spent in the database and the time spent
+    in Python, and hands the result to the configured sinks.
+
+    Statements are attributed to every instrumented call in progress in the
+    current thread, so the stats of a DAO function include those of the DAO
+    functions it calls. A call is flagged as a possible N+1 when it executes the
+    same statement more than `n_plus_one_threshold` times.
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self.sinks = []
+        self.n_plus_one_threshold = DEFAULT_N_PLUS_ONE_THRESHOLD
+        self._local = threading.local()
+
+    def enable(self, sinks=None, n_plus_one_threshold=DEFAULT_N_PLUS_ONE_THRESHOLD):
+        if not self.enabled:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+        self.sinks = list(sinks) if sinks is not None else [LoggingSink()]
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.enabled = True
+
+    def disable(self):
+        if self.enabled:
+            event.remove(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.remove(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.remove(Engine, 'handle_error', self._handle_error)
+        self.enabled = False
+
+    @contextmanager
+    def record(self, name):
+        if not self.enabled:
+            yield None
+            return
+
+        stats = CallStats(name)
+        stack = self._calls()
+        stack.append(stats)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stack.remove(stats)
+            stats.finish(time.perf_counter() - start, self.n_plus_one_threshold)
+            for sink in self.sinks:
+                try:
+                    sink.record(stats)
+                except Exception:
+                    logger.exception('Failed to record the stats of %s', name)
+
+    def _calls(self):
+        calls = getattr(self._local, 'calls', None)
+        if calls is None:
+            calls = self._local.calls = []
+        return calls
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        starts = conn.info.get('instrumentation_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        self.add_statement(statement, cursor.rowcount, elapsed)
+
+    def add_statement(self, statement, rows, elapsed):
+        '''
+        Attributes a statement to the calls in progress. Used for the statements
+        that are not sent through the engine, e.g. a COPY on the DBAPI cursor.
+        '''
+        if not self.enabled:
+            return
+        for stats in self._calls():
+            stats.add_statement(statement, max(rows, 0), elapsed)
+
+    def _handle_error(self, context):
+        # after_cursor_execute is not called when the statement fails
+        if context.connection is None:
+            return
+        starts = context.connection.info.get('instrumentation_start')
+        if starts:
+            starts.pop()
+
+
+class LoggingSink:
+    def __init__(self, logger=logger, level=logging.DEBUG):
+        self._logger = logger
+        self._level = level
+
+    def record(self, stats):
+        self._logger.log(
+            self._level,
+            '%s: %s statements, %s rows, db %.6fs, python %.6fs',
+            stats.name,
+            stats.statements,
+            stats.rows,
+            stats.db_time,
+            stats.python_time,
+        )
+        if stats.n_plus_one:
+            statement, count = stats.n_plus_one
+            self._logger.warning(
+                '%s: possible N+1, same statement executed %s times: %s',
+                stats.name,
+                count,
+                statement,
+            )
+
+
+class CounterSink:
+    '''
+    Monotonic counters per DAO function, in the spirit of Prometheus counters.
+    '''
+
+    METRICS = (
+        'calls',
+        'statements',
+        'rows',
+        'db_seconds',
+        'python_seconds',
+        'n_plus_one',
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(lambda: dict.fromkeys(self.METRICS, 0))
+
+    def record(self, stats):
+        with self._lock:
+            counters = self.counters[stats.name]
+            counters['calls'] += 1
+            counters['statements'] += stats.statements
+            counters['rows'] += stats.rows
+            counters['db_seconds'] += stats.db_time
+            counters['python_seconds'] += stats.python_time
+            if stats.n_plus_one:
+                counters['n_plus_one'] += 1
+
+    def samples(self, prefix='xivo_dao'):
+        with self._lock:
+            for name, counters in sorted(self.counters.items()):
+                for metric in self.METRICS:
+                    yield f'{prefix}_{metric}_total{{function="{name}"}} {counters[metric]}'
+
+
+class HistogramSink:
+    '''
+    In-memory histogram of the duration of each DAO function, in seconds.
+    '''
+
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+
+    def record(self, stats):
+        index = bisect_left(self.buckets, stats.duration)
+        with self._lock:
+            self._counts[stats.name][index] += 1
+
+    def histogram(self, name):
+        '''
+        Returns the cumulative count of calls for each upper bound, the last one
+        being infinity
+        '''
+        with self._lock:
+            counts = list(self._counts.get(name, [0] * (len(self.buckets) + 1)))
+
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+dao_instrumentation = Instrumentation()
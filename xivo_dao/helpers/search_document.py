@@ -0,0 +1,118 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.schema import DDL, Index
+from sqlalchemy.sql import false, func, select
+from sqlalchemy.sql.functions import ReturnTypeFromArgs
+
+from xivo_dao.helpers.db_manager import Base
+
+# unaccent() is only STABLE, so it cannot be used in an index expression
+CREATE_IMMUTABLE_UNACCENT = DDL(
+    '''
+    CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT unaccent('unaccent'::regdictionary, $1) $$
+    '''
+)
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    CREATE_IMMUTABLE_UNACCENT.execute_if(dialect='postgresql'),
+)
+
+# Unit separator: a search term cannot match across two expressions
+SEPARATOR = '\x1f'
+
+
+class immutable_unaccent(ReturnTypeFromArgs):
+    pass
+
+
+class SearchDocument:
+    '''
+    Unaccented concatenation of the search expressions of a table. The document
+    is indexed with a pg_trgm GIN index so that `%term%` searches do not scan the
+    whole table.
+
+    The expressions must be the search columns of the SearchConfig using the
+    document, e.g. `firstname + ' ' + lastname` for a fullname search column.
+    '''
+
+    def __init__(self, *expressions):
+        self.expressions = [_clause(expression) for expression in expressions]
+        self._keys = {_sql(expression) for expression in self.expressions}
+        self.index_name = None
+        self._available = weakref.WeakKeyDictionary()
+
+    @property
+    def expression(self):
+        document = None
+        for expression in self.expressions:
+            value = func.coalesce(expression, '')
+            document = value if document is None else document + SEPARATOR + value
+        return immutable_unaccent(document)
+
+    def index(self, name):
+        self.index_name = name
+        expression = self.expression.label('search_document')
+        return Index(
+            name,
+            expression,
+            postgresql_using='gin',
+            postgresql_ops={'search_document': 'gin_trgm_ops'},
+        )
+
+    def match(self, term):
+        if SEPARATOR in term:
+            return false()
+        return self.expression.ilike(f'%{term}%')
+
+    def covers(self, column):
+        return _sql(column) in self._keys
+
+    def extra_expressions(self, columns):
+        '''
+        Expressions of the document that are not among `columns`
+        '''
+        keys = {_sql(column) for column in columns}
+        return [
+            expression
+            for expression in self.expressions
+            if _sql(expression) not in keys
+        ]
+
+    def is_available(self, session):
+        '''
+        Whether the index of the document exists. Databases where it was not
+        created yet keep the column by column search. The check is made once
+        per engine.
+        '''
+        if self.index_name is None:
+            return False
+
+        engine = session.get_bind().engine
+        if engine.dialect.name != 'postgresql':
+            return False
+
+        available = self._available.get(engine)
+        if available is None:
+            query = select([func.to_regclass(self.index_name)])
+            available = session.execute(query).scalar() is not None
+            self._available[engine] = available
+        return available
+
+
+def _clause(expression):
+    clause_element = getattr(expression, '__clause_element__', None)
+    return clause_element() if clause_element else expression
+
+
+def _sql(expression):
+    # Expressions built separately are equal when they render the same SQL
+    compiled = _clause(expression).compile(compile_kwargs={'literal_binds': True})
+    return str(compiled)
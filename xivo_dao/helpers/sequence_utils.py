@@ -1,7 +1,7 @@
-# Copyright 2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2024-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from typing import TypeVar
 
 T = TypeVar('T')
@@ -19,3 +19,8 @@ def split_by(seq: Iterable[T], pred: Predicate[T]) -> tuple[list[T], list[T]]:
             rejected.append(x)
 
     return approved, rejected
+
+
+def chunks(seq: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    for start in range(0, len(seq), size):
+        yield seq[start : start + size]
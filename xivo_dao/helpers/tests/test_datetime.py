@@ -0,0 +1,49 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from datetime import datetime, timedelta, timezone
+
+from xivo_dao.helpers.datetime import split_by_period
+
+START = datetime(2012, 10, 1, 6, tzinfo=timezone.utc)
+PERIODS_END = datetime(2012, 10, 1, 8, tzinfo=timezone.utc)
+ONE_HOUR = timedelta(hours=1)
+
+
+def at(hour, minute=0, second=0):
+    return datetime(2012, 10, 1, hour, minute, second, tzinfo=timezone.utc)
+
+
+class TestSplitByPeriod(unittest.TestCase):
+    def split(self, begin, end):
+        return list(split_by_period(begin, end, START, PERIODS_END, ONE_HOUR))
+
+    def test_split_by_period(self):
+        self.assertEqual(
+            self.split(at(6, 59, 30), at(7, 0, 30)),
+            [(at(6), timedelta(seconds=30)), (at(7), timedelta(seconds=30))],
+        )
+
+    def test_split_by_period_beginning_on_a_boundary(self):
+        self.assertEqual(
+            self.split(at(7), at(7, 0, 30)),
+            [(at(7), timedelta(seconds=30))],
+        )
+
+    def test_split_by_period_ending_on_a_boundary(self):
+        self.assertEqual(
+            self.split(at(6, 59, 30), at(7)),
+            [(at(6), timedelta(seconds=30))],
+        )
+
+    def test_split_by_period_clipped_to_the_periods(self):
+        self.assertEqual(
+            self.split(at(5, 59, 30), at(8, 0, 30)),
+            [(at(6), ONE_HOUR), (at(7), ONE_HOUR)],
+        )
+
+    def test_split_by_period_outside_the_periods(self):
+        self.assertEqual(self.split(at(5, 59), at(6)), [])
+        self.assertEqual(self.split(at(8), at(8, 1)), [])
@@ -0,0 +1,297 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from unittest.mock import Mock, patch
+from hamcrest import (
+    assert_that,
+    calling,
+    equal_to,
+    has_entries,
+    not_,
+    has_key,
+    raises,
+)
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, text
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+
+from xivo_dao.helpers import db_manager
+from xivo_dao.helpers.db_manager import (
+    PoolMetrics,
+    ReplicaRouter,
+    RoutingSession,
+    engine_options,
+    read_only,
+    read_only_daosession,
+)
+
+
+class TestEngineOptions(unittest.TestCase):
+    def test_default_profile(self):
+        options = engine_options()
+
+        assert_that(
+            options,
+            equal_to(
+                {
+                    'poolclass': QueuePool,
+                    'pool_size': db_manager.DEFAULT_POOL_SIZE,
+                    'max_overflow': 10,
+                    'pool_timeout': 30,
+                    'pool_recycle': -1,
+                    'pool_pre_ping': True,
+                }
+            ),
+        )
+
+    def test_overrides(self):
+        options = engine_options('batch-stats', pool_size=4, pool_pre_ping=False)
+
+        assert_that(
+            options,
+            has_entries(
+                poolclass=QueuePool,
+                pool_size=4,
+                max_overflow=0,
+                pool_pre_ping=False,
+            ),
+        )
+
+    def test_null_pool_ignores_queue_pool_options(self):
+        options = engine_options('api', poolclass='null', pool_size=32)
+
+        assert_that(options, has_entries(poolclass=NullPool))
+        assert_that(options, not_(has_key('pool_size')))
+        assert_that(options, not_(has_key('max_overflow')))
+        assert_that(options, not_(has_key('pool_timeout')))
+
+    def test_statement_timeout(self):
+        options = engine_options('cli', statement_timeout=5000)
+
+        assert_that(
+            options,
+            has_entries(
+                connect_args={'options': '-c statement_timeout=5000'},
+            ),
+        )
+
+    def test_unknown_profile(self):
+        assert_that(calling(engine_options).with_args('unknown'), raises(ValueError))
+
+    def test_unknown_pool_class(self):
+        assert_that(
+            calling(engine_options).with_args('api', poolclass='unknown'),
+            raises(ValueError),
+        )
+
+
+@patch('xivo_dao.helpers.db_manager.init_db')
+class TestInitDBFromConfig(unittest.TestCase):
+    def test_pool_size_from_max_threads(self, init_db):
+        config = {'db_uri': 'postgresql://', 'rest_api': {'max_threads': 42}}
+
+        db_manager.init_db_from_config(config)
+
+        init_db.assert_called_once_with('postgresql://', profile='api', pool_size=42)
+
+    def test_engine_profile(self, init_db):
+        config = {
+            'db_uri': 'postgresql://',
+            'rest_api': {'max_threads': 42},
+            'db_engine': {'profile': 'batch-stats', 'pool_size': 3, 'pool_timeout': 5},
+        }
+
+        db_manager.init_db_from_config(config)
+
+        init_db.assert_called_once_with(
+            'postgresql://', profile='batch-stats', pool_size=3, pool_timeout=5
+        )
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def test_snapshot(self):
+        engine = create_engine('sqlite://', poolclass=QueuePool, pool_size=2)
+        metrics = PoolMetrics()
+        metrics.watch(engine)
+
+        with engine.connect():
+            assert_that(
+                metrics.snapshot(),
+                has_entries(
+                    connects=1,
+                    checkouts=1,
+                    checkins=0,
+                    size=2,
+                    checked_out=1,
+                    overflow=0,
+                ),
+            )
+
+        assert_that(
+            metrics.snapshot(),
+            has_entries(checkouts=1, checkins=1, checked_in=1, checked_out=0),
+        )
+
+
+class TestRoutingSession(unittest.TestCase):
+    def setUp(self):
+        self.primary = create_engine('sqlite://')
+        self.replica = ReplicaRouter(create_engine('sqlite://'))
+        self.session = sessionmaker(
+            class_=RoutingSession, bind=self.primary, info={'replica': self.replica}
+        )()
+
+    def tearDown(self):
+        self.session.close()
+
+    def _create_table(self):
+        table = Table('item', MetaData(), Column('id', Integer, primary_key=True))
+        table.create(self.primary)
+        return table
+
+    def test_default_to_primary(self):
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_read_only_uses_replica(self):
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.replica.engine))
+
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_read_only_after_write_uses_primary(self):
+        self.session.info['has_writes'] = True
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_writes_are_forgotten_at_the_end_of_the_transaction(self):
+        self.session.info['has_writes'] = True
+        self.session.rollback()
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.replica.engine))
+
+    def test_executed_insert_uses_primary(self):
+        table = self._create_table()
+
+        self.session.execute(table.insert(), {'id': 1})
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_executed_text_write_uses_primary(self):
+        self._create_table()
+
+        self.session.execute(text('DELETE FROM item'))
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_executed_select_uses_replica(self):
+        table = self._create_table()
+
+        self.session.execute(table.select())
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.replica.engine))
+
+    def test_bulk_update_uses_primary(self):
+        Item = type(
+            'Item',
+            (declarative_base(),),
+            {'__tablename__': 'item', 'id': Column(Integer, primary_key=True)},
+        )
+        Item.__table__.create(self.primary)
+
+        self.session.query(Item).update({'id': 2})
+
+        with read_only(self.session):
+            assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_without_replica(self):
+        session = sessionmaker(class_=RoutingSession, bind=self.primary)()
+
+        with read_only(session):
+            assert_that(session.get_bind(), equal_to(self.primary))
+
+
+class TestReadOnlyDaosession(unittest.TestCase):
+    def setUp(self):
+        self.primary = create_engine('sqlite://')
+        self.replica = ReplicaRouter(create_engine('sqlite://'))
+        self.session = sessionmaker(
+            class_=RoutingSession, bind=self.primary, info={'replica': self.replica}
+        )()
+        patcher = patch.object(db_manager, 'Session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_function(self):
+        @read_only_daosession
+        def find(session):
+            return session.get_bind()
+
+        assert_that(find(), equal_to(self.replica.engine))
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+
+    def test_generator_is_read_only_while_running(self):
+        @read_only_daosession
+        def iter_binds(session):
+            for _ in range(2):
+                yield session.get_bind()
+
+        binds = iter_binds()
+
+        assert_that(next(binds), equal_to(self.replica.engine))
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+        assert_that(next(binds), equal_to(self.replica.engine))
+
+    def test_interleaved_generators(self):
+        @read_only_daosession
+        def iter_binds(session):
+            for _ in range(2):
+                yield session.get_bind()
+
+        first, second = iter_binds(), iter_binds()
+        next(first)
+        next(second)
+        next(first)
+        list(first)
+
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+        assert_that(next(second), equal_to(self.replica.engine))
+        assert_that(self.session.get_bind(), equal_to(self.primary))
+
+
+class TestReplicaRouter(unittest.TestCase):
+    def test_no_max_lag(self):
+        router = ReplicaRouter(Mock())
+
+        assert_that(router.is_usable(), equal_to(True))
+
+    def test_lag_under_max_lag(self):
+        router = ReplicaRouter(Mock(), max_lag=5)
+
+        with patch.object(router, '_lag', return_value=2):
+            assert_that(router.is_usable(), equal_to(True))
+
+    def test_lag_over_max_lag(self):
+        router = ReplicaRouter(Mock(), max_lag=5)
+
+        with patch.object(router, '_lag', return_value=10):
+            assert_that(router.is_usable(), equal_to(False))
+
+    def test_lag_is_not_checked_before_interval(self):
+        router = ReplicaRouter(Mock(), max_lag=5, check_interval=60)
+
+        with patch.object(router, '_lag', return_value=10) as lag:
+            router.is_usable()
+            router.is_usable()
+
+        lag.assert_called_once_with()
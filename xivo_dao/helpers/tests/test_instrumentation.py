@@ -0,0 +1,200 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from unittest.mock import patch
+
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    empty,
+    equal_to,
+    has_properties,
+    none,
+    not_none,
+)
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from xivo_dao.helpers.db_manager import daosession, read_only_daosession
+from xivo_dao.helpers.instrumentation import (
+    CallStats,
+    CounterSink,
+    HistogramSink,
+    Instrumentation,
+)
+
+
+class ListSink:
+    def __init__(self):
+        self.recorded = []
+
+    def record(self, stats):
+        self.recorded.append(stats)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        self.sink = ListSink()
+        self.instrumentation = Instrumentation()
+        self.instrumentation.enable(sinks=[self.sink], n_plus_one_threshold=3)
+        self.addCleanup(self.instrumentation.disable)
+
+    def test_record(self):
+        with self.instrumentation.record('my_dao.find_all'):
+            self.engine.execute(text('SELECT 1 UNION ALL SELECT 2')).fetchall()
+            self.engine.execute(text('SELECT 3')).fetchall()
+
+        assert_that(
+            self.sink.recorded,
+            contains_exactly(
+                has_properties(
+                    name='my_dao.find_all',
+                    statements=2,
+                    n_plus_one=none(),
+                )
+            ),
+        )
+        stats = self.sink.recorded[0]
+        assert_that(stats.duration >= stats.db_time, equal_to(True))
+
+    def test_statements_outside_of_a_call_are_ignored(self):
+        self.engine.execute(text('SELECT 1')).fetchall()
+
+        assert_that(self.sink.recorded, empty())
+
+    def test_nested_calls(self):
+        with self.instrumentation.record('outer'):
+            self.engine.execute(text('SELECT 1')).fetchall()
+            with self.instrumentation.record('inner'):
+                self.engine.execute(text('SELECT 2')).fetchall()
+
+        assert_that(
+            self.sink.recorded,
+            contains_exactly(
+                has_properties(name='inner', statements=1),
+                has_properties(name='outer', statements=2),
+            ),
+        )
+
+    def test_n_plus_one(self):
+        with self.instrumentation.record('my_dao.find_all'):
+            for i in range(4):
+                self.engine.execute(text('SELECT :i'), i=i).fetchall()
+
+        stats = self.sink.recorded[0]
+        assert_that(stats.n_plus_one, not_none())
+        assert_that(stats.n_plus_one[1], equal_to(4))
+
+    def test_disabled(self):
+        self.instrumentation.disable()
+
+        with self.instrumentation.record('my_dao.find_all') as stats:
+            self.engine.execute(text('SELECT 1')).fetchall()
+
+        assert_that(stats, none())
+        assert_that(self.sink.recorded, empty())
+
+    def test_failed_statement(self):
+        connection = self.engine.connect()
+        self.addCleanup(connection.close)
+
+        with self.instrumentation.record('my_dao.find_all'):
+            try:
+                connection.execute(text('SELECT * FROM unknown'))
+            except OperationalError:
+                pass
+            connection.execute(text('SELECT 1')).fetchall()
+
+        assert_that(connection.info.get('instrumentation_start'), empty())
+        assert_that(self.sink.recorded, contains_exactly(has_properties(statements=1)))
+
+    def test_read_only_daosession_generator(self):
+        @read_only_daosession
+        def iter_numbers(session):
+            yield 1
+            yield 2
+
+        instrumentation = Instrumentation()
+        with patch('xivo_dao.helpers.db_manager.dao_instrumentation', instrumentation):
+            instrumentation.enable(sinks=[self.sink])
+            try:
+                numbers = iter_numbers()
+                next(numbers)
+                with instrumentation.record('caller'):
+                    self.engine.execute(text('SELECT 1')).fetchall()
+                list(numbers)
+            finally:
+                instrumentation.disable()
+
+        name = f'{__name__}.{iter_numbers.__qualname__}'
+        assert_that(
+            self.sink.recorded,
+            contains_exactly(
+                has_properties(name=name),
+                has_properties(name='caller', statements=1),
+                has_properties(name=name),
+                has_properties(name=name),
+            ),
+        )
+
+    def test_daosession(self):
+        @daosession
+        def find(session):
+            pass
+
+        instrumentation = Instrumentation()
+        with patch('xivo_dao.helpers.db_manager.dao_instrumentation', instrumentation):
+            instrumentation.enable(sinks=[self.sink])
+            try:
+                find()
+            finally:
+                instrumentation.disable()
+
+        assert_that(
+            self.sink.recorded,
+            contains_exactly(has_properties(name=f'{__name__}.{find.__qualname__}')),
+        )
+
+
+class TestCounterSink(unittest.TestCase):
+    def test_samples(self):
+        sink = CounterSink()
+        stats = CallStats('find')
+        stats.add_statement('SELECT 1', 2, 0.5)
+        stats.finish(1.0, n_plus_one_threshold=10)
+
+        sink.record(stats)
+        sink.record(stats)
+
+        assert_that(
+            list(sink.samples()),
+            contains_exactly(
+                'xivo_dao_calls_total{function="find"} 2',
+                'xivo_dao_statements_total{function="find"} 2',
+                'xivo_dao_rows_total{function="find"} 4',
+                'xivo_dao_db_seconds_total{function="find"} 1.0',
+                'xivo_dao_python_seconds_total{function="find"} 1.0',
+                'xivo_dao_n_plus_one_total{function="find"} 0',
+            ),
+        )
+
+
+class TestHistogramSink(unittest.TestCase):
+    def test_histogram(self):
+        sink = HistogramSink(buckets=(0.1, 1.0))
+        for duration in (0.05, 0.5, 0.7, 2.0):
+            stats = CallStats('find')
+            stats.finish(duration, n_plus_one_threshold=10)
+            sink.record(stats)
+
+        assert_that(
+            sink.histogram('find'),
+            contains_exactly((0.1, 1), (1.0, 3), (float('inf'), 4)),
+        )
+        assert_that(
+            sink.histogram('unknown'),
+            contains_exactly((0.1, 0), (1.0, 0), (float('inf'), 0)),
+        )
@@ -1,13 +1,19 @@
-# Copyright 2021-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2021-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import unittest
+
 from collections.abc import Sequence, Callable
+from unittest.mock import Mock, patch
 
 from hamcrest import (
     assert_that,
     calling,
+    contains,
+    contains_inanyorder,
+    empty,
     not_,
     raises,
     equal_to,
@@ -19,7 +25,11 @@ from sqlalchemy_utils import create_materialized_view
 
 from xivo_dao.tests.test_dao import DAOTestCase
 from xivo_dao.helpers.db_manager import Base
-from xivo_dao.helpers.db_views import MaterializedView
+from xivo_dao.helpers.db_views import (
+    MaterializedView,
+    RefreshScheduler,
+    _forget_dirty_views,
+)
 
 
 def _create_materialized_view_class(
@@ -98,8 +108,160 @@ class TestMaterializedView(DAOTestCase):
         )
         assert_that(view.autorefresh, equal_to(True))
 
+    def test_view_with_unknown_refresh_policy(self):
+        def _create_class():
+            return type(
+                'view-unknown-refresh-policy',
+                (MaterializedView,),
+                {
+                    '__table__': create_materialized_view(
+                        'view-unknown-refresh-policy', select([1]), Base.metadata
+                    ),
+                    '__refresh_policy__': 'unknown',
+                },
+            )
+
+        assert_that(calling(_create_class), raises(InvalidRequestError))
+
     def test_view_dependencies_no_event_bound(self):
         view = _create_materialized_view_class(
             create_materialized_view, 'view-deps-no-event-found', select([1])
         )
         assert_that(view.autorefresh, equal_to(False))
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = RefreshScheduler()
+        self.session = Mock(info={})
+        self.view = Mock(refresh_statement=Mock(return_value='REFRESH view'))
+        self.view.__table__ = Mock(fullname='view')
+        self.transaction = Mock()
+        self.transaction.parent = None
+
+    def test_configure_unknown_policy(self):
+        assert_that(
+            calling(self.scheduler.configure).with_args(policy='unknown'),
+            raises(ValueError),
+        )
+
+    def test_mark_dirty_flush_policy(self):
+        self.scheduler.mark_dirty(self.session, self.view)
+
+        self.session.execute.assert_called_once()
+        assert_that(self.scheduler.dirty_views(self.session), empty())
+
+    def test_mark_dirty_commit_policy(self):
+        self.scheduler.configure(policy='commit')
+
+        self.scheduler.mark_dirty(self.session, self.view)
+        self.scheduler.mark_dirty(self.session, self.view)
+
+        self.session.execute.assert_not_called()
+        assert_that(self.scheduler.dirty_views(self.session), contains(self.view))
+
+        self.scheduler._before_commit(self.session)
+
+        self.session.execute.assert_called_once()
+        assert_that(self.scheduler.dirty_views(self.session), empty())
+
+    def test_mark_dirty_when_suspended(self):
+        with patch('xivo_dao.helpers.db_views.Session', return_value=self.session):
+            with self.scheduler.suspend():
+                self.scheduler.mark_dirty(self.session, self.view)
+                self.scheduler._before_commit(self.session)
+
+                self.session.execute.assert_not_called()
+
+        self.session.execute.assert_called_once()
+        assert_that(self.scheduler.dirty_views(self.session), empty())
+
+    def test_commit_when_suspended(self):
+        with patch('xivo_dao.helpers.db_views.Session', return_value=self.session):
+            with self.scheduler.suspend():
+                self.scheduler.mark_dirty(self.session, self.view)
+                self.scheduler._before_commit(self.session)
+                _forget_dirty_views(self.session, self.transaction)
+                self.scheduler._after_commit(self.session)
+
+                self.session.execute.assert_not_called()
+
+        self.session.execute.assert_called_once()
+
+    def test_commit_when_suspended_with_commit_policy(self):
+        self.scheduler.configure(policy='commit')
+        self.scheduler.mark_dirty(self.session, self.view)
+
+        with patch('xivo_dao.helpers.db_views.Session', return_value=self.session):
+            with self.scheduler.suspend():
+                self.scheduler._before_commit(self.session)
+                _forget_dirty_views(self.session, self.transaction)
+
+        self.session.execute.assert_not_called()
+        assert_that(self.scheduler.dirty_views(self.session), contains(self.view))
+
+        self.scheduler._before_commit(self.session)
+
+        self.session.execute.assert_called_once()
+
+    def test_manual_policy(self):
+        self.scheduler.configure(policy='manual')
+        self.scheduler.mark_dirty(self.session, self.view)
+
+        self.scheduler._before_commit(self.session)
+        self.session.execute.assert_not_called()
+
+        self.scheduler.refresh_dirty(self.session)
+        self.session.execute.assert_called_once()
+
+    def test_manual_policy_keeps_views_dirty_after_the_transaction(self):
+        self.scheduler.configure(policy='manual')
+        self.scheduler.mark_dirty(self.session, self.view)
+
+        self.scheduler._before_commit(self.session)
+        _forget_dirty_views(self.session, self.transaction)
+        self.scheduler._after_commit(self.session)
+
+        self.session.execute.assert_not_called()
+        other_session = Mock(info={})
+        assert_that(self.scheduler.dirty_views(other_session), contains(self.view))
+
+        self.scheduler.refresh_dirty(other_session)
+
+        other_session.execute.assert_called_once()
+        assert_that(self.scheduler.dirty_views(other_session), empty())
+
+    @patch('xivo_dao.helpers.db_views.threading.Timer')
+    def test_view_policy_overrides_the_scheduler_policy(self, Timer):
+        self.scheduler.configure(policy='commit')
+        self.view.__refresh_policy__ = 'debounce'
+        committed_view = Mock(refresh_statement=Mock(return_value='REFRESH other'))
+        committed_view.__table__ = Mock(fullname='other')
+
+        self.scheduler.mark_dirty(self.session, self.view)
+        self.scheduler.mark_dirty(self.session, committed_view)
+        self.scheduler._before_commit(self.session)
+
+        self.session.execute.assert_called_once()
+        assert_that(self.scheduler.dirty_views(self.session), contains(self.view))
+
+        self.scheduler._after_commit(self.session)
+
+        Timer.return_value.start.assert_called_once_with()
+        assert_that(self.scheduler._pending, contains(self.view))
+
+    @patch('xivo_dao.helpers.db_views.threading.Timer')
+    def test_debounce_policy_coalesces_commits(self, Timer):
+        self.scheduler.configure(policy='debounce', delay=5)
+        other_session = Mock(info={})
+        other_view = Mock()
+
+        self.scheduler.mark_dirty(self.session, self.view)
+        self.scheduler._after_commit(self.session)
+        self.scheduler.mark_dirty(other_session, other_view)
+        self.scheduler._after_commit(other_session)
+
+        Timer.assert_called_once_with(5, self.scheduler._refresh_pending)
+        Timer.return_value.start.assert_called_once_with()
+        assert_that(self.scheduler._pending, contains_inanyorder(self.view, other_view))
+        self.session.execute.assert_not_called()
@@ -1,8 +1,8 @@
-# Copyright 2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2024-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import unittest
-from xivo_dao.helpers.sequence_utils import split_by
+from xivo_dao.helpers.sequence_utils import chunks, split_by
 
 
 class TestSplitBy(unittest.TestCase):
@@ -34,3 +34,12 @@ class TestSplitBy(unittest.TestCase):
         seq = None
         with self.assertRaises(TypeError):
             _ = split_by(seq, lambda x: x)
+
+
+class TestChunks(unittest.TestCase):
+    def test_chunks(self):
+        seq = [0, 1, 2, 3, 4]
+        self.assertEqual(list(chunks(seq, 2)), [[0, 1], [2, 3], [4]])
+
+    def test_chunks_empty(self):
+        self.assertEqual(list(chunks([], 2)), [])
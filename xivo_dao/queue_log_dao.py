@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
@@ -9,6 +9,7 @@ from sqlalchemy.sql.functions import min
 from xivo_dao.alchemy.queue_log import QueueLog
 from sqlalchemy import func
 from datetime import timedelta
+from xivo_dao.helpers.datetime import split_by_period
 from xivo_dao.helpers.db_manager import daosession
 
 logger = logging.getLogger(__name__)
@@ -33,7 +34,6 @@ AND
   queue_log.time BETWEEN :start AND :end
 '''
 
-    periods = [t for t in _enumerate_periods(start, end, interval)]
     formatted_start = before_start.strftime('%Y-%m-%d %H:%M:%S%z')
     formatted_end = end.strftime('%Y-%m-%d %H:%M:%S%z')
 
@@ -45,54 +45,21 @@ AND
         .params(start=formatted_start, end=formatted_end)
     )
 
+    # The periods start at `start` and the last one includes `end`
+    periods_end = start + ((end - start) // interval + 1) * interval
+
     results = {}
     for row in rows.all():
-        agent_id, wstart, wend = row.agent_id, row.start, row.end
-
-        starting_period = _find_including_period(periods, wstart)
-        ending_period = _find_including_period(periods, wend)
-
-        if starting_period and starting_period not in results:
-            results[starting_period] = {}
-        if ending_period and ending_period not in results:
-            results[ending_period] = {}
-
-        if starting_period is not None:
-            range_end = starting_period + interval
-            wend_in_start = wend if wend < range_end else range_end
-            time_in_period = wend_in_start - wstart
-            if agent_id not in results[starting_period]:
-                results[starting_period][agent_id] = {
-                    'wrapup_time': timedelta(seconds=0)
-                }
-            results[starting_period][agent_id]['wrapup_time'] += time_in_period
-
-        if ending_period == starting_period:
-            continue
-
-        time_in_period = wend - ending_period
-        if agent_id not in results[ending_period]:
-            results[ending_period][agent_id] = {'wrapup_time': timedelta(seconds=0)}
-        results[ending_period][agent_id]['wrapup_time'] += time_in_period
+        periods = split_by_period(row.start, row.end, start, periods_end, interval)
+        for period, time_in_period in periods:
+            agent_times = results.setdefault(period, {}).setdefault(
+                row.agent_id, {'wrapup_time': timedelta(seconds=0)}
+            )
+            agent_times['wrapup_time'] += time_in_period
 
     return results
 
 
-def _find_including_period(periods, t):
-    match = None
-    for period in periods:
-        if t > period:
-            match = period
-    return match
-
-
-def _enumerate_periods(start, end, interval):
-    tmp = start
-    while tmp <= end:
-        yield tmp
-        tmp += interval
-
-
 def _get_ended_call(session, start_str, end, queue_log_event, stat_event):
     pairs = []
     enter_queue_event = None
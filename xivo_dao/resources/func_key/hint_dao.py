@@ -1,7 +1,8 @@
-# Copyright 2014-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from collections import defaultdict
+from itertools import groupby
 
 from sqlalchemy import (
     and_,
@@ -11,10 +12,7 @@ from sqlalchemy import (
     literal_column,
     sql,
 )
-from sqlalchemy.orm import (
-    aliased,
-    joinedload,
-)
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext import baked
 from sqlalchemy.sql.expression import true
 
@@ -40,9 +38,11 @@ from xivo_dao.alchemy.sccpline import SCCPLine
 from xivo_dao.alchemy.user_line import UserLine
 from xivo_dao.alchemy.usercustom import UserCustom
 from xivo_dao.alchemy.userfeatures import UserFeatures
-from xivo_dao.helpers.db_manager import daosession
+from xivo_dao.helpers.db_manager import read_only_daosession
 from xivo_dao.resources.func_key.model import Hint
 
+STREAM_BATCH_SIZE = 1000
+
 user_extension = aliased(Extension)
 
 agent_hints_bakery = baked.bakery()
@@ -352,6 +352,32 @@ user_arguments_query += lambda q: q.filter(
     UserFeatures.id.in_(bindparam('user_ids', expanding=True))
 )
 
+user_shared_lines_bakery = baked.bakery()
+user_shared_lines_query = user_shared_lines_bakery(
+    lambda s: s.query(
+        UserFeatures.id,
+        UserFeatures.uuid,
+        LineFeatures.name,
+        sql.case(
+            [
+                (LineFeatures.endpoint_custom_id.isnot(None), 'custom'),
+                (LineFeatures.endpoint_sip_uuid.isnot(None), 'sip'),
+                (LineFeatures.endpoint_sccp_id.isnot(None), 'sccp'),
+                (LineFeatures.id.isnot(None), 'line'),
+            ]
+        ).label('kind'),
+    )
+    .outerjoin(
+        UserLine,
+        UserLine.user_id == UserFeatures.id,
+    )
+    .outerjoin(
+        LineFeatures,
+        LineFeatures.id == UserLine.line_id,
+    )
+    .order_by(UserFeatures.id, UserLine.main_line.desc(), UserLine.line_id)
+)
+
 service_hints_bakery = baked.bakery()
 service_hints_query = service_hints_bakery(
     lambda s: s.query(
@@ -405,19 +431,19 @@ def _find_extenfeatures(session, feature):
     return extenfeatures_query(session).params(feature=feature).scalar()
 
 
-@daosession
+@read_only_daosession
 def progfunckey_extension(session):
     extension = _find_extenfeatures(session, 'phoneprogfunckey')
     return clean_extension(extension)
 
 
-@daosession
+@read_only_daosession
 def calluser_extension(session):
     extension = _find_extenfeatures(session, 'calluser')
     return clean_extension(extension)
 
 
-@daosession
+@read_only_daosession
 def user_hints(session):
     user_extensions = _list_user_extensions(session)
     if not user_extensions:
@@ -436,32 +462,34 @@ def user_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def user_shared_hints(session):
-    query = session.query(UserFeatures).options(
-        joinedload('user_lines').joinedload('line')
-    )
     hints = []
-    for user in query.all():
-        ifaces = [f'Custom:{user.uuid}-mobile']
-        for line in user.lines:
-            if line.endpoint_custom_id:
-                ifaces.append(line.name)
-            elif line.endpoint_sip_uuid:
-                ifaces.append(f'PJSIP/{line.name}')
-            elif line.endpoint_sccp_id:
-                ifaces.append(f'SCCP/{line.name}')
-            else:
-                ifaces.append(f'CUSTOM/{line.name}')
-
-        if not ifaces:
-            continue
+    rows = _stream(user_shared_lines_query(session))
+    for (user_id, uuid), lines in groupby(rows, key=lambda row: row[:2]):
+        ifaces = [f'Custom:{uuid}-mobile']
+        for _, _, name, kind in lines:
+            if kind is not None:
+                ifaces.append(_shared_interface(kind, name))
         argument = '&'.join(ifaces)
-        hint = Hint(user_id=user.id, extension=user.uuid, argument=argument)
-        hints.append(hint)
+        hints.append(Hint(user_id=user_id, extension=uuid, argument=argument))
     return hints
 
 
+def _shared_interface(kind, name):
+    if kind == 'custom':
+        return name
+    elif kind == 'sip':
+        return f'PJSIP/{name}'
+    elif kind == 'sccp':
+        return f'SCCP/{name}'
+    return f'CUSTOM/{name}'
+
+
+def _stream(result):
+    return result.with_post_criteria(lambda q: q.yield_per(STREAM_BATCH_SIZE))
+
+
 def _list_user_extensions(session):
     return user_extensions_query(session).all()
 
@@ -471,8 +499,12 @@ def _list_user_arguments(session, user_ids):
     return {row.user_id: row.argument for row in query}
 
 
-@daosession
+@read_only_daosession
 def conference_hints(session):
+    return _conference_hints(session)
+
+
+def _conference_hints(session):
     query = conference_hints_query(session).all()
     hints = defaultdict(list)
     for row in query:
@@ -481,7 +513,7 @@ def conference_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def service_hints(session):
     query = service_hints_query(session).all()
     hints = defaultdict(list)
@@ -491,7 +523,7 @@ def service_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def forward_hints(session):
     query = forwards_hints_query(session).all()
     hints = defaultdict(list)
@@ -506,7 +538,7 @@ def forward_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def agent_hints(session):
     query = agent_hints_query(session).all()
     hints = defaultdict(list)
@@ -520,7 +552,7 @@ def agent_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def custom_hints(session):
     query = custom_hints_query(session).all()
     hints = defaultdict(list)
@@ -530,7 +562,7 @@ def custom_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def bsfilter_hints(session):
     bsfilter_extension = clean_extension(_find_extenfeatures(session, 'bsfilter'))
     query = bsfilter_hints_query(session).all()
@@ -541,7 +573,7 @@ def bsfilter_hints(session):
     return hints
 
 
-@daosession
+@read_only_daosession
 def groupmember_hints(session):
     query = groupmember_hints_query(session).all()
     hints = defaultdict(list)
@@ -553,3 +585,268 @@ def groupmember_hints(session):
         )
         hints[row.context].append(hint)
     return hints
+
+
+@read_only_daosession
+def all_hints(session):
+    '''
+    Every hint family, keyed by the name of the function returning it alone:
+    `user` for `user_hints`, `user_shared` for `user_shared_hints`, ...
+
+    The users, their lines and their main extensions are loaded once and shared
+    by all the families instead of being joined again by each hint query.
+    '''
+    index = _UserLineIndex(session)
+    func_keys = _list_blf_func_keys(session)
+    bsfilter_extension = clean_extension(_find_extenfeatures(session, 'bsfilter'))
+
+    def user_hint(user_id, row):
+        return Hint(
+            user_id=user_id,
+            extension=clean_extension(row.extension),
+            argument=row.argument,
+        )
+
+    return {
+        'user': index.user_hints(),
+        'user_shared': index.user_shared_hints(),
+        'conference': _conference_hints(session),
+        'service': index.func_key_hints(
+            func_keys['service'],
+            lambda user_id, row: Hint(user_id=user_id, extension=row.extension),
+        ),
+        'forward': index.func_key_hints(func_keys['forward'], user_hint),
+        'agent': index.func_key_hints(func_keys['agent'], user_hint),
+        'custom': index.func_key_hints(
+            func_keys['custom'], lambda user_id, row: Hint(extension=row.extension)
+        ),
+        'bsfilter': index.bsfilter_hints(
+            _list_bsfilter_members(session), bsfilter_extension
+        ),
+        'groupmember': index.func_key_hints(func_keys['groupmember'], user_hint),
+    }
+
+
+class _UserLineIndex:
+    '''
+    Users, their lines and the main extension of each line, loaded with one
+    query each
+    '''
+
+    def __init__(self, session):
+        self.users = session.query(
+            UserFeatures.id,
+            UserFeatures.uuid,
+            UserFeatures.enablehint,
+            UserFeatures.func_key_private_template_id,
+        ).all()
+        self.users_by_template = {
+            user.func_key_private_template_id: user.id for user in self.users
+        }
+
+        self.lines = defaultdict(list)
+        for row in self._user_lines_query(session):
+            self.lines[row.user_id].append(row)
+
+    def _user_lines_query(self, session):
+        return (
+            session.query(
+                UserLine.user_id,
+                UserLine.line_id,
+                UserLine.main_user,
+                UserLine.main_line,
+                LineFeatures.name,
+                LineFeatures.commented,
+                LineFeatures.endpoint_sip_uuid,
+                LineFeatures.endpoint_sccp_id,
+                LineFeatures.endpoint_custom_id,
+                EndpointSIP.name.label('sip_name'),
+                SCCPLine.name.label('sccp_name'),
+                UserCustom.interface.label('custom_interface'),
+                Extension.exten,
+                Extension.context,
+                Extension.commented.label('extension_commented'),
+            )
+            .join(UserLine.linefeatures)
+            .outerjoin(EndpointSIP)
+            .outerjoin(SCCPLine)
+            .outerjoin(UserCustom)
+            .outerjoin(
+                LineExtension,
+                and_(
+                    LineExtension.line_id == UserLine.line_id,
+                    LineExtension.main_extension.is_(True),
+                ),
+            )
+            .outerjoin(Extension, Extension.id == LineExtension.extension_id)
+            .order_by(UserLine.user_id, UserLine.main_line.desc(), UserLine.line_id)
+        )
+
+    def main_contexts(self, user_id, include_commented=True):
+        '''
+        Contexts of the main extension of the main line of a user, as in the
+        joins of the func key hint queries
+        '''
+        return [
+            row.context
+            for row in self.lines.get(user_id, [])
+            if row.main_user
+            and row.main_line
+            and row.context is not None
+            and (include_commented or row.extension_commented == 0)
+        ]
+
+    def user_hints(self):
+        hints = defaultdict(list)
+        for user in self.users:
+            if user.enablehint != 1:
+                continue
+
+            rows = [row for row in self.lines.get(user.id, []) if row.main_user]
+            interfaces = (_line_interface(row) for row in rows)
+            argument = '&'.join(interface for interface in interfaces if interface)
+            if not argument:
+                continue
+
+            extensions = _unique(
+                (row.exten, row.context) for row in rows if row.exten is not None
+            )
+            for extension, context in extensions:
+                hints[context].append(
+                    Hint(user_id=user.id, extension=extension, argument=argument)
+                )
+        return hints
+
+    def user_shared_hints(self):
+        hints = []
+        for user in self.users:
+            ifaces = [f'Custom:{user.uuid}-mobile']
+            seen = set()
+            for row in self.lines.get(user.id, []):
+                if row.line_id in seen:
+                    continue
+                seen.add(row.line_id)
+                ifaces.append(_shared_interface(_endpoint_kind(row), row.name))
+            argument = '&'.join(ifaces)
+            hints.append(Hint(user_id=user.id, extension=user.uuid, argument=argument))
+        return hints
+
+    def func_key_hints(self, func_keys, build_hint):
+        hints = defaultdict(list)
+        for row in func_keys:
+            user_id = self.users_by_template.get(row.template_id)
+            if user_id is None:
+                continue
+            for context in self.main_contexts(user_id):
+                hints[context].append(build_hint(user_id, row))
+        return hints
+
+    def bsfilter_hints(self, members, bsfilter_extension):
+        hints = defaultdict(list)
+        for filtermember_id, user_id in members:
+            for context in self.main_contexts(user_id, include_commented=False):
+                hints[context].append(
+                    Hint(extension=bsfilter_extension, argument=str(filtermember_id))
+                )
+        return hints
+
+
+def _line_interface(row):
+    if row.commented != 0:
+        return None
+    if row.endpoint_sip_uuid is not None:
+        return f'PJSIP/{row.sip_name}'
+    if row.endpoint_sccp_id is not None:
+        return f'SCCP/{row.sccp_name}'
+    if row.endpoint_custom_id is not None:
+        return row.custom_interface
+    return None
+
+
+def _endpoint_kind(row):
+    if row.endpoint_custom_id:
+        return 'custom'
+    elif row.endpoint_sip_uuid:
+        return 'sip'
+    elif row.endpoint_sccp_id:
+        return 'sccp'
+    return 'line'
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def _list_bsfilter_members(session):
+    return (
+        session.query(
+            FuncKeyDestBSFilter.filtermember_id,
+            sql.cast(Callfiltermember.typeval, Integer).label('user_id'),
+        )
+        .join(
+            Callfiltermember,
+            Callfiltermember.id == FuncKeyDestBSFilter.filtermember_id,
+        )
+        .join(
+            Callfilter,
+            Callfilter.id == Callfiltermember.callfilterid,
+        )
+        .filter(Callfilter.commented == 0)
+        .all()
+    )
+
+
+def _blf_func_key_select(type_, dest, extension, argument=None):
+    join = sql.join(
+        dest, FuncKeyMapping, dest.func_key_id == FuncKeyMapping.func_key_id
+    )
+    conditions = [FuncKeyMapping.blf.is_(True)]
+    if hasattr(dest, 'feature_extension_uuid'):
+        join = join.join(
+            FeatureExtension, FeatureExtension.uuid == dest.feature_extension_uuid
+        )
+        conditions.append(FeatureExtension.enabled == true())
+
+    if argument is None:
+        argument = sql.cast(sql.null(), Unicode)
+    return (
+        sql.select(
+            [
+                literal_column(f"'{type_}'").label('type'),
+                FuncKeyMapping.template_id,
+                extension.label('extension'),
+                argument.label('argument'),
+            ]
+        )
+        .select_from(join)
+        .where(and_(*conditions))
+    )
+
+
+def _list_blf_func_keys(session):
+    query = sql.union_all(
+        _blf_func_key_select('service', FuncKeyDestService, FeatureExtension.exten),
+        _blf_func_key_select(
+            'forward',
+            FuncKeyDestForward,
+            FeatureExtension.exten,
+            sql.cast(FuncKeyDestForward.number, Unicode),
+        ),
+        _blf_func_key_select(
+            'agent',
+            FuncKeyDestAgent,
+            FeatureExtension.exten,
+            sql.cast(FuncKeyDestAgent.agent_id, Unicode),
+        ),
+        _blf_func_key_select(
+            'groupmember',
+            FuncKeyDestGroupMember,
+            FeatureExtension.exten,
+            sql.cast(FuncKeyDestGroupMember.group_id, Unicode),
+        ),
+        _blf_func_key_select('custom', FuncKeyDestCustom, FuncKeyDestCustom.exten),
+    )
+    func_keys = defaultdict(list)
+    for row in session.execute(query):
+        func_keys[row.type].append(row)
+    return func_keys
@@ -1,4 +1,4 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from hamcrest import (
@@ -13,6 +13,13 @@ from hamcrest import (
     not_,
 )
 
+from sqlalchemy.orm import joinedload
+
+from xivo_dao.alchemy.func_key_template import FuncKeyTemplate
+from xivo_dao.alchemy.linefeatures import LineFeatures
+from xivo_dao.alchemy.user_line import UserLine
+from xivo_dao.alchemy.userfeatures import UserFeatures
+from xivo_dao.tests.benchmark import benchmark_size, measure, report, requires_benchmark
 from xivo_dao.tests.test_dao import DAOTestCase
 from xivo_dao.resources.func_key.tests.test_helpers import FuncKeyHelper
 from xivo_dao.resources.func_key import hint_dao
@@ -828,3 +835,155 @@ class TestUserSharedHints(TestHints):
         results = hint_dao.user_shared_hints()
 
         assert_that(results[0].argument, equal_to(f'Custom:{user.uuid}-mobile'))
+
+
+class TestAllHints(TestHints):
+    def setUp(self):
+        super().setUp()
+        self.add_feature_extension(exten='_*37.', feature='bsfilter')
+
+    def add_every_hint(self):
+        user_1 = self.add_sip_user_line_extension_in_context(self.context.name)
+        user_2 = self.add_sip_user_line_extension_in_context(self.context2.name)
+        self.add_sip_line_to_extension_and_user(
+            'second', user_1.id, self.add_extension().id, main_line=False
+        )
+        self.add_user_sccp_and_func_key(exten='1001')
+        self.add_user_custom_and_func_key(exten='1002')
+        self.add_user_and_func_key(exten='1003', enablehint=0)
+        self.add_user()
+
+        destinations = [
+            self.create_service_func_key('*25', 'enablednd'),
+            self.create_forward_func_key('_*23.', 'fwdbusy', '1234'),
+            self.create_agent_func_key('_*31.', 'agentstaticlogin'),
+            self.create_group_member_func_key('_*51.', 'groupmemberjoin'),
+            self.create_custom_func_key('4321'),
+        ]
+        for position, destination in enumerate(destinations, start=1):
+            self.add_func_key_to_user(destination, user_1, position)
+            self.add_func_key_to_user(destination, user_2, position)
+        self.add_func_key_to_user(
+            self.create_custom_func_key('5678'), user_2, position=10, blf=False
+        )
+
+        conference = self.add_conference()
+        self.add_extension(
+            context=self.context.name,
+            exten='4000',
+            type='conference',
+            typeval=str(conference.id),
+        )
+        self.add_conference_destination(conference.id)
+
+        callfilter = self.add_call_filter()
+        self.add_filter_member(callfilter.id, user_1.id)
+        secretary = self.add_filter_member(callfilter.id, user_2.id, 'secretary')
+        self.add_bsfilter_destination(secretary.id)
+
+    def test_given_no_hints_then_returns_empty_families(self):
+        result = hint_dao.all_hints()
+
+        assert_that(result, has_entries(user=empty(), user_shared=empty()))
+
+    def test_given_every_hint_family_then_returns_same_hints_as_each_function(self):
+        self.add_every_hint()
+
+        result = hint_dao.all_hints()
+
+        functions = {
+            'user': hint_dao.user_hints,
+            'conference': hint_dao.conference_hints,
+            'service': hint_dao.service_hints,
+            'forward': hint_dao.forward_hints,
+            'agent': hint_dao.agent_hints,
+            'custom': hint_dao.custom_hints,
+            'bsfilter': hint_dao.bsfilter_hints,
+            'groupmember': hint_dao.groupmember_hints,
+        }
+        for family, function in functions.items():
+            expected = {
+                context: contains_inanyorder(*hints)
+                for context, hints in function().items()
+            }
+            assert_that(result[family].keys(), equal_to(expected.keys()), family)
+            assert_that(result[family], has_entries(expected), family)
+        assert_that(
+            result['user_shared'],
+            contains_inanyorder(*hint_dao.user_shared_hints()),
+        )
+
+
+@requires_benchmark
+class TestUserSharedHintsBenchmark(TestHints):
+    def setUp(self):
+        super().setUp()
+        self.size = benchmark_size(50000)
+        first_id = self._generate_int() * 1000000
+        ids = range(first_id, first_id + self.size)
+        self.session.execute(
+            FuncKeyTemplate.__table__.insert(),
+            [
+                {'id': id_, 'tenant_uuid': self.default_tenant.uuid, 'private': True}
+                for id_ in ids
+            ],
+        )
+        self.session.execute(
+            UserFeatures.__table__.insert(),
+            [
+                {
+                    'id': id_,
+                    'uuid': self._generate_uuid(),
+                    'firstname': 'John',
+                    'tenant_uuid': self.default_tenant.uuid,
+                    'func_key_private_template_id': id_,
+                    'description': '',
+                }
+                for id_ in ids
+            ],
+        )
+        self.session.execute(
+            LineFeatures.__table__.insert(),
+            [
+                {
+                    'id': id_,
+                    'name': f'line{id_}',
+                    'context': self.context.name,
+                    'provisioningid': 123456,
+                }
+                for id_ in ids
+            ],
+        )
+        self.session.execute(
+            UserLine.__table__.insert(),
+            [
+                {'user_id': id_, 'line_id': id_, 'main_user': True, 'main_line': True}
+                for id_ in ids
+            ],
+        )
+
+    def test_user_shared_hints(self):
+        orm = measure(_orm_user_shared_hints, self.session)
+        columns = measure(hint_dao.user_shared_hints)
+
+        report(
+            f'user_shared_hints, {self.size} users',
+            orm_objects=orm,
+            columns=columns,
+        )
+        assert_that(columns.result, contains_inanyorder(*orm.result))
+
+
+def _orm_user_shared_hints(session):
+    # Implementation loading the users as ORM objects, used as a reference
+    query = session.query(UserFeatures).options(
+        joinedload('user_lines').joinedload('line')
+    )
+    hints = []
+    for user in query.all():
+        ifaces = [f'Custom:{user.uuid}-mobile']
+        for line in user.lines:
+            ifaces.append(f'CUSTOM/{line.name}')
+        argument = '&'.join(ifaces)
+        hints.append(Hint(user_id=user.id, extension=user.uuid, argument=argument))
+    return hints
@@ -1,9 +1,12 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import abc
 
-from sqlalchemy import text
+from collections import defaultdict
+
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import joinedload
 
 from xivo_dao.alchemy.features import Features
 from xivo_dao.alchemy.func_key import FuncKey
@@ -29,6 +32,7 @@ from xivo_dao.alchemy.func_key_dest_service import FuncKeyDestService
 from xivo_dao.alchemy.func_key_dest_user import FuncKeyDestUser
 
 from xivo_dao.helpers import errors
+from xivo_dao.helpers.db_utils import next_ids
 
 from xivo_dao.resources.extension.database import (
     ForwardExtensionConverter,
@@ -77,12 +81,12 @@ class FuncKeyPersistor:
         self.tenant_uuids = tenant_uuids
 
     def search(self, parameters):
-        query = self.session.query(FuncKeyTemplate.id)
+        query = self.session.query(FuncKeyTemplate)
         query = self._filter_tenant_uuid(query)
         rows, total = self.template_search.search_from_query(query, parameters)
 
-        items = [self.get(row.id) for row in rows]
-        return SearchResult(total=total, items=items)
+        self.load_keys(rows)
+        return SearchResult(total=total, items=list(rows))
 
     def create(self, template):
         template = self.add_template(template)
@@ -96,10 +100,42 @@ class FuncKeyPersistor:
         return template
 
     def add_funckeys(self, template_id, funckeys):
-        created_funckeys = {}
+        '''
+        The destinations are found or created with one batch per destination
+        type and the mappings are inserted in one batch
+        '''
+        funckeys_by_type = defaultdict(list)
         for pos, funckey in funckeys.items():
-            created_funckeys[pos] = self.add_mapping(template_id, pos, funckey)
-        return created_funckeys
+            funckeys_by_type[funckey.destination.type].append((pos, funckey))
+
+        created_funckeys = {}
+        for dest_type, type_funckeys in funckeys_by_type.items():
+            persistor = self.build_persistor(dest_type)
+            destination_rows = persistor.find_or_create_many(
+                [funckey.destination for _, funckey in type_funckeys]
+            )
+            for (pos, funckey), destination_row in zip(type_funckeys, destination_rows):
+                if not destination_row:
+                    raise errors.param_not_found(
+                        'destination',
+                        'func key representing destination',
+                        type=dest_type,
+                    )
+                created_funckeys[pos] = FuncKeyMapping(
+                    template_id=template_id,
+                    func_key_id=destination_row.func_key_id,
+                    destination_type_id=destination_row.destination_type_id,
+                    position=pos,
+                    label=funckey.label,
+                    blf=funckey.blf,
+                )
+
+        self.session.add_all(created_funckeys.values())
+        self.session.flush()
+
+        for pos, mapping in created_funckeys.items():
+            mapping.destination = funckeys[pos].destination
+        return {pos: created_funckeys[pos] for pos in funckeys}
 
     def add_mapping(self, template_id, position, funckey):
         destination_row = self.find_or_create_destination(funckey.destination)
@@ -135,7 +171,7 @@ class FuncKeyPersistor:
 
     def get(self, template_id):
         template = self.get_template_row(template_id)
-        template.keys = self.get_keys_for_template(template_id)
+        self.load_keys([template])
         return template
 
     def get_template_row(self, template_id):
@@ -147,14 +183,38 @@ class FuncKeyPersistor:
             raise errors.not_found('FuncKeyTemplate', id=template_id)
         return template
 
-    def get_keys_for_template(self, template_id):
-        keys = {}
-        for row in self.query_mappings(template_id):
-            row.destination = self.build_destination(
-                row.func_key_id, row.destination_type_name
+    def load_keys(self, templates):
+        '''
+        Set the keys of the templates with a fixed number of queries: one for
+        the mappings and one for the destinations of each destination type
+        '''
+        templates = {template.id: template for template in templates}
+        for template in templates.values():
+            template.keys = {}
+        if not templates:
+            return
+
+        mappings = (
+            self.session.query(FuncKeyMapping)
+            .filter(FuncKeyMapping.template_id.in_(templates))
+            .options(
+                joinedload(FuncKeyMapping.func_key).joinedload(FuncKey.destination_type)
+            )
+            .all()
+        )
+
+        mappings_by_type = defaultdict(list)
+        for mapping in mappings:
+            mappings_by_type[mapping.destination_type_name].append(mapping)
+
+        for dest_type, type_mappings in mappings_by_type.items():
+            persistor = self.build_persistor(dest_type)
+            destinations = persistor.get_many(
+                {mapping.func_key_id for mapping in type_mappings}
             )
-            keys[row.position] = row
-        return keys
+            for mapping in type_mappings:
+                mapping.destination = destinations.get(mapping.func_key_id)
+                templates[mapping.template_id].keys[mapping.position] = mapping
 
     def _filter_tenant_uuid(self, query):
         if self.tenant_uuids is None:
@@ -172,10 +232,6 @@ class FuncKeyPersistor:
 
         return query.all()
 
-    def build_destination(self, func_key_id, dest_type):
-        persistor = self.build_persistor(dest_type)
-        return persistor.get(func_key_id)
-
     def delete(self, template):
         self.remove_funckeys(template)
         self.delete_template(template)
@@ -228,10 +284,22 @@ class DestinationPersistor(metaclass=abc.ABCMeta):
     def get(self, func_key_id):
         return
 
+    def get_many(self, func_key_ids):
+        '''
+        Destinations of the func keys, keyed by func key id
+        '''
+        return {func_key_id: self.get(func_key_id) for func_key_id in func_key_ids}
+
     @abc.abstractmethod
     def find_or_create(self, destination):
         return
 
+    def find_or_create_many(self, destinations):
+        '''
+        Destination rows of the destinations, in the same order
+        '''
+        return [self.find_or_create(destination) for destination in destinations]
+
     @abc.abstractmethod
     def delete(self, func_key_id):
         return
@@ -242,6 +310,68 @@ class DestinationPersistor(metaclass=abc.ABCMeta):
         self.session.flush()
         return func_key_row
 
+    def create_func_keys(self, type_id, destination_type_id, count):
+        func_key_rows = [
+            FuncKey(id=id_, type_id=type_id, destination_type_id=destination_type_id)
+            for id_ in next_ids(self.session, FuncKey.id, count)
+        ]
+        self.session.add_all(func_key_rows)
+        self.session.flush()
+        return func_key_rows
+
+    def _find_or_create_many(self, destinations, key, find, create):
+        '''
+        `find` returns the existing rows of a set of keys, keyed by key. A row is
+        created with `create` for each key that is not found.
+        '''
+        keys = [key(destination) for destination in destinations]
+        rows = find(set(keys)) if keys else {}
+
+        missing = {}
+        for key_, destination in zip(keys, destinations):
+            if key_ not in rows:
+                missing.setdefault(key_, destination)
+        rows.update(self._create_many(missing, create))
+
+        return [rows[key_] for key_ in keys]
+
+    def _create_many(self, destinations, create):
+        if not destinations:
+            return {}
+
+        func_key_rows = self.create_func_keys(
+            self.TYPE_ID, self.DESTINATION_TYPE_ID, len(destinations)
+        )
+        rows = {
+            key: create(destination, func_key_row.id)
+            for (key, destination), func_key_row in zip(
+                destinations.items(), func_key_rows
+            )
+        }
+        for row in rows.values():
+            # without a server default to fetch back, the rows are inserted with
+            # executemany
+            row.destination_type_id = self.DESTINATION_TYPE_ID
+        self.session.add_all(rows.values())
+        self.session.flush()
+        return rows
+
+    def _find_by(self, model, column, values):
+        query = self.session.query(model).filter(column.in_(list(values)))
+        return {getattr(row, column.key): row for row in query}
+
+    def _find_feature_extension_uuids(self, features):
+        query = self.session.query(
+            FeatureExtension.feature, FeatureExtension.uuid
+        ).filter(FeatureExtension.feature.in_(list(features)))
+        return dict(query.all())
+
+    def _get_many(self, model, func_key_ids):
+        query = self.session.query(model).filter(
+            model.func_key_id.in_(list(func_key_ids))
+        )
+        return {row.func_key_id: row for row in query}
+
     def _func_key_is_still_mapped(self, func_key_id):
         return (
             self.session.query(FuncKeyMapping)
@@ -261,6 +391,9 @@ class UserPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestUser, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestUser)
@@ -278,6 +411,18 @@ class UserPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.user_id,
+            find=lambda user_ids: self._find_by(
+                FuncKeyDestUser, FuncKeyDestUser.user_id, user_ids
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestUser(
+                func_key_id=func_key_id, user_id=destination.user_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -298,6 +443,9 @@ class QueuePersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestQueue, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestQueue)
@@ -315,6 +463,18 @@ class QueuePersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.queue_id,
+            find=lambda queue_ids: self._find_by(
+                FuncKeyDestQueue, FuncKeyDestQueue.queue_id, queue_ids
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestQueue(
+                func_key_id=func_key_id, queue_id=destination.queue_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -335,6 +495,9 @@ class GroupPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestGroup, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestGroup)
@@ -352,6 +515,18 @@ class GroupPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.group_id,
+            find=lambda group_ids: self._find_by(
+                FuncKeyDestGroup, FuncKeyDestGroup.group_id, group_ids
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestGroup(
+                func_key_id=func_key_id, group_id=destination.group_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -372,6 +547,9 @@ class GroupMemberPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestGroupMember, func_key_ids)
+
     def find_or_create(self, destination):
         typeval = self.find_typeval(destination.action)
 
@@ -403,6 +581,43 @@ class GroupMemberPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        feature_extension_uuids = self._find_feature_extension_uuids(
+            {self.find_typeval(destination.action) for destination in destinations}
+        )
+
+        def find(keys):
+            query = (
+                self.session.query(FuncKeyDestGroupMember, FeatureExtension.feature)
+                .join(
+                    FeatureExtension,
+                    FuncKeyDestGroupMember.feature_extension_uuid
+                    == FeatureExtension.uuid,
+                )
+                .filter(
+                    tuple_(
+                        FuncKeyDestGroupMember.group_id, FeatureExtension.feature
+                    ).in_(list(keys))
+                )
+            )
+            return {(row.group_id, feature): row for row, feature in query}
+
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: (
+                destination.group_id,
+                self.find_typeval(destination.action),
+            ),
+            find=find,
+            create=lambda destination, func_key_id: FuncKeyDestGroupMember(
+                func_key_id=func_key_id,
+                group_id=destination.group_id,
+                feature_extension_uuid=feature_extension_uuids[
+                    self.find_typeval(destination.action)
+                ],
+            ),
+        )
+
     def find_typeval(self, action):
         return GroupMemberActionExtensionConverter().to_typeval(action)
 
@@ -426,6 +641,9 @@ class ConferencePersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestConference, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestConference)
@@ -443,6 +661,20 @@ class ConferencePersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.conference_id,
+            find=lambda conference_ids: self._find_by(
+                FuncKeyDestConference,
+                FuncKeyDestConference.conference_id,
+                conference_ids,
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestConference(
+                func_key_id=func_key_id, conference_id=destination.conference_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -463,6 +695,9 @@ class PagingPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestPaging, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestPaging)
@@ -480,6 +715,18 @@ class PagingPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.paging_id,
+            find=lambda paging_ids: self._find_by(
+                FuncKeyDestPaging, FuncKeyDestPaging.paging_id, paging_ids
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestPaging(
+                func_key_id=func_key_id, paging_id=destination.paging_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -500,6 +747,9 @@ class BSFilterPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestBSFilter, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestBSFilter)
@@ -518,6 +768,21 @@ class BSFilterPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.filter_member_id,
+            find=lambda filtermember_ids: self._find_by(
+                FuncKeyDestBSFilter,
+                FuncKeyDestBSFilter.filtermember_id,
+                filtermember_ids,
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestBSFilter(
+                func_key_id=func_key_id,
+                filter_member_id=destination.filter_member_id,
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -535,6 +800,9 @@ class ServicePersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestService, func_key_ids)
+
     def find_or_create(self, destination):
         query = (
             self.session.query(FuncKeyDestService)
@@ -548,6 +816,20 @@ class ServicePersistor(DestinationPersistor):
 
         return query.first()
 
+    def find_or_create_many(self, destinations):
+        services = {destination.service for destination in destinations}
+        query = (
+            self.session.query(FuncKeyDestService, FeatureExtension.feature)
+            .join(
+                FeatureExtension,
+                FuncKeyDestService.feature_extension_uuid == FeatureExtension.uuid,
+            )
+            .filter(FeatureExtension.feature.in_(list(services)))
+        )
+        rows = {feature: row for row, feature in query}
+
+        return [rows.get(destination.service) for destination in destinations]
+
     def delete(self, func_key_id):
         pass
 
@@ -563,6 +845,9 @@ class ForwardPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestForward, func_key_ids)
+
     def find_or_create(self, destination):
         func_key_row = self.create_func_key(self.TYPE_ID, self.DESTINATION_TYPE_ID)
         feature_extension_uuid = self.find_extension_id(destination.forward)
@@ -577,6 +862,24 @@ class ForwardPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        converter = ForwardExtensionConverter()
+        feature_extension_uuids = self._find_feature_extension_uuids(
+            {converter.to_typeval(destination.forward) for destination in destinations}
+        )
+
+        rows = self._create_many(
+            dict(enumerate(destinations)),
+            lambda destination, func_key_id: FuncKeyDestForward(
+                func_key_id=func_key_id,
+                feature_extension_uuid=feature_extension_uuids.get(
+                    converter.to_typeval(destination.forward)
+                ),
+                number=destination.exten,
+            ),
+        )
+        return [rows[index] for index in range(len(destinations))]
+
     def find_extension_id(self, forward):
         typeval = ForwardExtensionConverter().to_typeval(forward)
 
@@ -605,6 +908,9 @@ class ParkPositionPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestParkPosition, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestParkPosition)
@@ -627,6 +933,30 @@ class ParkPositionPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        def find(keys):
+            query = self.session.query(FuncKeyDestParkPosition).filter(
+                tuple_(
+                    FuncKeyDestParkPosition.parking_lot_id,
+                    FuncKeyDestParkPosition.park_position,
+                ).in_(list(keys))
+            )
+            return {(row.parking_lot_id, row.park_position): row for row in query}
+
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: (
+                destination.parking_lot_id,
+                str(destination.position),
+            ),
+            find=find,
+            create=lambda destination, func_key_id: FuncKeyDestParkPosition(
+                func_key_id=func_key_id,
+                parking_lot_id=destination.parking_lot_id,
+                position=str(destination.position),
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -647,6 +977,9 @@ class ParkingPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestParking, func_key_ids)
+
     def find_or_create(self, destination):
         destination_row = (
             self.session.query(FuncKeyDestParking)
@@ -665,6 +998,18 @@ class ParkingPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: destination.parking_lot_id,
+            find=lambda parking_lot_ids: self._find_by(
+                FuncKeyDestParking, FuncKeyDestParking.parking_lot_id, parking_lot_ids
+            ),
+            create=lambda destination, func_key_id: FuncKeyDestParking(
+                func_key_id=func_key_id, parking_lot_id=destination.parking_lot_id
+            ),
+        )
+
     def delete(self, func_key_id):
         if not self._func_key_is_still_mapped(func_key_id):
             (
@@ -685,6 +1030,9 @@ class CustomPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestCustom, func_key_ids)
+
     def find_or_create(self, destination):
         func_key_row = self.create_func_key(self.TYPE_ID, self.DESTINATION_TYPE_ID)
 
@@ -697,6 +1045,15 @@ class CustomPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        rows = self._create_many(
+            dict(enumerate(destinations)),
+            lambda destination, func_key_id: FuncKeyDestCustom(
+                func_key_id=func_key_id, exten=destination.exten
+            ),
+        )
+        return [rows[index] for index in range(len(destinations))]
+
     def delete(self, func_key_id):
         (
             self.session.query(FuncKeyDestCustom)
@@ -716,6 +1073,9 @@ class AgentPersistor(DestinationPersistor):
 
         return query.first()
 
+    def get_many(self, func_key_ids):
+        return self._get_many(FuncKeyDestAgent, func_key_ids)
+
     def find_or_create(self, destination):
         typeval = self.find_typeval(destination.action)
 
@@ -747,6 +1107,42 @@ class AgentPersistor(DestinationPersistor):
 
         return destination_row
 
+    def find_or_create_many(self, destinations):
+        feature_extension_uuids = self._find_feature_extension_uuids(
+            {self.find_typeval(destination.action) for destination in destinations}
+        )
+
+        def find(keys):
+            query = (
+                self.session.query(FuncKeyDestAgent, FeatureExtension.feature)
+                .join(
+                    FeatureExtension,
+                    FuncKeyDestAgent.feature_extension_uuid == FeatureExtension.uuid,
+                )
+                .filter(
+                    tuple_(FuncKeyDestAgent.agent_id, FeatureExtension.feature).in_(
+                        list(keys)
+                    )
+                )
+            )
+            return {(row.agent_id, feature): row for row, feature in query}
+
+        return self._find_or_create_many(
+            destinations,
+            key=lambda destination: (
+                destination.agent_id,
+                self.find_typeval(destination.action),
+            ),
+            find=find,
+            create=lambda destination, func_key_id: FuncKeyDestAgent(
+                func_key_id=func_key_id,
+                agent_id=destination.agent_id,
+                feature_extension_uuid=feature_extension_uuids[
+                    self.find_typeval(destination.action)
+                ],
+            ),
+        )
+
     def find_typeval(self, action):
         return AgentActionExtensionConverter().to_typeval(action)
 
@@ -772,12 +1168,28 @@ class FeaturesPersistor(DestinationPersistor):
         )
 
         result = query.first()
+        return self._build_destination(result.var_name, result.id)
 
-        if result.var_name == 'togglerecord':
-            return FuncKeyDestOnlineRecording(feature_id=result.id)
+    def get_many(self, func_key_ids):
+        query = (
+            self.session.query(
+                FuncKeyDestFeatures.func_key_id, Features.var_name, Features.id
+            )
+            .join(Features, FuncKeyDestFeatures.features_id == Features.id)
+            .filter(FuncKeyDestFeatures.func_key_id.in_(list(func_key_ids)))
+        )
+
+        return {
+            row.func_key_id: self._build_destination(row.var_name, row.id)
+            for row in query
+        }
+
+    def _build_destination(self, var_name, feature_id):
+        if var_name == 'togglerecord':
+            return FuncKeyDestOnlineRecording(feature_id=feature_id)
 
-        transfer = self.TRANSFERS_TO_API[result.var_name]
-        return FuncKeyDestTransfer(feature_id=result.id, transfer=transfer)
+        transfer = self.TRANSFERS_TO_API[var_name]
+        return FuncKeyDestTransfer(feature_id=feature_id, transfer=transfer)
 
     def find_or_create(self, destination):
         varname = self.find_var_name(destination)
@@ -791,6 +1203,19 @@ class FeaturesPersistor(DestinationPersistor):
 
         return query.first()
 
+    def find_or_create_many(self, destinations):
+        var_names = {self.find_var_name(destination) for destination in destinations}
+        query = (
+            self.session.query(FuncKeyDestFeatures, Features.var_name)
+            .join(Features, FuncKeyDestFeatures.features_id == Features.id)
+            .filter(Features.var_name.in_(list(var_names)))
+        )
+        rows = {var_name: row for row, var_name in query}
+
+        return [
+            rows.get(self.find_var_name(destination)) for destination in destinations
+        ]
+
     def find_var_name(self, destination):
         if destination.type == 'transfer':
             return self.TRANSFERS_TO_DB[destination.transfer]
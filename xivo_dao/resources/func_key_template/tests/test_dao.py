@@ -1,9 +1,20 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from uuid import uuid4
 
-from hamcrest import assert_that, none, equal_to, calling, raises
+from hamcrest import (
+    assert_that,
+    calling,
+    contains_exactly,
+    equal_to,
+    has_entries,
+    has_length,
+    has_properties,
+    none,
+    not_,
+    raises,
+)
 
 from xivo_dao.helpers.exception import NotFoundError
 from xivo_dao.helpers.exception import InputError
@@ -665,6 +676,69 @@ class TestCreate(TestDao):
         )
         assert_that(dest_parking_count, equal_to(1))
 
+    def build_template_with_keys(self, destinations):
+        return FuncKeyTemplate(
+            tenant_uuid=self.default_tenant.uuid,
+            keys={
+                position: FuncKeyMapping(destination=destination)
+                for position, destination in enumerate(destinations, start=1)
+            },
+        )
+
+    def test_given_many_func_keys_when_creating_then_finds_or_creates_destinations(
+        self,
+    ):
+        existing_row = self.create_user_func_key()
+        user = self.add_user()
+        agent = self.add_agent()
+        self.add_extenfeatures('_*31.', 'agentstaticlogin')
+        template = self.build_template_with_keys(
+            [
+                FuncKeyDestUser(user_id=existing_row.user_id),
+                FuncKeyDestUser(user_id=user.id),
+                FuncKeyDestCustom(exten='1234'),
+                FuncKeyDestCustom(exten='1234'),
+                FuncKeyDestAgent(action='login', agent_id=agent.id),
+            ]
+        )
+
+        result = dao.create(template)
+
+        keys = result.keys
+        assert_that(list(keys), equal_to([1, 2, 3, 4, 5]))
+        assert_that(keys[1].id, equal_to(existing_row.func_key_id))
+        assert_that(keys[3].id, not_(equal_to(keys[4].id)))
+        assert_that(
+            keys[5].destination, has_properties(type='agent', agent_id=agent.id)
+        )
+        self.assert_mapping_has_destination(
+            'user', self.find_destination('user', user.id), position=2
+        )
+        agent_row = (
+            self.session.query(FuncKeyDestAgent)
+            .filter(FuncKeyDestAgent.agent_id == agent.id)
+            .one()
+        )
+        self.assert_mapping_has_destination('agent', agent_row, position=5)
+
+    def test_that_the_number_of_queries_does_not_grow_with_the_func_keys(self):
+        def destinations(count):
+            for _ in range(count):
+                yield FuncKeyDestUser(user_id=self.add_user().id)
+                yield FuncKeyDestCustom(exten=self._random_name())
+
+        template = self.build_template_with_keys(destinations(1))
+        with self.recorded_statements() as statements:
+            dao.create(template)
+        expected = len(statements)
+
+        template = self.build_template_with_keys(destinations(10))
+        with self.recorded_statements() as statements:
+            result = dao.create(template)
+
+        assert_that(result.keys, has_length(20))
+        assert_that(statements, has_length(expected))
+
 
 class TestGet(TestDao):
     def test_given_no_template_then_raises_error(self):
@@ -1416,3 +1490,62 @@ class TestSearch(TestDao):
         expected = SearchResult(1, [template2])
         tenants = [tenant.uuid]
         self.assert_search_returns_result(expected, tenant_uuids=tenants)
+
+    def add_template_with_func_keys(self, name, transfer_row):
+        template = self.add_func_key_template(name=name)
+        user_row = self.create_user_func_key()
+        queue_row = self.create_queue_func_key()
+        self.add_destination_to_template(user_row, template, position=1)
+        self.add_destination_to_template(queue_row, template, position=2)
+        self.add_destination_to_template(transfer_row, template, position=3)
+        return template, user_row, queue_row
+
+    def test_given_templates_with_func_keys_then_returns_keys_with_destinations(self):
+        transfer_row = self.create_features_func_key('featuremap', 'atxfer', '*2')
+        template, user_row, queue_row = self.add_template_with_func_keys(
+            'a', transfer_row
+        )
+        empty_template = self.add_func_key_template(name='b')
+
+        result = dao.search(order='name')
+
+        assert_that(result.items, contains_exactly(template, empty_template))
+        assert_that(
+            result.items[0].keys,
+            has_entries(
+                {
+                    1: has_properties(
+                        destination=has_properties(
+                            type='user', user_id=user_row.user_id
+                        ),
+                        inherited=True,
+                    ),
+                    2: has_properties(
+                        destination=has_properties(
+                            type='queue', queue_id=queue_row.queue_id
+                        )
+                    ),
+                    3: has_properties(
+                        destination=has_properties(type='transfer', transfer='attended')
+                    ),
+                }
+            ),
+        )
+        assert_that(result.items[1].keys, equal_to({}))
+
+    def test_that_the_number_of_queries_does_not_grow_with_the_templates(self):
+        transfer_row = self.create_features_func_key('featuremap', 'atxfer', '*2')
+        self.add_template_with_func_keys('a', transfer_row)
+        self.session.expire_all()
+        with self.recorded_statements() as statements:
+            dao.search()
+        expected = len(statements)
+
+        for _ in range(5):
+            self.add_template_with_func_keys(self._random_name(), transfer_row)
+        self.session.expire_all()
+        with self.recorded_statements() as statements:
+            result = dao.search()
+
+        assert_that(result.items, has_length(6))
+        assert_that(statements, has_length(expected))
@@ -1,7 +1,8 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from sqlalchemy.orm import Load
+from sqlalchemy import case
+from sqlalchemy.orm import Load, selectinload
 
 from xivo_dao.alchemy.endpoint_sip import EndpointSIP
 from xivo_dao.alchemy.extension import Extension
@@ -34,8 +35,48 @@ class LineFixes:
         self.fix_name(row)
         self.session.flush()
 
+    def fix_many(self, line_ids):
+        '''
+        Same as `fix` for many lines: the rows are loaded with one query, the
+        queue member interfaces are updated with one statement per channel type
+        and the lines and endpoints are updated by a single flush
+        '''
+        interfaces = []
+        for row in self.get_rows(line_ids):
+            self.fix_number_and_context(row)
+            interface = self.fix_endpoint(row)
+            self.fix_name(row)
+            self.fix_caller_id(row)
+            if interface and row.UserFeatures:
+                interfaces.append((row, interface))
+
+        self.fix_queue_members(interfaces)
+        self.session.flush()
+
     def get_row(self, line_id):
+        return self._rows_query().filter(LineFeatures.id == line_id).first()
+
+    def get_rows(self, line_ids):
+        line_ids = list(line_ids)
+        if not line_ids:
+            return []
+
+        # one row per line, preferring its main user and main extension
         query = (
+            self._rows_query()
+            .options(selectinload(EndpointSIP._endpoint_section))
+            .filter(LineFeatures.id.in_(line_ids))
+            .order_by(
+                LineFeatures.id,
+                UserLine.main_user.desc().nullslast(),
+                LineExtension.main_extension.desc().nullslast(),
+            )
+            .distinct(LineFeatures.id)
+        )
+        return query.all()
+
+    def _rows_query(self):
+        return (
             self.session.query(
                 LineFeatures,
                 EndpointSIP,
@@ -66,22 +107,22 @@ class LineFixes:
                 Load(UserCustom).load_only("id", "context"),
                 Load(Extension).load_only("id", "exten", "context"),
             )
-            .filter(LineFeatures.id == line_id)
         )
 
-        return query.first()
-
     def fix_protocol(self, row):
-        if row.EndpointSIP:
-            interface = f'PJSIP/{row.EndpointSIP.name}'
+        interface = self.fix_endpoint(row)
+        if interface:
             self.fix_queue_member(row, interface)
+
+    def fix_endpoint(self, row):
+        if row.EndpointSIP:
+            return f'PJSIP/{row.EndpointSIP.name}'
         elif row.SCCPLine:
             self.fix_sccp_line(row)
-            interface = f'SCCP/{row.SCCPLine.name}'
-            self.fix_queue_member(row, interface)
+            return f'SCCP/{row.SCCPLine.name}'
         elif row.UserCustom:
             row.UserCustom.context = row.LineFeatures.context
-            self.fix_queue_member(row, row.UserCustom.interface)
+            return row.UserCustom.interface
 
     def fix_sccp_line(self, row):
         if row.Extension:
@@ -123,3 +164,54 @@ class LineFixes:
                         .filter(QueueMember.channel == 'Local')
                         .update({'interface': local_interface})
                     )
+
+    def fix_queue_members(self, interfaces):
+        '''
+        `interfaces` is a list of (row, interface). Only the interfaces of the
+        lines that are the first line of their user are applied, as in
+        `fix_queue_member`.
+        '''
+        if not interfaces:
+            return
+
+        user_ids = list({row.UserFeatures.id for row, _ in interfaces})
+        first_lines = dict(
+            self.session.query(UserLine.user_id, UserLine.line_id)
+            .filter(UserLine.user_id.in_(user_ids))
+            .order_by(UserLine.user_id, UserLine.main_line.desc())
+            .distinct(UserLine.user_id)
+        )
+
+        channel_interfaces, local_interfaces = {}, {}
+        for row, interface in interfaces:
+            user_id = row.UserFeatures.id
+            if first_lines.get(user_id) != row.LineFeatures.id:
+                continue
+            channel_interfaces[user_id] = interface
+            if extension := row.Extension:
+                local_interface = f'Local/{extension.exten}@{extension.context}'
+                local_interfaces[user_id] = local_interface
+
+        self._update_queue_member_interfaces(
+            channel_interfaces, QueueMember.channel != 'Local'
+        )
+        self._update_queue_member_interfaces(
+            local_interfaces, QueueMember.channel == 'Local'
+        )
+
+    def _update_queue_member_interfaces(self, interfaces, channel_filter):
+        # interface is part of the primary key: the queue members of the session
+        # are not synchronized, they must be queried again
+        if not interfaces:
+            return
+
+        (
+            self.session.query(QueueMember)
+            .filter(QueueMember.usertype == 'user')
+            .filter(QueueMember.userid.in_(list(interfaces)))
+            .filter(channel_filter)
+            .update(
+                {'interface': case(interfaces, value=QueueMember.userid)},
+                synchronize_session=False,
+            )
+        )
@@ -1,8 +1,14 @@
-# Copyright 2015-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
-from hamcrest import assert_that, equal_to, none
+from hamcrest import (
+    assert_that,
+    contains_inanyorder,
+    equal_to,
+    has_properties,
+    none,
+)
 
 from xivo_dao.alchemy.linefeatures import LineFeatures as Line
 from xivo_dao.alchemy.endpoint_sip import EndpointSIP
@@ -366,3 +372,106 @@ class TestLineFixes(DAOTestCase):
         queue_member = self.session.query(QueueMember).first()
 
         assert_that(queue_member.interface, equal_to(f'Local/12345@{context.name}'))
+
+
+class TestLineFixesFixMany(DAOTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fixes = LineFixes(self.session)
+
+    def test_fix_many_without_lines(self):
+        self.fixes.fix_many([])
+
+    def test_given_many_lines_then_name_number_and_caller_id_updated(self):
+        context = self.add_context()
+        sip = self.add_endpoint_sip(name='abcdef')
+        sip_line = self.add_line(endpoint_sip_uuid=sip.uuid)
+        sccp = self.add_sccpline(name='ghijkl')
+        sccp_line = self.add_line(endpoint_sccp_id=sccp.id)
+        sip_user = self.add_user(firstname='John', lastname='Smith')
+        sccp_user = self.add_user(firstname='Jane', lastname='Doe')
+        sip_extension = self.add_extension(exten='1000', context=context.name)
+        sccp_extension = self.add_extension(exten='1001', context=context.name)
+        self.add_user_line(user_id=sip_user.id, line_id=sip_line.id)
+        self.add_user_line(user_id=sccp_user.id, line_id=sccp_line.id)
+        self.add_line_extension(line_id=sip_line.id, extension_id=sip_extension.id)
+        self.add_line_extension(line_id=sccp_line.id, extension_id=sccp_extension.id)
+
+        self.fixes.fix_many([sip_line.id, sccp_line.id])
+
+        self.session.expire_all()
+        sip_line = self.session.query(Line).get(sip_line.id)
+        sccp_line = self.session.query(Line).get(sccp_line.id)
+        assert_that(
+            sip_line,
+            has_properties(name='abcdef', number='1000', context=context.name),
+        )
+        assert_that(
+            sccp_line,
+            has_properties(name='ghijkl', number='1001', context=context.name),
+        )
+        assert_that(sip.caller_id, equal_to('"John Smith" <1000>'))
+        assert_that(sccp, has_properties(cid_name='Jane Doe', cid_num='1001'))
+
+    def test_given_many_lines_then_queue_member_interfaces_updated(self):
+        context = self.add_context()
+        sip = self.add_endpoint_sip(name='abcdef')
+        sip_line = self.add_line(endpoint_sip_uuid=sip.uuid)
+        sccp = self.add_sccpline(name='ghijkl')
+        sccp_line = self.add_line(endpoint_sccp_id=sccp.id)
+        sip_user = self.add_user()
+        sccp_user = self.add_user()
+        extension = self.add_extension(exten='12345', context=context.name)
+        self.add_user_line(user_id=sip_user.id, line_id=sip_line.id)
+        self.add_user_line(user_id=sccp_user.id, line_id=sccp_line.id)
+        self.add_line_extension(line_id=sip_line.id, extension_id=extension.id)
+        sip_channel = self.add_queue_member(
+            usertype='user', userid=sip_user.id, interface='PJSIP/default'
+        ).channel
+        self.add_queue_member(
+            usertype='user',
+            userid=sip_user.id,
+            interface='PJSIP/default',
+            channel='Local',
+        )
+        sccp_channel = self.add_queue_member(
+            usertype='user', userid=sccp_user.id, interface='SCCP/default'
+        ).channel
+
+        self.fixes.fix_many([sip_line.id, sccp_line.id])
+
+        self.session.expunge_all()
+        assert_that(
+            self.session.query(QueueMember).all(),
+            contains_inanyorder(
+                has_properties(
+                    userid=sip_user.id, channel=sip_channel, interface='PJSIP/abcdef'
+                ),
+                has_properties(
+                    userid=sip_user.id,
+                    channel='Local',
+                    interface=f'Local/12345@{context.name}',
+                ),
+                has_properties(
+                    userid=sccp_user.id, channel=sccp_channel, interface='SCCP/ghijkl'
+                ),
+            ),
+        )
+
+    def test_given_second_line_then_queue_member_interface_not_updated(self):
+        sip1 = self.add_endpoint_sip()
+        line1 = self.add_line(endpoint_sip_uuid=sip1.uuid)
+        sip2 = self.add_endpoint_sip(name='abcdef')
+        line2 = self.add_line(endpoint_sip_uuid=sip2.uuid)
+        user = self.add_user()
+        self.add_user_line(user_id=user.id, line_id=line1.id, main_line=True)
+        self.add_user_line(user_id=user.id, line_id=line2.id, main_line=False)
+        self.add_queue_member(
+            usertype='user', userid=user.id, interface='PJSIP/default'
+        )
+
+        self.fixes.fix_many([line2.id])
+
+        queue_member = self.session.query(QueueMember).first()
+
+        assert_that(queue_member.interface, equal_to('PJSIP/default'))
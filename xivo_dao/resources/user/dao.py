@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from contextlib import contextmanager
@@ -68,11 +68,21 @@ def create(user):
     return persistor().create(user)
 
 
+def create_many(users):
+    return persistor().create_many(users)
+
+
 def edit(user):
     persistor().edit(user)
     UserFixes(Session).fix(user.id)
 
 
+def edit_many(users):
+    users = list(users)
+    persistor().edit_many(users)
+    UserFixes(Session).fix_many([user.id for user in users])
+
+
 def delete(user):
     persistor().delete(user)
     template_persistor = build_template_persistor(Session)
@@ -1,4 +1,4 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao.alchemy.user_line import UserLine
@@ -19,6 +19,22 @@ class UserFixes:
         for user_line in user_lines:
             LineFixes(self.session).fix(user_line.line_id)
 
+    def fix_many(self, user_ids):
+        line_ids = self.find_main_user_line_ids(user_ids)
+        LineFixes(self.session).fix_many(line_ids)
+
+    def find_main_user_line_ids(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+        query = (
+            self.session.query(UserLine.line_id)
+            .filter(UserLine.main_user == True)  # noqa
+            .filter(UserLine.user_id.in_(user_ids))
+            .distinct()
+        )
+        return [line_id for line_id, in query]
+
     def find_user_line(self, user_id):
         return (
             self.session.query(UserLine.line_id)
@@ -1,4 +1,4 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from sqlalchemy.sql import func, cast
@@ -11,12 +11,16 @@ from xivo_dao.alchemy.extension import Extension
 from xivo_dao.alchemy.userfeatures import UserFeatures as User
 from xivo_dao.alchemy.func_key_template import FuncKeyTemplate
 from xivo_dao.helpers.db_manager import Session
+from xivo_dao.helpers.db_utils import next_ids
 
 from xivo_dao.helpers import errors
 from xivo_dao.helpers.persistor import BasePersistor
+from xivo_dao.helpers.sequence_utils import chunks
 from xivo_dao.resources.utils.query_options import QueryOptionsMixin
 from xivo_dao.resources.utils.search import SearchResult, CriteriaBuilderMixin
 
+DEFAULT_BATCH_SIZE = 500
+
 
 class UserPersistor(QueryOptionsMixin, CriteriaBuilderMixin, BasePersistor):
     _search_table = User
@@ -93,6 +97,41 @@ class UserPersistor(QueryOptionsMixin, CriteriaBuilderMixin, BasePersistor):
 
         return user
 
+    def create_many(self, users, batch_size=DEFAULT_BATCH_SIZE):
+        '''
+        Create users, with their lines and extensions if any, flushing once per
+        batch. The ids of the users and of their private templates are reserved
+        beforehand so that the rows are inserted with executemany.
+        '''
+        users = list(users)
+        for batch in chunks(users, batch_size):
+            self.prepare_templates(batch)
+            new_users = [user for user in batch if user.id is None]
+            for user, id_ in zip(
+                new_users, next_ids(self.session, User.id, len(new_users))
+            ):
+                user.id = id_
+            for user in batch:
+                user.fill_caller_id()
+
+            self.session.add_all(batch)
+            self.session.flush()
+
+        return users
+
+    def edit_many(self, users, batch_size=DEFAULT_BATCH_SIZE):
+        for batch in chunks(list(users), batch_size):
+            self.session.add_all(batch)
+            self.session.flush()
+
+    def prepare_templates(self, users):
+        users = [user for user in users if not user.func_key_private_template_id]
+        template_ids = next_ids(self.session, FuncKeyTemplate.id, len(users))
+        for user, template_id in zip(users, template_ids):
+            user.func_key_template_private = FuncKeyTemplate(
+                id=template_id, tenant_uuid=user.tenant_uuid, private=True
+            )
+
     def prepare_template(self, user):
         if not user.func_key_private_template_id:
             template = FuncKeyTemplate(tenant_uuid=user.tenant_uuid, private=True)
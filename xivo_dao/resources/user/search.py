@@ -1,9 +1,9 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from sqlalchemy.sql import and_, or_
 
-from xivo_dao.alchemy.userfeatures import UserFeatures
+from xivo_dao.alchemy.userfeatures import UserFeatures, search_document
 from xivo_dao.alchemy.linefeatures import LineFeatures
 from xivo_dao.alchemy.voicemail import Voicemail
 from xivo_dao.alchemy.user_line import UserLine
@@ -51,6 +51,7 @@ config = SearchConfig(
         'provisioning_code',
     ],
     default_sort='lastname',
+    search_document=search_document,
 )
 
 
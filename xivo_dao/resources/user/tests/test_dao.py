@@ -1,4 +1,4 @@
-# Copyright 2007-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2007-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -1008,6 +1008,52 @@ class TestCreate(TestUser):
         )
 
 
+class TestCreateMany(TestUser):
+    def test_create_many(self):
+        users = [
+            User(firstname=f'Jôhn{i}', tenant_uuid=self.default_tenant.uuid)
+            for i in range(3)
+        ]
+
+        created = user_dao.create_many(users)
+
+        rows = self.session.query(User).order_by(User.id).all()
+        assert_that(rows, contains_exactly(*created))
+        assert_that(
+            created,
+            contains_exactly(
+                has_properties(firstname='Jôhn0', caller_id='"Jôhn0"'),
+                has_properties(firstname='Jôhn1', caller_id='"Jôhn1"'),
+                has_properties(firstname='Jôhn2', caller_id='"Jôhn2"'),
+            ),
+        )
+        template_ids = {user.func_key_private_template_id for user in created}
+        assert_that(template_ids, not_(has_items(none())))
+        assert_that(len(template_ids), equal_to(3))
+
+    def test_create_many_in_batches(self):
+        users = [
+            User(firstname='John', tenant_uuid=self.default_tenant.uuid)
+            for _ in range(5)
+        ]
+
+        user_dao.persistor().create_many(users, batch_size=2)
+
+        assert_that(self.session.query(User).count(), equal_to(5))
+
+    def test_create_many_keeps_existing_template(self):
+        template = self.add_func_key_template(private=True)
+        user = User(
+            firstname='John',
+            tenant_uuid=self.default_tenant.uuid,
+            func_key_private_template_id=template.id,
+        )
+
+        user_dao.create_many([user])
+
+        assert_that(user.func_key_private_template_id, equal_to(template.id))
+
+
 class TestEdit(TestUser):
     def test_edit_all_fields(self):
         old_voicemail = self.add_voicemail()
@@ -1186,6 +1232,36 @@ class TestEdit(TestUser):
         assert_that(row.callerid, equal_to(caller_id))
 
 
+class TestEditMany(TestUser):
+    def test_edit_many(self):
+        user1 = self.add_user(firstname='Paul')
+        user2 = self.add_user(firstname='John')
+
+        user1.firstname = 'Pâul'
+        user2.caller_id = '<1000>'
+        user_dao.edit_many([user1, user2])
+
+        row1 = self.session.query(User).get(user1.id)
+        row2 = self.session.query(User).get(user2.id)
+        assert_that(row1.firstname, equal_to('Pâul'))
+        assert_that(row2.callerid, equal_to('<1000>'))
+
+    def test_edit_many_does_not_reload_users(self):
+        users = [self.add_user(firstname=f'user{i}') for i in range(3)]
+        for user in users:
+            user.description = 'edited'
+
+        with self.recorded_statements() as statements:
+            user_dao.edit_many(users)
+
+        reloads = [
+            statement
+            for statement in statements
+            if statement.startswith('SELECT') and 'FROM userfeatures' in statement
+        ]
+        assert_that(reloads, empty())
+
+
 class TestDelete(TestUser):
     def test_delete(self):
         user = self.add_user()
@@ -1,4 +1,4 @@
-# Copyright 2015-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2015-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from hamcrest import assert_that, equal_to
@@ -18,6 +18,27 @@ class TestUserFixes(DAOTestCase):
         user = self.add_user()
         self.fixes.fix(user.id)
 
+    def test_fix_many_updates_the_lines_of_each_user(self):
+        user1 = self.add_user(callerid='"John Smith" <1000>')
+        user2 = self.add_user(callerid='"George Green" <1001>')
+        sip1 = self.add_endpoint_sip(caller_id='"Roger Rabbit" <2000>')
+        sip2 = self.add_endpoint_sip(caller_id='"Jon Snow" <3000>')
+        line1 = self.add_line(endpoint_sip_uuid=sip1.uuid)
+        line2 = self.add_line(endpoint_sip_uuid=sip2.uuid)
+        self.add_user_line(user_id=user1.id, line_id=line1.id, main_user=True)
+        self.add_user_line(user_id=user2.id, line_id=line2.id, main_user=True)
+
+        self.fixes.fix_many([user1.id, user2.id])
+
+        self.session.expire_all()
+        sip1 = self.session.query(EndpointSIP).get(sip1.uuid)
+        sip2 = self.session.query(EndpointSIP).get(sip2.uuid)
+        assert_that(sip1.caller_id, equal_to(user1.callerid))
+        assert_that(sip2.caller_id, equal_to(user2.callerid))
+
+    def test_fix_many_without_users(self):
+        self.fixes.fix_many([])
+
     def test_given_user_has_multiple_lines_then_all_sip_lines_updated(self):
         user = self.add_user(callerid='"John Smith" <1000>')
         sip1 = self.add_endpoint_sip(caller_id='"Roger Rabbit" <2000>')
@@ -1,21 +1,28 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import base64
+import binascii
+import json
+import operator
 from typing import Any, NamedTuple
 
 from unidecode import unidecode
 
-import unicodedata
 import sqlalchemy as sa
 
 from sqlalchemy import sql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.sql.expression import ClauseElement, Executable
 from sqlalchemy.sql.functions import ReturnTypeFromArgs
 from sqlalchemy.types import Integer
 import re
 
 from xivo_dao.helpers import errors
+from xivo_dao.helpers.db_manager import read_only
 
 
 def contains_latin(text):
@@ -23,14 +30,39 @@ def contains_latin(text):
 
 
 class SearchResult(NamedTuple):
-    total: int
+    total: int | None
     items: list[Any]
 
+    @property
+    def after(self):
+        return getattr(self.items, 'after', None)
+
+
+class SearchPage(list):
+    '''
+    The rows of a search. With keyset pagination, `after` is the token to pass
+    to get the next page, or None when there is no next page.
+    '''
+
+    def __init__(self, rows=(), after=None):
+        super().__init__(rows)
+        self.after = after
+
 
 class unaccent(ReturnTypeFromArgs):
     pass
 
 
+class explain(Executable, ClauseElement):
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return f'EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}'
+
+
 class CriteriaBuilderMixin:
     def build_criteria(self, query, criteria):
         for name, value in criteria.items():
@@ -46,12 +78,29 @@ class CriteriaBuilderMixin:
 
 
 class SearchConfig:
-    def __init__(self, table, columns, default_sort, search=None, sort=None):
+    def __init__(
+        self,
+        table,
+        columns,
+        default_sort,
+        search=None,
+        sort=None,
+        search_document=None,
+    ):
         self.table = table
         self._columns = columns
         self._default_sort = default_sort
         self._search = search
         self._sort = sort
+        self.search_document = search_document
+
+        if search_document is not None:
+            extra = search_document.extra_expressions(self.all_search_columns())
+            if extra:
+                extra = ', '.join(str(expression) for expression in extra)
+                raise ValueError(
+                    f'Search document expressions are not search columns: {extra}'
+                )
 
     def all_search_columns(self):
         if self._search:
@@ -81,12 +130,19 @@ class SearchSystem:
         'desc': sql.desc,
     }
 
+    PAGINATIONS = ('offset', 'keyset')
+    COUNTS = ('exact', 'estimate', 'none')
+
     DEFAULTS = {
         'search': None,
         'order': None,
         'direction': 'asc',
         'limit': None,
         'offset': 0,
+        'pagination': 'offset',
+        'after': None,
+        'count': 'exact',
+        'collated': False,
     }
 
     def __init__(self, config):
@@ -105,19 +161,24 @@ class SearchSystem:
         self._validate_parameters(parameters)
         query = self._filter(query, parameters['search'])
         query = self._filter_exact_match(query, parameters)
-        sorted_query = self._sort(query, parameters['order'], parameters['direction'])
+
+        if parameters['pagination'] == 'keyset':
+            return self._search_keyset(query, parameters)
+
+        sorted_query = self._sort(
+            query, parameters['order'], parameters['direction'], parameters['collated']
+        )
         paginated_query = self._paginate(
             sorted_query, parameters['limit'], parameters['offset']
         )
 
-        return paginated_query.all(), sorted_query.count()
+        with read_only(query.session):
+            rows = SearchPage(self._fetch(query, paginated_query, parameters['limit']))
+            return rows, self._count(query, parameters['count'])
 
     def search_from_query_collated(self, query, parameters=None):
-        parameters, order, limit, offset, reverse = self._extract_search_params(
-            parameters
-        )
-        rows, total = self.search_from_query(query, parameters)
-        return self._apply_search_params(rows, order, limit, offset, reverse), total
+        parameters = dict(parameters or {}, collated=True)
+        return self.search_from_query(query, parameters)
 
     def _populate_parameters(self, parameters=None):
         new_params = dict(self.DEFAULTS)
@@ -137,19 +198,56 @@ class SearchSystem:
         if parameters['direction'] not in self.SORT_DIRECTIONS.keys():
             raise errors.invalid_direction(parameters['direction'])
 
+        if parameters['pagination'] not in self.PAGINATIONS:
+            raise errors.invalid_choice('pagination', self.PAGINATIONS)
+
+        if parameters['count'] not in self.COUNTS:
+            raise errors.invalid_choice('count', self.COUNTS)
+
+        if parameters['collated'] and parameters['pagination'] != 'offset':
+            raise errors.invalid_query_parameter('pagination', parameters['pagination'])
+
     def _filter(self, query, term=None):
         if not term:
             return query
 
+        clean_term = unidecode(term) if contains_latin(term) else term
+        document = self.config.search_document
+        if document is not None and document.is_available(query.session):
+            primary_key = sa.inspect(self.config.table).primary_key
+            if len(primary_key) == 1:
+                return self._filter_search_document(query, primary_key[0], clean_term)
+
         criteria = []
         for column in self.config.all_search_columns():
-            clean_term = unidecode(term) if contains_latin(term) else term
-            expression = unaccent(sql.cast(column, sa.String)).ilike(f'%{clean_term}%')
-            criteria.append(expression)
+            criteria.append(self._ilike(column, clean_term))
 
         query = query.filter(sql.or_(*criteria))
         return query
 
+    def _filter_search_document(self, query, id_column, term):
+        document = self.config.search_document
+        columns = [
+            column
+            for column in self.config.all_search_columns()
+            if not document.covers(column)
+        ]
+        if not columns:
+            return query.filter(document.match(term))
+
+        # Each column that is not part of the document is matched in its own
+        # select so that the indexed document match is not OR'ed with columns of
+        # joined tables, which would prevent the use of the index
+        matches = [sql.select([id_column]).where(document.match(term))]
+        for column in columns:
+            match = query.with_entities(id_column).filter(self._ilike(column, term))
+            matches.append(match.statement)
+
+        return query.filter(id_column.in_(sql.union(*matches)))
+
+    def _ilike(self, column, term):
+        return unaccent(sql.cast(column, sa.String)).ilike(f'%{term}%')
+
     def _filter_exact_match(self, query, parameters):
         for column_name, value in parameters.items():
             column = self.config.column_for_searching(column_name)
@@ -167,11 +265,171 @@ class SearchSystem:
         except ValueError:
             return False
 
-    def _sort(self, query, order=None, direction='asc'):
+    def _sort(self, query, order=None, direction='asc', collated=False):
         column = self.config.column_for_sorting(order)
         direction = self.SORT_DIRECTIONS[direction]
 
-        return query.order_by(direction(column))
+        # Without order, collated rows are sorted like the others
+        if not collated or order is None:
+            return query.order_by(direction(column))
+
+        # Unaccented values are compared by code point, empty values last. Rows
+        # with the same value keep the order of the default sort.
+        value = sql.func.coalesce(sql.cast(column, sa.String), '')
+        return query.order_by(
+            direction(value == ''),
+            direction(unaccent(value).collate('C')),
+            sql.asc(self.config.column_for_sorting()),
+        )
+
+    def _search_keyset(self, query, parameters):
+        column = self.config.column_for_sorting(parameters['order'])
+        primary_key = sa.inspect(self.config.table).primary_key
+        direction = parameters['direction']
+        order = self.SORT_DIRECTIONS[direction]
+
+        sorted_query = query.order_by(order(column), *(order(c) for c in primary_key))
+        if parameters['after']:
+            values = self._decode_after(parameters['after'], len(primary_key) + 1)
+            sorted_query = sorted_query.filter(
+                self._after_filter(column, primary_key, direction, values)
+            )
+
+        limit, offset = parameters['limit'], parameters['offset']
+        paginated_query = self._paginate(sorted_query, limit, offset)
+
+        with read_only(query.session):
+            rows = SearchPage(self._fetch(query, paginated_query, limit))
+            if limit and len(rows) == limit:
+                last = self._last_key(sorted_query, rows, column, primary_key, offset)
+                if last is not None:
+                    rows.after = self._encode_after(last)
+            return rows, self._count(query, parameters['count'])
+
+    def _last_key(self, sorted_query, rows, column, primary_key, offset):
+        '''
+        Sort value and primary key of the last row of the page, read from the
+        rows when they are instances of the searched table. If the last row was
+        deleted meanwhile, the key of the last remaining row is used instead, and
+        there is no key when every row of the page is gone.
+        '''
+        if not all(isinstance(row, self.config.table) for row in rows):
+            # The rows do not expose their primary key (e.g. a query on
+            # columns) so the key is fetched at the position of the last row
+            return (
+                sorted_query.with_entities(column, *primary_key)
+                .offset(offset + len(rows) - 1)
+                .limit(1)
+                .first()
+            )
+
+        identities = [sa.inspect(row).identity for row in rows]
+        if isinstance(column, InstrumentedAttribute) and column.class_ is type(
+            rows[-1]
+        ):
+            return (getattr(rows[-1], column.key), *identities[-1])
+
+        # The sort column is computed (e.g. a hybrid property) or belongs to a
+        # joined table: its values are selected by primary key
+        if len(primary_key) == 1:
+            page = primary_key[0].in_([identity[0] for identity in identities])
+        else:
+            page = sql.tuple_(*primary_key).in_(identities)
+        keys = {
+            tuple(key[1:]): tuple(key)
+            for key in sorted_query.with_entities(column, *primary_key)
+            .order_by(None)
+            .filter(page)
+        }
+        for identity in reversed(identities):
+            if identity in keys:
+                return keys[identity]
+        return None
+
+    def _after_filter(self, column, primary_key, direction, values):
+        value, key = values[0], values[1:]
+        compare = operator.gt if direction == 'asc' else operator.lt
+        if len(primary_key) == 1:
+            after_key = compare(primary_key[0], key[0])
+        else:
+            after_key = compare(sql.tuple_(*primary_key), sql.tuple_(*key))
+
+        # NULL values are sorted last in ascending order and first in descending
+        # order, as done by postgres
+        if value is None:
+            same_value = column.is_(None)
+            after_value = column.isnot(None) if direction == 'desc' else sql.false()
+        else:
+            same_value = column == value
+            after_value = compare(column, value)
+            if direction == 'asc':
+                after_value = sql.or_(after_value, column.is_(None))
+
+        return sql.or_(after_value, sql.and_(same_value, after_key))
+
+    def _encode_after(self, values):
+        encoded = json.dumps(list(values), default=str).encode()
+        return base64.urlsafe_b64encode(encoded).decode()
+
+    def _decode_after(self, after, length):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(after.encode()))
+        except (AttributeError, binascii.Error, UnicodeDecodeError, ValueError):
+            raise errors.invalid_query_parameter('after', after)
+
+        if not isinstance(values, list) or len(values) != length:
+            raise errors.invalid_query_parameter('after', after)
+        return values
+
+    def _fetch(self, query, paginated_query, limit=None):
+        '''
+        Eager loading joins are only applied to the rows of the page: the page
+        is first selected as a list of ids, then loaded with the eager options
+        '''
+        if not limit or not query._with_options or not self._is_entity(query):
+            return paginated_query.all()
+
+        primary_key = self._primary_key(query)
+        if len(primary_key) != 1:
+            return paginated_query.all()
+
+        id_column = primary_key[0]
+        ids = list(
+            dict.fromkeys(id_ for id_, in paginated_query.with_entities(id_column))
+        )
+        if not ids:
+            return []
+
+        positions = {id_: position for position, id_ in enumerate(ids)}
+        rows = query.filter(id_column.in_(ids)).all()
+        return sorted(rows, key=lambda row: positions[sa.inspect(row).identity[0]])
+
+    def _count(self, query, count='exact'):
+        if count == 'none':
+            return None
+
+        query = query.enable_eagerloads(False).order_by(None)
+        primary_key = self._primary_key(query)
+        if primary_key:
+            query = query.with_entities(*primary_key)
+
+        if count == 'estimate':
+            dialect = query.session.get_bind().dialect
+            if dialect.name == 'postgresql':
+                plan = query.session.execute(explain(query.statement)).scalar()
+                return int(plan[0]['Plan']['Plan Rows'])
+
+        return query.count()
+
+    def _primary_key(self, query):
+        entities = [description['entity'] for description in query.column_descriptions]
+        if self.config.table not in entities:
+            return None
+        return sa.inspect(self.config.table).primary_key
+
+    def _is_entity(self, query):
+        descriptions = query.column_descriptions
+        return len(descriptions) == 1 and descriptions[0]['type'] is self.config.table
 
     def _paginate(self, query, limit=None, offset=0):
         if offset > 0:
@@ -181,36 +439,3 @@ class SearchSystem:
             query = query.limit(limit)
 
         return query
-
-    def _extract_search_params(self, parameters):
-        parameters = self._populate_parameters(parameters)
-        self._validate_parameters(parameters)
-        self.config.column_for_sorting(parameters['order'])
-
-        order = parameters.pop('order', None)
-        limit = parameters.pop('limit', None)
-        offset = parameters.pop('offset', 0)
-        reverse = False if parameters.pop('direction', 'asc') == 'asc' else True
-        return parameters, order, limit, offset, reverse
-
-    def _apply_search_params(self, rows, order, limit, offset, reverse):
-        def _get_attr(o):
-            a = getattr(o, order, '')
-            return str(a) if a is not None else ''
-
-        if order:
-            rows = sorted(
-                rows,
-                key=lambda x: (
-                    _get_attr(x) == '',
-                    unicodedata.normalize('NFKD', _get_attr(x)),
-                ),
-                reverse=reverse,
-            )
-        elif reverse:
-            rows.reverse()
-
-        if not limit:
-            return rows[offset:]
-        else:
-            return rows[offset : offset + limit]
@@ -1,26 +1,38 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import unittest
 
-from unittest.mock import Mock, sentinel as s
+from unittest.mock import Mock, patch, sentinel as s
+from hamcrest import all_of
 from hamcrest import assert_that
 from hamcrest import calling
 from hamcrest import equal_to
 from hamcrest import contains_exactly
+from hamcrest import contains_string
 from hamcrest import contains_inanyorder
+from hamcrest import empty
+from hamcrest import has_item
 from hamcrest import has_length
+from hamcrest import has_properties
+from hamcrest import instance_of
 from hamcrest import is_in
+from hamcrest import none
+from hamcrest import not_
+from hamcrest import only_contains
 from hamcrest import raises
 
+from sqlalchemy.orm import joinedload
+
 from xivo_dao.tests.test_dao import DAOTestCase
 from xivo_dao.resources.utils.search import SearchConfig
 from xivo_dao.resources.utils.search import SearchSystem
 from xivo_dao.resources.utils.search import CriteriaBuilderMixin
 from xivo_dao.helpers.exception import InputError
 
-from xivo_dao.alchemy.userfeatures import UserFeatures
+from xivo_dao.alchemy.userfeatures import UserFeatures, search_document
+from xivo_dao.helpers.search_document import SearchDocument
 
 
 class TestCriteriaBuilderMixin(unittest.TestCase):
@@ -104,6 +116,16 @@ class TestSearchSystem(DAOTestCase):
         assert_that(total, equal_to(2))
         assert_that(rows, contains_exactly(first_user_row, last_user_row))
 
+    def test_given_no_order_then_collated_rows_use_the_default_sort(self):
+        with self.recorded_statements() as statements:
+            self.search.search_collated(self.session, {'direction': 'desc'})
+
+        assert_that(
+            statements,
+            has_item(contains_string('ORDER BY nullif(userfeatures.lastname')),
+        )
+        assert_that(statements, only_contains(not_(contains_string('COLLATE'))))
+
     def test_given_order_then_sorts_rows_using_order(self):
         user_row1 = self.add_user(firstname='Bob', lastname='Abigale')
         user_row2 = self.add_user(firstname='Alice', lastname='Zintrabi')
@@ -119,6 +141,18 @@ class TestSearchSystem(DAOTestCase):
         assert_that(total, equal_to(3))
         assert_that(rows, contains_exactly(user_row2, user_row3, user_row1))
 
+    def test_given_collated_order_then_paginates_collated_rows(self):
+        self.add_user(firstname='Bob', lastname='Abigale')
+        self.add_user(firstname='Alice', lastname='Zintrabi')
+        user_row3 = self.add_user(firstname='Áustin', lastname='Doe')
+
+        rows, total = self.search.search_collated(
+            self.session, {'order': 'firstname', 'limit': 1, 'offset': 1}
+        )
+
+        assert_that(total, equal_to(3))
+        assert_that(rows, contains_exactly(user_row3))
+
     def test_given_direction_then_sorts_rows_using_direction(self):
         first_user_row = self.add_user(lastname='Abigale')
         last_user_row = self.add_user(lastname='Zintrabi')
@@ -339,8 +373,246 @@ class TestSearchSystem(DAOTestCase):
             direction='invalid',
         )
 
+    def test_given_keyset_pagination_then_pages_through_all_rows(self):
+        user_row1 = self.add_user(lastname='Abigale')
+        user_row2 = self.add_user(lastname='Doe')
+        user_row3 = self.add_user(lastname='Abigale')
+        user_row4 = self.add_user(lastname='Zintrabi')
+
+        pages = []
+        after = None
+        while True:
+            rows, total = self.search.search(
+                self.session, {'pagination': 'keyset', 'limit': 3, 'after': after}
+            )
+            pages.append(list(rows))
+            after = rows.after
+            if not after:
+                break
+
+        assert_that(total, equal_to(4))
+        assert_that(
+            pages,
+            contains_exactly(
+                contains_exactly(user_row1, user_row3, user_row2),
+                contains_exactly(user_row4),
+            ),
+        )
+
+    def test_given_keyset_pagination_and_direction_then_pages_in_direction(self):
+        user_row1 = self.add_user(lastname='Abigale')
+        user_row2 = self.add_user(lastname='Zintrabi')
+        user_row3 = self.add_user(lastname='Doe')
+
+        parameters = {'pagination': 'keyset', 'limit': 2, 'direction': 'desc'}
+        rows, _ = self.search.search(self.session, dict(parameters))
+
+        assert_that(rows, contains_exactly(user_row2, user_row3))
+
+        parameters['after'] = rows.after
+        rows, _ = self.search.search(self.session, parameters)
+
+        assert_that(rows, contains_exactly(user_row1))
+        assert_that(rows.after, none())
+
+    def test_given_keyset_pagination_and_order_then_pages_in_order(self):
+        user_row1 = self.add_user(firstname='Bob')
+        user_row2 = self.add_user(firstname='Alice')
+        user_row3 = self.add_user(firstname='Charles')
+
+        parameters = {'pagination': 'keyset', 'limit': 2, 'order': 'firstname'}
+        rows, _ = self.search.search(self.session, dict(parameters))
+
+        assert_that(rows, contains_exactly(user_row2, user_row1))
+
+        parameters['after'] = rows.after
+        rows, _ = self.search.search(self.session, parameters)
+
+        assert_that(rows, contains_exactly(user_row3))
+
+    def test_given_keyset_pagination_when_rows_are_deleted_then_pages(self):
+        user_row1 = self.add_user(lastname='Abigale')
+        user_row2 = self.add_user(lastname='Doe')
+        user_row3 = self.add_user(lastname='Zintrabi')
+        fetch = self.search._fetch
+
+        def fetch_then_delete(*args, **kwargs):
+            rows = fetch(*args, **kwargs)
+            self.session.query(UserFeatures).filter(
+                UserFeatures.id == user_row2.id
+            ).delete(synchronize_session=False)
+            return rows
+
+        parameters = {'pagination': 'keyset', 'limit': 2}
+        with patch.object(self.search, '_fetch', side_effect=fetch_then_delete):
+            rows, _ = self.search.search(self.session, dict(parameters))
+
+        assert_that(rows, contains_exactly(user_row1, user_row2))
+
+        parameters['after'] = rows.after
+        rows, _ = self.search.search(self.session, parameters)
+
+        assert_that(rows, contains_exactly(user_row3))
+
+    def test_given_invalid_after_then_raises_error(self):
+        self.assertRaises(
+            InputError,
+            self.search.search,
+            self.session,
+            {'pagination': 'keyset', 'after': 'invalid'},
+        )
+
+    def test_given_keyset_pagination_when_collated_then_raises_error(self):
+        self.assertRaises(
+            InputError,
+            self.search.search_collated,
+            self.session,
+            {'pagination': 'keyset'},
+        )
+
+    def test_given_no_count_then_total_is_none(self):
+        user_row = self.add_user()
+
+        rows, total = self.search.search(self.session, {'count': 'none'})
+
+        assert_that(total, none())
+        assert_that(rows, contains_exactly(user_row))
+
+    def test_given_estimated_count_then_total_is_a_number(self):
+        self.add_user()
+
+        _, total = self.search.search(self.session, {'count': 'estimate'})
+
+        assert_that(total, instance_of(int))
+
+    def test_given_invalid_count_then_raises_error(self):
+        self.assertRaises(
+            InputError, self.search.search, self.session, {'count': 'invalid'}
+        )
+
+    def test_given_eager_loading_then_pages_and_counts_users_once(self):
+        user_row1 = self.add_user(lastname='Abigale')
+        user_row2 = self.add_user(lastname='Doe')
+        user_row3 = self.add_user(lastname='Zintrabi')
+        for user_row in (user_row1, user_row2, user_row3):
+            for _ in range(2):
+                line_row = self.add_line()
+                self.add_user_line(
+                    user_id=user_row.id, line_id=line_row.id, main_user=False
+                )
+        query = self.session.query(UserFeatures).options(joinedload('user_lines'))
+
+        rows, total = self.search.search_from_query(query, {'limit': 2, 'offset': 1})
+
+        assert_that(total, equal_to(3))
+        assert_that(
+            rows,
+            contains_exactly(
+                all_of(equal_to(user_row2), has_properties(user_lines=has_length(2))),
+                all_of(equal_to(user_row3), has_properties(user_lines=has_length(2))),
+            ),
+        )
+
+
+class TestSearchSystemWithSearchDocument(DAOTestCase):
+    def setUp(self):
+        super().setUp()
+        config = SearchConfig(
+            table=UserFeatures,
+            columns={
+                'lastname': UserFeatures.lastname,
+                'fullname': UserFeatures.firstname + " " + UserFeatures.lastname,
+                'caller_id': UserFeatures.callerid,
+                'description': UserFeatures.description,
+                'userfield': UserFeatures.userfield,
+                'email': UserFeatures.email,
+                'mobile_phone_number': UserFeatures.mobilephonenumber,
+                'preprocess_subroutine': UserFeatures.preprocess_subroutine,
+                'outgoing_caller_id': UserFeatures.outcallerid,
+                'username': UserFeatures.loginclient,
+                'simultcalls': UserFeatures.simultcalls,
+            },
+            search=[
+                'fullname',
+                'caller_id',
+                'description',
+                'userfield',
+                'email',
+                'mobile_phone_number',
+                'preprocess_subroutine',
+                'outgoing_caller_id',
+                'username',
+                'simultcalls',
+            ],
+            default_sort='lastname',
+            search_document=search_document,
+        )
+        self.search = SearchSystem(config)
+
+    def test_given_search_without_accent_term_then_searches_in_document(self):
+        user_row = self.add_user(firstname='accênt', lastname='Abigale')
+        self.add_user(firstname='other')
+
+        rows, total = self.search.search(self.session, {'search': 'accent'})
+
+        assert_that(total, equal_to(1))
+        assert_that(rows, contains_exactly(user_row))
+
+    def test_given_search_term_then_searches_in_columns_outside_of_document(self):
+        user_row1 = self.add_user(lastname='Abigale', simultcalls=42)
+        user_row2 = self.add_user(lastname='Doe', firstname='Bob42')
+        self.add_user(lastname='Zintrabi', simultcalls=5)
+
+        rows, total = self.search.search(self.session, {'search': '42'})
+
+        assert_that(total, equal_to(2))
+        assert_that(rows, contains_exactly(user_row1, user_row2))
+
+    def test_given_search_term_then_does_not_match_across_columns(self):
+        user_row = self.add_user(firstname='John', lastname='Doe', callerid='Smith')
+
+        rows, _ = self.search.search(self.session, {'search': 'john doe'})
+        assert_that(rows, contains_exactly(user_row))
+
+        rows, _ = self.search.search(self.session, {'search': 'doe smith'})
+        assert_that(rows, empty())
+
+    def test_given_document_is_not_indexed_then_searches_in_columns(self):
+        user_row = self.add_user(lastname='Doe', firstname='Bob42')
+        self.add_user(lastname='Zintrabi')
+
+        with patch.object(search_document, 'is_available', return_value=False):
+            rows, total = self.search.search(self.session, {'search': '42'})
+
+        assert_that(total, equal_to(1))
+        assert_that(rows, contains_exactly(user_row))
+
+    def test_is_available(self):
+        document = SearchDocument(UserFeatures.email)
+        document.index_name = 'userfeatures__idx__missing'
+
+        assert_that(search_document.is_available(self.session), equal_to(True))
+        assert_that(document.is_available(self.session), equal_to(False))
+
 
 class TestSearchConfig(unittest.TestCase):
+    def test_given_search_document_outside_of_search_columns_then_raises(self):
+        assert_that(
+            calling(SearchConfig).with_args(
+                table=UserFeatures,
+                columns={
+                    'firstname': UserFeatures.firstname,
+                    'email': UserFeatures.email,
+                },
+                search=['email'],
+                default_sort='firstname',
+                search_document=SearchDocument(
+                    UserFeatures.firstname, UserFeatures.email
+                ),
+            ),
+            raises(ValueError),
+        )
+
     def test_given_list_of_sort_columns_then_returns_columns_for_sorting(self):
         table = Mock()
         column = Mock()
@@ -1,7 +1,10 @@
-# Copyright 2013-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
+from xivo_dao.helpers.db_utils import copy_rows
+
+BULK_COLUMNS = ('time', 'login_time', 'pause_time', 'wrapup_time', 'stat_agent_id')
 
 
 def insert_stats(session, period_stats, period_start):
@@ -17,6 +20,13 @@ def insert_stats(session, period_stats, period_start):
         session.add(entry)
 
 
+def insert_many(session, rows):
+    '''
+    Insert tuples of BULK_COLUMNS values, for any number of periods and agents
+    '''
+    copy_rows(session, StatAgentPeriodic.__table__, BULK_COLUMNS, rows)
+
+
 def clean_table(session):
     session.query(StatAgentPeriodic).delete()
 
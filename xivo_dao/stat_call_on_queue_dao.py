@@ -1,14 +1,26 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
 from xivo_dao import stat_queue_dao
+from xivo_dao.helpers.db_utils import copy_rows
 from sqlalchemy import func, between, literal, literal_column
 from sqlalchemy.sql import text
 from sqlalchemy.sql.expression import extract, cast
 from sqlalchemy.types import Integer
 from datetime import timedelta
 
+BULK_COLUMNS = (
+    'callid',
+    'time',
+    'ringtime',
+    'talktime',
+    'waittime',
+    'status',
+    'stat_queue_id',
+    'stat_agent_id',
+)
+
 
 def _add_call(session, callid, time, queue_name, event, waittime=None):
     queue_id = int(stat_queue_dao.id_from_name(queue_name))
@@ -24,6 +36,13 @@ def _add_call(session, callid, time, queue_name, event, waittime=None):
     session.flush()
 
 
+def insert_many(session, rows):
+    '''
+    Insert tuples of BULK_COLUMNS values, the queues and agents given by id
+    '''
+    copy_rows(session, StatCallOnQueue.__table__, BULK_COLUMNS, rows)
+
+
 def add_abandoned_call(dao_sess, callid, time, queue_name, waittime):
     _add_call(dao_sess, callid, time, queue_name, 'abandoned', waittime)
 
@@ -1,8 +1,27 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import logging
+
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import and_, between, case, func, or_
 from sqlalchemy.sql import literal_column, text
 
+from xivo_dao import (
+    stat_agent_periodic_dao,
+    stat_call_on_queue_dao,
+    stat_queue_periodic_dao,
+)
+from xivo_dao.alchemy.context import Context
+from xivo_dao.alchemy.queue_log import QueueLog
+from xivo_dao.alchemy.stat_agent import StatAgent
+from xivo_dao.alchemy.stat_queue import StatQueue
+from xivo_dao.helpers.datetime import split_by_period
+
+logger = logging.getLogger(__name__)
+
 _STR_TIME_FMT = "%Y-%m-%d %H:%M:%S.%f%z"
 
 FILL_ANSWERED_CALL_ON_QUEUE_QUERY = text(
@@ -154,50 +173,70 @@ def _run_sql_function_returning_void(session, start, end, function):
 
 
 def get_pause_intervals_in_range(session, start, end):
+    # Each PAUSEALL is paired with the next UNPAUSEALL of its agent, the
+    # PAUSEALL following another PAUSEALL being merged with it. In a single
+    # ordered scan of the range, the kept rows alternate between pauses and
+    # unpauses, so the end of a pause is the time of the next kept row.
+    # An UNPAUSEALL at the same time as a PAUSEALL is sorted before it as it
+    # cannot end it.
     pause_in_range = '''\
-SELECT stat_agent.id AS agent,
-       MIN(pauseall) AS pauseall,
-       unpauseall
-  FROM (
-    SELECT agent, time AS pauseall,
-      (
-        SELECT time
-        FROM queue_log
-        WHERE event = 'UNPAUSEALL' AND
-          agent = pause_all.agent AND
-          time > pause_all.time
-        ORDER BY time ASC limit 1
-      ) AS unpauseall
-    FROM queue_log AS pause_all
-    WHERE event = 'PAUSEALL'
+WITH pause_events AS (
+  SELECT agent, event, time,
+    LAG(event) OVER (PARTITION BY agent ORDER BY time, event DESC) AS previous_event
+  FROM queue_log
+  WHERE event IN ('PAUSEALL', 'UNPAUSEALL')
     AND time >= :start
-    ORDER BY agent, time DESC
-  ) AS pauseall, stat_agent
-  WHERE stat_agent.name = agent
-  GROUP BY stat_agent.id, unpauseall
+    AND time <= :end
+),
+pause_bounds AS (
+  SELECT agent, event, time,
+    LEAD(time) OVER (PARTITION BY agent ORDER BY time, event DESC) AS next_time
+  FROM pause_events
+  WHERE (event = 'PAUSEALL' AND previous_event IS DISTINCT FROM 'PAUSEALL')
+    OR (event = 'UNPAUSEALL' AND previous_event = 'PAUSEALL')
+)
+SELECT stat_agent.id AS agent,
+       stat_agent.name AS agent_name,
+       pause_bounds.time AS pauseall,
+       pause_bounds.next_time AS unpauseall
+  FROM pause_bounds
+  JOIN stat_agent ON stat_agent.name = pause_bounds.agent
+  WHERE pause_bounds.event = 'PAUSEALL'
 '''
 
-    start = start.strftime(_STR_TIME_FMT)
-    end = end.strftime(_STR_TIME_FMT)
+    formatted_start = start.strftime(_STR_TIME_FMT)
+    formatted_end = end.strftime(_STR_TIME_FMT)
 
     rows = (
         session.query(
             literal_column('agent'),
+            literal_column('agent_name'),
             literal_column('pauseall'),
             literal_column('unpauseall'),
         )
         .from_statement(text(pause_in_range))
-        .params(start=start, end=end)
+        .params(start=formatted_start, end=formatted_end)
+        .all()
     )
 
-    results = {}
+    # Pauses still ongoing at the end of the range end with the first
+    # UNPAUSEALL following it
+    paused_agents = {row.agent_name for row in rows if row.unpauseall is None}
+    unpauses = {}
+    if paused_agents:
+        unpauses = dict(
+            session.query(QueueLog.agent, func.min(QueueLog.time))
+            .filter(QueueLog.event == 'UNPAUSEALL')
+            .filter(QueueLog.time > formatted_end)
+            .filter(QueueLog.agent.in_(paused_agents))
+            .group_by(QueueLog.agent)
+        )
 
-    for row in rows.all():
-        agent_id = row.agent
-        if agent_id not in results:
-            results[agent_id] = []
+    results = {}
 
-        results[agent_id].append((row.pauseall, row.unpauseall))
+    for row in rows:
+        unpauseall = row.unpauseall or unpauses.get(row.agent_name)
+        results.setdefault(row.agent, []).append((row.pauseall, unpauseall))
 
     return results
 
@@ -407,3 +446,736 @@ HAVING
         agent_last_logouts[agent] = row.logout
 
     return agent_last_logins, agent_last_logouts
+
+
+CALL_STREAM_LOOKAHEAD = timedelta(days=1)
+WRAPUP_LOOKBACK = timedelta(minutes=2)
+LOGIN_LOOKBACK = timedelta(days=31)
+STREAM_BATCH_SIZE = 1000
+
+_SIMPLE_CALL_STATUSES = {
+    'FULL': 'full',
+    'DIVERT_CA_RATIO': 'divert_ca_ratio',
+    'DIVERT_HOLDTIME': 'divert_waittime',
+    'CLOSED': 'closed',
+    'JOINEMPTY': 'joinempty',
+}
+
+
+class QueueLogAggregator:
+    '''
+    Computes the calls and the periodic statistics of [start, end] with a single
+    scan of queue_log, ordered by time. Each row is dispatched to the metrics
+    listening to its event, which keep their own state.
+
+    The rows are read from `start - WRAPUP_LOOKBACK` to `end`, to find the
+    wrapups started just before the range. The calls and pauses still open at
+    the end of the range are then ended by a second query on their callids and
+    agents, up to CALL_STREAM_LOOKAHEAD after the range. The calls are those
+    that started in the range, so that consecutive ranges do not count a call
+    twice. `start` and `end` must be timezone aware.
+    '''
+
+    def __init__(self, session, start, end, interval):
+        self.session = session
+        self.start = start
+        self.end = end
+        self.interval = interval
+        self.answered = _AnsweredCalls(start, end)
+        self.abandoned = _EndedCalls(start, end, 'ABANDON', 'abandoned')
+        self.timeout = _EndedCalls(start, end, 'EXITWITHTIMEOUT', 'timeout')
+        self.simple = _SimpleCalls(start, end)
+        self.leaveempty = _LeaveEmptyCalls(start, end)
+        self.logins = _Logins(start, end)
+        self.pauses = _Pauses(start, end)
+        self.wrapups = _Wrapups(start, end)
+        self._names = None
+
+    @property
+    def metrics(self):
+        return (
+            self.answered,
+            self.abandoned,
+            self.timeout,
+            self.simple,
+            self.leaveempty,
+            self.logins,
+            self.pauses,
+            self.wrapups,
+        )
+
+    def run(self):
+        handlers = defaultdict(list)
+        for metric in self.metrics:
+            for event in metric.EVENTS:
+                handlers[event].append(metric)
+
+        self.logins.load_last_logins(self._last_logins_and_logouts())
+        for row in self._stream(list(handlers)):
+            for metric in handlers[row.event]:
+                metric.handle(row)
+
+        for row in self._stream_after_end(list(handlers)):
+            for metric in handlers[row.event]:
+                metric.handle(row)
+        self.logins.end_logins(self._agents_logged_after_end())
+
+        self._names = _StatNames.load(self.session)
+        return self
+
+    def calls(self):
+        '''
+        Rows of stat_call_on_queue, for every exit status
+        '''
+        calls = []
+        for metric in (
+            self.answered,
+            self.abandoned,
+            self.timeout,
+            self.simple,
+            self.leaveempty,
+        ):
+            calls.extend(metric.calls(self._names))
+        return calls
+
+    def login_intervals(self):
+        '''
+        Same result as `get_login_intervals_in_range`
+        '''
+        return self.logins.intervals(self._names)
+
+    def pause_intervals(self):
+        '''
+        Same result as `get_pause_intervals_in_range`, for the pauses starting
+        before `end`
+        '''
+        return self.pauses.intervals(self._names)
+
+    def wrapup_times(self):
+        '''
+        Wrapup time of each agent by period, like
+        `queue_log_dao.get_wrapup_times`
+        '''
+        results = defaultdict(dict)
+        for agent_id, wrapups in self.wrapups.intervals(self._names).items():
+            for wrapup_start, wrapup_end in wrapups:
+                for period, duration in self._split(wrapup_start, wrapup_end):
+                    times = results[period].setdefault(
+                        agent_id, {'wrapup_time': timedelta(0)}
+                    )
+                    times['wrapup_time'] += duration
+        return dict(results)
+
+    def queue_periodic_stats(self, calls=None):
+        '''
+        Number of calls of each queue by period and status, like
+        `stat_call_on_queue_dao.get_periodic_stats_hour`
+        '''
+        stats = defaultdict(dict)
+        for call in self.calls() if calls is None else calls:
+            if not self.start <= call['time'] <= self.end:
+                continue
+            period = self._period(call['time'])
+            queue_stats = stats[period].setdefault(call['stat_queue_id'], {'total': 0})
+            queue_stats[call['status']] = queue_stats.get(call['status'], 0) + 1
+            queue_stats['total'] += 1
+        return dict(stats)
+
+    def agent_periodic_stats(self):
+        '''
+        Login, pause and wrapup time of each agent by period, as expected by
+        `stat_agent_periodic_dao.insert_stats`
+        '''
+        stats = defaultdict(dict)
+        for name, intervals in (
+            ('login_time', self.login_intervals()),
+            ('pause_time', self.pause_intervals()),
+        ):
+            for agent_id, agent_intervals in intervals.items():
+                for interval_start, interval_end in agent_intervals:
+                    interval_end = self.end if interval_end is None else interval_end
+                    for period, duration in self._split(interval_start, interval_end):
+                        times = stats[period].setdefault(agent_id, {})
+                        times[name] = times.get(name, timedelta(0)) + duration
+
+        for period, agents in self.wrapup_times().items():
+            for agent_id, times in agents.items():
+                stats[period].setdefault(agent_id, {}).update(times)
+        return dict(stats)
+
+    def _period(self, time):
+        return self.start + (time - self.start) // self.interval * self.interval
+
+    def _split(self, begin, end):
+        '''
+        Duration of [begin, end] in each period of the range
+        '''
+        periods_end = self._period(self.end) + self.interval
+        return split_by_period(begin, end, self.start, periods_end, self.interval)
+
+    def _stream(self, events):
+        return (
+            self.session.query(
+                QueueLog.time,
+                QueueLog.callid,
+                QueueLog.queuename,
+                QueueLog.agent,
+                QueueLog.event,
+                QueueLog.data1,
+                QueueLog.data2,
+                QueueLog.data3,
+                QueueLog.data4,
+                QueueLog.data5,
+            )
+            .filter(QueueLog.event.in_(events))
+            .filter(between(QueueLog.time, self.start - WRAPUP_LOOKBACK, self.end))
+            .order_by(QueueLog.time, QueueLog.id)
+            .yield_per(STREAM_BATCH_SIZE)
+        )
+
+    def _stream_after_end(self, events):
+        '''
+        Rows after the range of the calls and pauses still open at its end: the
+        calls that entered a queue in the range and did not end in it
+        '''
+        callids = self.answered.open_callids()
+        for metric in (self.abandoned, self.timeout, self.leaveempty):
+            callids -= metric.ended_callids()
+        agents = self.pauses.open_agents()
+        if not callids and not agents:
+            return ()
+
+        return (
+            self.session.query(
+                QueueLog.time,
+                QueueLog.callid,
+                QueueLog.queuename,
+                QueueLog.agent,
+                QueueLog.event,
+                QueueLog.data1,
+                QueueLog.data2,
+                QueueLog.data3,
+                QueueLog.data4,
+                QueueLog.data5,
+            )
+            .filter(QueueLog.event.in_(events))
+            .filter(
+                or_(
+                    QueueLog.callid.in_(callids),
+                    and_(QueueLog.agent.in_(agents), QueueLog.event == 'UNPAUSEALL'),
+                )
+            )
+            .filter(QueueLog.time > self.end)
+            .filter(QueueLog.time < self.end + CALL_STREAM_LOOKAHEAD)
+            .order_by(QueueLog.time, QueueLog.id)
+            .yield_per(STREAM_BATCH_SIZE)
+        )
+
+    def _last_logins_and_logouts(self):
+        '''
+        Last login and logout of each agent in the LOGIN_LOOKBACK before the
+        range
+        '''
+        last_login = func.max(
+            case([(QueueLog.event == 'AGENTCALLBACKLOGIN', QueueLog.time)])
+        )
+        last_logout = func.max(
+            case([(QueueLog.event == 'AGENTCALLBACKLOGOFF', QueueLog.time)])
+        )
+        return (
+            self.session.query(QueueLog.agent, last_login, last_logout)
+            .filter(QueueLog.event.in_(_Logins.EVENTS))
+            .filter(QueueLog.time >= self.start - LOGIN_LOOKBACK)
+            .filter(QueueLog.time < self.start)
+            .group_by(QueueLog.agent)
+        )
+
+    def _agents_logged_after_end(self):
+        '''
+        Agents logged in at the end of the range that logged in or out after it
+        '''
+        agents = self.logins.ongoing_agents()
+        if not agents:
+            return ()
+        return (
+            agent
+            for agent, in self.session.query(QueueLog.agent)
+            .filter(QueueLog.event.in_(_Logins.EVENTS))
+            .filter(QueueLog.agent.in_(agents))
+            .filter(QueueLog.time > self.end)
+            .distinct()
+        )
+
+
+def fill_periodic_stats(session, start, end, interval):
+    '''
+    Insert the calls of [start, end] in stat_call_on_queue and their periodic
+    statistics in stat_queue_periodic and stat_agent_periodic, reading queue_log
+    once. Replaces the fill_*_calls functions followed by the insertion of the
+    periodic statistics, except that answered calls are counted with the range
+    they entered rather than the range they ended in, and logins older than
+    LOGIN_LOOKBACK are not ongoing.
+    '''
+    aggregator = QueueLogAggregator(session, start, end, interval).run()
+
+    calls = aggregator.calls()
+    stat_call_on_queue_dao.insert_many(
+        session,
+        (
+            (
+                call['callid'],
+                call['time'],
+                0,
+                call['talktime'],
+                call['waittime'],
+                call['status'],
+                call['stat_queue_id'],
+                call['stat_agent_id'],
+            )
+            for call in calls
+        ),
+    )
+
+    stat_queue_periodic_dao.insert_many(
+        session,
+        (
+            tuple(
+                dict(queue_stats, time=period, stat_queue_id=queue_id).get(column, 0)
+                for column in stat_queue_periodic_dao.BULK_COLUMNS
+            )
+            for period, queues in aggregator.queue_periodic_stats(calls).items()
+            for queue_id, queue_stats in queues.items()
+        ),
+    )
+
+    stat_agent_periodic_dao.insert_many(
+        session,
+        (
+            (
+                period,
+                times.get('login_time', timedelta(0)),
+                times.get('pause_time', timedelta(0)),
+                times.get('wrapup_time', timedelta(0)),
+                agent_id,
+            )
+            for period, agents in aggregator.agent_periodic_stats().items()
+            for agent_id, times in agents.items()
+        ),
+    )
+
+
+class _StatNames:
+    '''
+    Ids of the stat_queue and stat_agent rows referenced by name in queue_log
+    '''
+
+    def __init__(self, queues, agents, contexts):
+        self.queues = {}
+        for queue_id, name, tenant_uuid in queues:
+            self.queues.setdefault(name, (queue_id, tenant_uuid))
+        self.agent_ids = defaultdict(list)
+        self.tenant_agent_ids = {}
+        for agent_id, name, tenant_uuid in agents:
+            self.agent_ids[name].append(agent_id)
+            self.tenant_agent_ids.setdefault((name, tenant_uuid), agent_id)
+        self.context_tenants = dict(contexts)
+
+    @classmethod
+    def load(cls, session):
+        return cls(
+            session.query(StatQueue.id, StatQueue.name, StatQueue.tenant_uuid)
+            .order_by(StatQueue.id)
+            .all(),
+            session.query(StatAgent.id, StatAgent.name, StatAgent.tenant_uuid)
+            .order_by(StatAgent.id)
+            .all(),
+            session.query(Context.name, Context.tenant_uuid).all(),
+        )
+
+    def queue_id(self, name):
+        return self.queues.get(name, (None, None))[0]
+
+    def agent_id(self, name, queue_name):
+        tenant_uuid = self.queues.get(queue_name, (None, None))[1]
+        return self.tenant_agent_ids.get((name, tenant_uuid))
+
+    def by_agent_id(self, intervals_by_name):
+        results = defaultdict(list)
+        for name, intervals in intervals_by_name.items():
+            for agent_id in self.agent_ids.get(name, ()):
+                results[agent_id].extend(intervals)
+        return results
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _call(callid, time, queue_id, status, waittime=0, talktime=0, agent_id=None):
+    return {
+        'callid': callid,
+        'time': time,
+        'talktime': talktime,
+        'waittime': waittime or 0,
+        'stat_queue_id': queue_id,
+        'stat_agent_id': agent_id,
+        'status': status,
+    }
+
+
+class _AnsweredCalls:
+    '''
+    Same calls as FILL_ANSWERED_CALL_ON_QUEUE_QUERY: an ended call is matched
+    with every ENTERQUEUE of its queue in the range, or starts at its end minus
+    its talk and wait time when there is none.
+
+    Unlike the query, a call belongs to the range it entered, so that dirty
+    periods can be computed apart from their neighbours: a call of the range may
+    end up to CALL_STREAM_LOOKAHEAD after it, unless it entered its queue again,
+    and a call ending in the range but starting before it is left to the range
+    it started in.
+
+    The query fails on a duration that cannot be read, which is 0 here, the
+    default of the stat_call_on_queue columns. A call without ENTERQUEUE and
+    without its durations has no start and is dropped.
+    '''
+
+    EVENTS = (
+        'ENTERQUEUE',
+        'COMPLETEAGENT',
+        'COMPLETECALLER',
+        'ATTENDEDTRANSFER',
+        'BLINDTRANSFER',
+        'TRANSFER',
+    )
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.starts = defaultdict(list)
+        self.ended = set()
+        self.skipped = set()
+        self.ends = []
+
+    def handle(self, row):
+        if row.time < self.start:
+            return
+        key = (row.callid, row.queuename)
+        if row.event == 'ENTERQUEUE':
+            if row.time <= self.end:
+                self.starts[key].append(row.time)
+            else:
+                self.skipped.add(key)
+            return
+
+        if row.time > self.end:
+            if key not in self.starts or key in self.ended or key in self.skipped:
+                return
+        self.ended.add(key)
+
+        talktime, waittime = self._durations(row)
+        if talktime is None or waittime is None:
+            logger.error('(callid=%s) Invalid %s durations', row.callid, row.event)
+        self.ends.append((row, talktime, waittime))
+
+    def open_callids(self):
+        '''
+        Calls that entered a queue in the range and were not answered in it
+        '''
+        return {callid for callid, queuename in self.starts.keys() - self.ended}
+
+    @staticmethod
+    def _durations(row):
+        if row.event in ('COMPLETEAGENT', 'COMPLETECALLER'):
+            return _to_int(row.data2), _to_int(row.data1)
+        if row.event in ('BLINDTRANSFER', 'TRANSFER'):
+            return _to_int(row.data4), _to_int(row.data3)
+        if row.data1 in ('BRIDGE', 'APP'):
+            return _to_int(row.data4), _to_int(row.data3)
+        if row.data1 == 'LINK':
+            return _to_int((row.data5 or '').split('|')[0]), _to_int(row.data4)
+        return None, None
+
+    def calls(self, names):
+        calls = {}
+        for row, talktime, waittime in self.ends:
+            times = self.starts.get((row.callid, row.queuename))
+            if not times:
+                if talktime is None or waittime is None:
+                    continue
+                time = row.time - timedelta(seconds=talktime + waittime)
+                if time < self.start:
+                    continue
+                times = [time]
+            for time in times:
+                key = (row.callid, row.queuename, row.agent, time, talktime, waittime)
+                calls[key] = _call(
+                    row.callid,
+                    time,
+                    names.queue_id(row.queuename),
+                    'answered',
+                    waittime,
+                    talktime or 0,
+                    names.agent_id(row.agent, row.queuename),
+                )
+        return sorted(calls.values(), key=lambda call: call['time'])
+
+
+class _EndedCalls:
+    '''
+    Same calls as `queue_log_dao.get_queue_abandoned_call` and
+    `get_queue_timeout_call`: the end event is paired with the last ENTERQUEUE
+    of its call, unless the call entered a queue again after the range
+    '''
+
+    def __init__(self, start, end, event, status):
+        self.EVENTS = ('ENTERQUEUE', event)
+        self.start = start
+        self.end = end
+        self.status = status
+        self.enter_queues = {}
+        self.skipped = set()
+        self.paired = set()
+        self.pairs = []
+
+    def handle(self, row):
+        if row.time < self.start or row.callid in self.skipped:
+            return
+        if row.event == 'ENTERQUEUE':
+            if row.time > self.end:
+                self.skipped.add(row.callid)
+            else:
+                self.enter_queues[row.callid] = row
+            return
+
+        enter_queue = self.enter_queues.get(row.callid)
+        if enter_queue is not None:
+            self.paired.add(row.callid)
+            self.pairs.append((enter_queue, row))
+
+    def ended_callids(self):
+        return self.paired
+
+    def calls(self, names):
+        for enter_queue, end_event in self.pairs:
+            waittime = _to_int(end_event.data3)
+            if waittime is None:
+                logger.error(
+                    "(callid=%s) Invalid waittime: %s",
+                    end_event.callid,
+                    end_event.data3,
+                )
+            yield _call(
+                enter_queue.callid,
+                enter_queue.time,
+                names.queue_id(enter_queue.queuename),
+                self.status,
+                waittime,
+            )
+
+
+class _SimpleCalls:
+    '''
+    Same calls as the fill_simple_calls SQL function
+    '''
+
+    EVENTS = tuple(_SIMPLE_CALL_STATUSES)
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.rows = []
+
+    def handle(self, row):
+        if self.start <= row.time <= self.end:
+            self.rows.append(row)
+
+    def calls(self, names):
+        for row in self.rows:
+            yield _call(
+                row.callid,
+                row.time,
+                names.queue_id(row.queuename),
+                _SIMPLE_CALL_STATUSES[row.event],
+            )
+
+
+class _LeaveEmptyCalls:
+    '''
+    Same calls as the fill_leaveempty_calls SQL function: a LEAVEEMPTY is paired
+    with the last ENTERQUEUE of its call in the same queue, which must be in the
+    range
+    '''
+
+    EVENTS = ('ENTERQUEUE', 'LEAVEEMPTY')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.enter_times = {}
+        self.paired = set()
+        self.pairs = []
+
+    def handle(self, row):
+        if row.time < self.start:
+            return
+        key = (row.callid, row.queuename)
+        if row.event == 'ENTERQUEUE':
+            self.enter_times[key] = row.time
+            return
+
+        enter_time = self.enter_times.get(key)
+        if enter_time is not None and enter_time <= self.end:
+            self.paired.add(key)
+            self.pairs.append((enter_time, row))
+
+    def ended_callids(self):
+        return {callid for callid, queuename in self.paired}
+
+    def calls(self, names):
+        for enter_time, row in self.pairs:
+            yield _call(
+                row.callid,
+                enter_time,
+                names.queue_id(row.queuename),
+                'leaveempty',
+                int((row.time - enter_time).total_seconds()),
+            )
+
+
+class _Logins:
+    '''
+    Login intervals of `get_login_intervals_in_range`. The logouts of the range
+    give the completed logins. Like `_get_ongoing_logins`, a login is ongoing
+    until the end of the range when it is the last login of its agent, before
+    `end`, and no logout followed it, even after `end`: an agent logging out or
+    in again after the range has no ongoing login.
+
+    Unlike `_get_last_logins_and_logouts`, which reads the whole queue_log, the
+    state of the agents at the start of the range is read from the
+    LOGIN_LOOKBACK before it: an agent logged in for longer without logging in
+    or out again has no ongoing login.
+    '''
+
+    EVENTS = ('AGENTCALLBACKLOGIN', 'AGENTCALLBACKLOGOFF')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.last_logins = {}
+        self.last_logouts = {}
+        self.completed = []
+
+    def load_last_logins(self, rows):
+        for agent, login, logout in rows:
+            self.last_logins[agent] = login
+            self.last_logouts[agent] = logout
+
+    def handle(self, row):
+        if not self.start <= row.time <= self.end:
+            return
+        if row.event == 'AGENTCALLBACKLOGIN':
+            self.last_logins[row.agent] = row.time
+            return
+
+        self.last_logouts[row.agent] = row.time
+        duration = _to_int(row.data2)
+        context = (row.data1 or '').partition('@')[2]
+        if row.time > self.start and duration and duration > 0 and context:
+            login = row.time - timedelta(seconds=duration)
+            self.completed.append(
+                (row.agent, context, max(login, self.start), row.time)
+            )
+
+    def ongoing_agents(self):
+        ongoing = set()
+        for agent, login in self.last_logins.items():
+            logout = self.last_logouts.get(agent)
+            if login and login < self.end and (not logout or logout < login):
+                ongoing.add(agent)
+        return ongoing
+
+    def end_logins(self, agents):
+        for agent in agents:
+            self.last_logins.pop(agent, None)
+
+    def intervals(self, names):
+        completed_logins = defaultdict(list)
+        for agent, context, login, logout in self.completed:
+            tenant_uuid = names.context_tenants.get(context)
+            agent_id = names.tenant_agent_ids.get((agent, tenant_uuid))
+            if agent_id is not None:
+                completed_logins[agent_id].append((login, logout))
+
+        ongoing_logins = {
+            agent: [(max(self.last_logins[agent], self.start), self.end)]
+            for agent in self.ongoing_agents()
+        }
+
+        results = _merge_agent_statistics(
+            dict(completed_logins), dict(names.by_agent_id(ongoing_logins))
+        )
+        return {
+            agent_id: sorted(set(_pick_longest_with_same_end(logins)))
+            for agent_id, logins in results.items()
+        }
+
+
+class _Pauses:
+    '''
+    Pause intervals of `get_pause_intervals_in_range`: the PAUSEALL of the range
+    are paired with the next UNPAUSEALL of their agent, consecutive PAUSEALL
+    keeping the first one. The end is None when the agent is still paused.
+    '''
+
+    EVENTS = ('PAUSEALL', 'UNPAUSEALL')
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.paused = {}
+        self.pauses = defaultdict(list)
+
+    def handle(self, row):
+        if row.event == 'PAUSEALL':
+            if self.start <= row.time <= self.end:
+                self.paused.setdefault(row.agent, row.time)
+            return
+
+        pause = self.paused.get(row.agent)
+        if pause is not None and row.time > pause:
+            self.pauses[row.agent].append((self.paused.pop(row.agent), row.time))
+
+    def open_agents(self):
+        return set(self.paused)
+
+    def intervals(self, names):
+        pauses = defaultdict(list, self.pauses)
+        for agent, pause in self.paused.items():
+            pauses[agent].append((pause, None))
+        return dict(names.by_agent_id(pauses))
+
+
+class _Wrapups:
+    '''
+    Wrapups started in the range or just before it, with their end
+    '''
+
+    EVENTS = ('WRAPUPSTART',)
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.wrapups = defaultdict(list)
+
+    def handle(self, row):
+        duration = _to_int(row.data1)
+        if row.time <= self.end and duration is not None:
+            wrapup_end = row.time + timedelta(seconds=duration)
+            self.wrapups[row.agent].append((row.time, wrapup_end))
+
+    def intervals(self, names):
+        return names.by_agent_id(self.wrapups)
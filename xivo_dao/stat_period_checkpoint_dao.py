@@ -0,0 +1,319 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from bisect import bisect_left
+from datetime import timedelta
+
+from sqlalchemy import between, case, func
+from sqlalchemy.sql.expression import extract
+
+from xivo_dao import stat_call_on_queue_dao, stat_dao
+from xivo_dao.alchemy.queue_log import QueueLog
+from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
+from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
+from xivo_dao.alchemy.stat_period_checkpoint import StatPeriodCheckpoint
+from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
+
+ONE_MICROSECOND = timedelta(microseconds=1)
+# Checkpoint of a computed period without queue_log rows
+EMPTY_WATERMARK = (0, 0)
+
+CALL_END_EVENTS = (
+    'COMPLETEAGENT',
+    'COMPLETECALLER',
+    'ATTENDEDTRANSFER',
+    'BLINDTRANSFER',
+    'TRANSFER',
+    'ABANDON',
+    'EXITWITHTIMEOUT',
+    'LEAVEEMPTY',
+)
+AGENT_STATE_EVENTS = (
+    'AGENTCALLBACKLOGIN',
+    'AGENTCALLBACKLOGOFF',
+    'PAUSEALL',
+    'UNPAUSEALL',
+)
+
+
+def find_dirty_periods(session, start, end, interval):
+    '''
+    Periods of [start, end] whose queue_log rows were inserted or deleted since
+    their statistics were computed, or that were never computed. A period
+    without rows is only dirty when an agent is logged in or paused during it.
+    '''
+    watermarks = _get_watermarks(session, start, end, interval)
+    agent_states = _AgentStates(session, start, end)
+    return _find_dirty_periods(session, start, end, interval, watermarks, agent_states)
+
+
+def regenerate_dirty_periods(session, start, end, interval):
+    '''
+    Recompute the statistics of the dirty periods of [start, end] only, then
+    record their queue_log watermarks. Consecutive dirty periods are computed
+    together.
+
+    The events of a period pair with events of its neighbours: a call ends after
+    the period it entered, a login or a pause spans several periods. So each run
+    of dirty periods is widened to the periods of the calls ending in it, of the
+    pauses ongoing at its start and of the logins and pauses ongoing at its end,
+    until the runs contain every event they pair with.
+    '''
+    watermarks = _get_watermarks(session, start, end, interval)
+    agent_states = _AgentStates(session, start, end)
+    dirty_periods = _find_dirty_periods(
+        session, start, end, interval, watermarks, agent_states
+    )
+    periods = _widen_periods(session, dirty_periods, start, end, interval, agent_states)
+
+    for range_start, range_end in _contiguous_ranges(periods, interval):
+        _remove_stats(session, range_start, range_end)
+        stat_dao.fill_periodic_stats(session, range_start, range_end, interval)
+
+    _save_checkpoints(session, periods, interval, watermarks)
+    return periods
+
+
+def clean_table(session):
+    session.query(StatPeriodCheckpoint).delete()
+
+
+def remove_after(session, date):
+    session.query(StatPeriodCheckpoint).filter(
+        StatPeriodCheckpoint.time >= date
+    ).delete()
+
+
+def _get_watermarks(session, start, end, interval):
+    period_index = func.floor(
+        extract('epoch', QueueLog.time - start) / interval.total_seconds()
+    )
+    rows = (
+        session.query(
+            period_index.label('period_index'),
+            func.count(QueueLog.id),
+            func.max(QueueLog.id),
+        )
+        .filter(between(QueueLog.time, start, end))
+        .group_by('period_index')
+    )
+    return {
+        start + int(index) * interval: (count, max_id) for index, count, max_id in rows
+    }
+
+
+def _find_dirty_periods(session, start, end, interval, watermarks, agent_states):
+    checkpoints = {
+        checkpoint.time: (checkpoint.queue_log_count, checkpoint.queue_log_max_id)
+        for checkpoint in session.query(StatPeriodCheckpoint)
+        .filter(StatPeriodCheckpoint.interval == interval)
+        .filter(between(StatPeriodCheckpoint.time, start, end))
+    }
+    periods = set(watermarks) | set(checkpoints)
+    dirty_periods = {
+        period
+        for period in periods
+        if watermarks.get(period, EMPTY_WATERMARK) != checkpoints.get(period)
+    }
+
+    quiet_periods = [
+        period
+        for period in _enumerate_periods(start, end, interval)
+        if period not in periods
+    ]
+    for range_start, range_end in _contiguous_ranges(quiet_periods, interval):
+        logged_in, paused = agent_states.at(range_start)
+        if logged_in or paused:
+            dirty_periods.update(_enumerate_periods(range_start, range_end, interval))
+    return sorted(dirty_periods)
+
+
+def _widen_periods(session, periods, start, end, interval, agent_states):
+    periods = set(periods)
+    widened = True
+    while widened:
+        widened = False
+        for range_start, range_end in _contiguous_ranges(sorted(periods), interval):
+            begin, finish = _paired_events_span(
+                session, range_start, range_end, agent_states
+            )
+            begin, finish = max(begin, start), min(finish, end)
+            new_periods = set(_enumerate_periods(begin, finish, interval, start))
+            if not new_periods <= periods:
+                periods |= new_periods
+                widened = True
+    return sorted(periods)
+
+
+def _paired_events_span(session, start, end, agent_states):
+    '''
+    Span of the events paired with the events of [start, end]: the ENTERQUEUE
+    of the calls ending in the range, the start of the pauses ongoing at the
+    start of the range and the end of the logins and pauses ongoing at its end,
+    or the end of `agent_states` when they do not end before it
+    '''
+    begin, finish = start, end
+
+    ended_callids = (
+        session.query(QueueLog.callid)
+        .filter(QueueLog.event.in_(CALL_END_EVENTS))
+        .filter(between(QueueLog.time, start, end))
+    )
+    first_enter_queue = (
+        session.query(func.min(QueueLog.time))
+        .filter(QueueLog.event == 'ENTERQUEUE')
+        .filter(QueueLog.time < start)
+        .filter(QueueLog.time >= start - stat_dao.CALL_STREAM_LOOKAHEAD)
+        .filter(QueueLog.callid.in_(ended_callids.subquery()))
+        .scalar()
+    )
+    if first_enter_queue is not None:
+        begin = min(begin, first_enter_queue)
+
+    _, paused = agent_states.at(start)
+    if paused:
+        begin = min(begin, min(paused.values()))
+
+    logged_in, paused = agent_states.at(end + ONE_MICROSECOND)
+    for agents, event in (
+        (logged_in, 'AGENTCALLBACKLOGOFF'),
+        (paused, 'UNPAUSEALL'),
+    ):
+        for agent in agents:
+            finish = max(finish, agent_states.next_event(agent, event, end))
+
+    return begin, finish
+
+
+class _AgentStates:
+    '''
+    Logins and pauses of the agents over [start, end], read once: the state of
+    each agent at `start`, then the login, logoff, pause and unpause events of
+    the range. The state at `start` is read from the LOGIN_LOOKBACK before it,
+    like the logins of QueueLogAggregator.
+    '''
+
+    # at the same time, a logoff ends a login and a pause starts after an
+    # unpause, the same comparisons as _Logins and _Pauses
+    EVENT_ORDER = {
+        'AGENTCALLBACKLOGIN': 0,
+        'AGENTCALLBACKLOGOFF': 1,
+        'UNPAUSEALL': 0,
+        'PAUSEALL': 1,
+    }
+
+    def __init__(self, session, start, end):
+        self.end = end
+        self.initial = self._ongoing_logins_and_pauses(session, start)
+        rows = (
+            session.query(QueueLog.time, QueueLog.agent, QueueLog.event)
+            .filter(QueueLog.event.in_(AGENT_STATE_EVENTS))
+            .filter(between(QueueLog.time, start, end))
+        )
+        self.events = sorted(
+            rows, key=lambda row: (row.time, self.EVENT_ORDER[row.event])
+        )
+        self.times = [row.time for row in self.events]
+
+    def at(self, time):
+        '''
+        Agents logged in and agents paused just before `time`, with the time of
+        their login and pause
+        '''
+        logged_in, paused = (dict(agents) for agents in self.initial)
+        for row in self.events[: bisect_left(self.times, time)]:
+            if row.event == 'AGENTCALLBACKLOGIN':
+                logged_in[row.agent] = row.time
+            elif row.event == 'AGENTCALLBACKLOGOFF':
+                logged_in.pop(row.agent, None)
+            elif row.event == 'PAUSEALL':
+                paused.setdefault(row.agent, row.time)
+            else:
+                paused.pop(row.agent, None)
+        return logged_in, paused
+
+    def next_event(self, agent, event, time):
+        '''
+        Time of the first `event` of `agent` after `time`, or the end of the
+        range when there is none
+        '''
+        for row in self.events[bisect_left(self.times, time) :]:
+            if row.time > time and row.agent == agent and row.event == event:
+                return row.time
+        return self.end
+
+    @staticmethod
+    def _ongoing_logins_and_pauses(session, time):
+        last = {
+            event: func.max(case([(QueueLog.event == event, QueueLog.time)]))
+            for event in AGENT_STATE_EVENTS
+        }
+        rows = (
+            session.query(QueueLog.agent, *last.values())
+            .filter(QueueLog.event.in_(AGENT_STATE_EVENTS))
+            .filter(QueueLog.time >= time - stat_dao.LOGIN_LOOKBACK)
+            .filter(QueueLog.time < time)
+            .group_by(QueueLog.agent)
+        )
+
+        logged_in, paused = {}, {}
+        for agent, login, logout, pause, unpause in rows:
+            if login and (not logout or logout < login):
+                logged_in[agent] = login
+            if pause and (not unpause or unpause <= pause):
+                paused[agent] = pause
+        return logged_in, paused
+
+
+def _enumerate_periods(begin, end, interval, start=None):
+    '''
+    Periods of [begin, end], found by their offset from `start`
+    '''
+    start = begin if start is None else start
+    period = start + (begin - start) // interval * interval
+    while period <= end:
+        yield period
+        period += interval
+
+
+def _contiguous_ranges(periods, interval):
+    ranges = []
+    for period in periods:
+        if ranges and ranges[-1][1] == period:
+            ranges[-1][1] = period + interval
+        else:
+            ranges.append([period, period + interval])
+    return [
+        (range_start, range_end - ONE_MICROSECOND) for range_start, range_end in ranges
+    ]
+
+
+def _remove_stats(session, start, end):
+    callids = stat_call_on_queue_dao.find_all_callid_between_date(session, start, end)
+    stat_call_on_queue_dao.remove_callids(session, callids)
+    for model in (StatCallOnQueue, StatQueuePeriodic, StatAgentPeriodic):
+        session.query(model).filter(between(model.time, start, end)).delete(
+            synchronize_session=False
+        )
+
+
+def _save_checkpoints(session, periods, interval, watermarks):
+    if not periods:
+        return
+
+    session.query(StatPeriodCheckpoint).filter(
+        StatPeriodCheckpoint.interval == interval
+    ).filter(StatPeriodCheckpoint.time.in_(periods)).delete(synchronize_session=False)
+
+    rows = []
+    for period in periods:
+        count, max_id = watermarks.get(period, EMPTY_WATERMARK)
+        rows.append(
+            {
+                'time': period,
+                'interval': interval,
+                'queue_log_count': count,
+                'queue_log_max_id': max_id,
+            }
+        )
+    session.execute(StatPeriodCheckpoint.__table__.insert(), rows)
@@ -1,9 +1,25 @@
-# Copyright 2013-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
+from xivo_dao.helpers.db_utils import copy_rows
 from sqlalchemy.sql.functions import max
 
+BULK_COLUMNS = (
+    'time',
+    'stat_queue_id',
+    'answered',
+    'abandoned',
+    'full',
+    'closed',
+    'joinempty',
+    'leaveempty',
+    'divert_ca_ratio',
+    'divert_waittime',
+    'timeout',
+    'total',
+)
+
 
 def insert_stats(session, stats, period_start):
     for queue_id, queue_stats in stats.items():
@@ -24,6 +40,13 @@ def insert_stats(session, stats, period_start):
         session.add(entry)
 
 
+def insert_many(session, rows):
+    '''
+    Insert tuples of BULK_COLUMNS values, for any number of periods and queues
+    '''
+    copy_rows(session, StatQueuePeriodic.__table__, BULK_COLUMNS, rows)
+
+
 def get_most_recent_time(session):
     res = session.query(max(StatQueuePeriodic.time)).first()[0]
     if res is None:
@@ -0,0 +1,67 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import os
+import time
+import tracemalloc
+import unittest
+
+from typing import Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_ENV = 'WAZO_DAO_BENCHMARK'
+
+requires_benchmark = unittest.skipUnless(
+    os.environ.get(BENCHMARK_ENV),
+    f'benchmarks only run when {BENCHMARK_ENV} is set',
+)
+
+
+def benchmark_size(default):
+    '''
+    Number of rows of a benchmark, overridden by the value of WAZO_DAO_BENCHMARK
+    when it is a number
+    '''
+    value = os.environ.get(BENCHMARK_ENV, '')
+    return int(value) if value.isdigit() and int(value) > 1 else default
+
+
+class Measure(NamedTuple):
+    result: Any
+    seconds: float
+    peak_bytes: int
+
+    def __str__(self):
+        return f'{self.seconds:.3f}s, peak {self.peak_bytes / 2**20:.1f} MiB'
+
+
+def measure(func, *args, **kwargs):
+    '''
+    Duration of a call and peak of the memory allocated in Python during the
+    call. The call is made twice: tracing the allocations slows it down, so the
+    duration is measured on the untraced call.
+    '''
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measure(result, seconds, peak_bytes)
+
+
+def report(name, **measures):
+    '''
+    Log the measures of a benchmark, shown by pytest with --log-cli-level=INFO
+    '''
+    lines = [f'{name}:']
+    lines.extend(f'  {label}: {value}' for label, value in measures.items())
+    logger.info('\n'.join(lines))
@@ -1,7 +1,15 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from hamcrest import assert_that, contains_exactly, empty, has_properties, none
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    contains_inanyorder,
+    empty,
+    has_length,
+    has_properties,
+    none,
+)
 from xivo_dao import agent_status_dao
 from xivo_dao.tests.test_dao import DAOTestCase, UNKNOWN_UUID
 from xivo_dao.alchemy.agent_login_status import AgentLoginStatus
@@ -438,6 +446,33 @@ class TestAgentStatusDao(DAOTestCase):
             ),
         )
 
+    def test_get_statuses_for_queue_loads_user_ids_in_one_query(self):
+        queue = self._insert_queue(1, 'queue1', '3000')
+        agent1 = self.add_agent()
+        agent2 = self.add_agent()
+        user1 = self.add_user(agentid=agent1.id)
+        user2 = self.add_user(agentid=agent1.id)
+        for agent in (agent1, agent2):
+            self._insert_agent_queue_member(agent.id, queue.name)
+            self._insert_agent_login_status(agent.id, agent.number)
+        queue_id, user_ids = queue.id, (user1.id, user2.id)
+        agent_ids = agent1.id, agent2.id
+        self.session.expire_all()
+
+        with self.recorded_statements() as statements:
+            statuses = agent_status_dao.get_statuses_for_queue(queue_id)
+
+        assert_that(
+            statuses,
+            contains_inanyorder(
+                has_properties(
+                    agent_id=agent_ids[0], user_ids=contains_inanyorder(*user_ids)
+                ),
+                has_properties(agent_id=agent_ids[1], user_ids=empty()),
+            ),
+        )
+        assert_that(statements, has_length(1))
+
     def test_get_statuses_to_add_to_queue(self):
         agent1 = self.add_agent()
         agent2 = self.add_agent()
@@ -1,10 +1,11 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import warnings
 
 from contextlib import contextmanager
+from operator import itemgetter
 from hamcrest import (
     all_of,
     assert_that,
@@ -13,6 +14,7 @@ from hamcrest import (
     empty,
     equal_to,
     has_entries,
+    has_length,
     has_items,
     has_properties,
     not_,
@@ -22,8 +24,13 @@ from unittest.mock import patch
 from wazo_test_helpers.hamcrest.uuid_ import uuid_
 from xivo_dao import asterisk_conf_dao
 from xivo_dao.alchemy.agentqueueskill import AgentQueueSkill
+from xivo_dao.alchemy.endpoint_sip import EndpointSIP, EndpointSIPTemplate
+from xivo_dao.alchemy.endpoint_sip_section import EndpointSIPSection
+from xivo_dao.alchemy.endpoint_sip_section_option import EndpointSIPSectionOption
 from xivo_dao.alchemy.iaxcallnumberlimits import IAXCallNumberLimits
 from xivo_dao.alchemy.func_key_dest_custom import FuncKeyDestCustom
+from xivo_dao.alchemy.linefeatures import LineFeatures
+from xivo_dao.tests.benchmark import benchmark_size, measure, report, requires_benchmark
 from xivo_dao.tests.test_dao import DAOTestCase
 
 
@@ -665,6 +672,72 @@ class TestAsteriskConfDAO(DAOTestCase, PickupHelperMixin):
         extensions = asterisk_conf_dao.find_exten_settings(default_context.name)
         assert_that(extensions, empty())
 
+    def test_stream_exten_settings(self):
+        default_context = self.add_context(name='default')
+        self.add_extension(exten='12', context=default_context.name)
+        self.add_extension(exten='23', context=default_context.name)
+        self.add_extension(exten='34', context=default_context.name, typeval='0')
+        self.add_extension(exten='41', context=self.add_context().name)
+
+        result = asterisk_conf_dao.stream_exten_settings(default_context.name)
+
+        expected = asterisk_conf_dao.find_exten_settings(default_context.name)
+        assert_that(list(result), equal_to(expected))
+
+    def test_find_exten_settings_by_context(self):
+        context1 = self.add_context()
+        context2 = self.add_context()
+        context3 = self.add_context()
+        exten1 = self.add_extension(exten='12', context=context1.name)
+        exten2 = self.add_extension(exten='23', context=context2.name)
+        self.add_extension(exten='34', context=context2.name, type='parking')
+        self.add_extension(exten='45', context=context3.name)
+
+        result = asterisk_conf_dao.find_exten_settings_by_context(
+            [context1.name, context2.name]
+        )
+
+        assert_that(
+            result,
+            equal_to(
+                {
+                    context1.name: asterisk_conf_dao.find_exten_settings(context1.name),
+                    context2.name: asterisk_conf_dao.find_exten_settings(context2.name),
+                }
+            ),
+        )
+        assert_that(
+            result,
+            has_entries(
+                {
+                    context1.name: contains_exactly(
+                        has_entries(id=exten1.id, tenant_uuid=context1.tenant_uuid)
+                    ),
+                    context2.name: contains_exactly(
+                        has_entries(id=exten2.id, tenant_uuid=context2.tenant_uuid)
+                    ),
+                }
+            ),
+        )
+
+    def test_find_exten_settings_by_context_all_contexts(self):
+        context1 = self.add_context()
+        context2 = self.add_context()
+        self.add_extension(exten='12', context=context1.name)
+        self.add_extension(exten='23', context=context2.name)
+
+        result = asterisk_conf_dao.find_exten_settings_by_context()
+
+        assert_that(
+            result,
+            has_entries(
+                {
+                    context1.name: contains_exactly(has_entries(exten='12')),
+                    context2.name: contains_exactly(has_entries(exten='23')),
+                }
+            ),
+        )
+
     def test_find_context_settings(self):
         context1 = self.add_context()
         context2 = self.add_context()
@@ -691,6 +764,16 @@ class TestAsteriskConfDAO(DAOTestCase, PickupHelperMixin):
             ),
         )
 
+    def test_stream_context_settings(self):
+        self.add_context()
+        self.add_context()
+        self.add_context(commented=1)
+
+        result = asterisk_conf_dao.stream_context_settings()
+
+        expected = asterisk_conf_dao.find_context_settings()
+        assert_that(list(result), equal_to(expected))
+
     def test_find_contextincludes_settings(self):
         default_context = self.add_context(name='default')
         context_koki = self.add_context(name='koki')
@@ -712,6 +795,29 @@ class TestAsteriskConfDAO(DAOTestCase, PickupHelperMixin):
             ),
         )
 
+    def test_find_contextincludes_settings_by_context(self):
+        context1 = self.add_context()
+        context2 = self.add_context()
+        context3 = self.add_context()
+        include1 = self.add_context_include(context=context1.name, priority=2)
+        include2 = self.add_context_include(context=context1.name, priority=1)
+        include3 = self.add_context_include(context=context2.name)
+        self.add_context_include(context=context3.name)
+
+        result = asterisk_conf_dao.find_contextincludes_settings_by_context(
+            [context1.name, context2.name]
+        )
+
+        assert_that(
+            result,
+            equal_to(
+                {
+                    context1.name: [include2.todict(), include1.todict()],
+                    context2.name: [include3.todict()],
+                }
+            ),
+        )
+
     def test_find_voicemail_activated(self):
         vm = self.add_voicemail()
         self.add_voicemail(commented=1)
@@ -740,6 +846,15 @@ class TestAsteriskConfDAO(DAOTestCase, PickupHelperMixin):
             ),
         )
 
+    def test_stream_voicemail_activated(self):
+        self.add_voicemail()
+        self.add_voicemail(commented=1)
+
+        result = asterisk_conf_dao.stream_voicemail_activated()
+
+        expected = asterisk_conf_dao.find_voicemail_activated()
+        assert_that(list(result), contains_inanyorder(*expected))
+
     def test_find_voicemail_general_settings(self):
         vms1 = self.add_voicemail_general_settings()
         vms2 = self.add_voicemail_general_settings()
@@ -1967,6 +2082,46 @@ class TestFindSipUserSettings(BaseFindSIPSettings, PickupHelperMixin):
             ),
         )
 
+    def test_stream_sip_user_settings(self):
+        user = self.add_user()
+        for templates in (
+            [self.general_config_template],
+            [self.webrtc_config_template],
+        ):
+            endpoint = self.add_endpoint_sip(templates=templates, template=False)
+            line = self.add_line(endpoint_sip_uuid=endpoint.uuid)
+            self.add_user_line(user_id=user.id, line_id=line.id)
+        self.add_endpoint_sip(template=False)
+
+        result = asterisk_conf_dao.stream_sip_user_settings()
+
+        expected = asterisk_conf_dao.find_sip_user_settings()
+        assert_that(list(result), contains_inanyorder(*expected))
+
+    def test_that_template_changes_are_resolved_again(self):
+        template = self.add_endpoint_sip(
+            template=True, endpoint_section_options=[['webrtc', 'yes']]
+        )
+        endpoint = self.add_endpoint_sip(templates=[template], template=False)
+        self.add_line(endpoint_sip_uuid=endpoint.uuid)
+        asterisk_conf_dao.find_sip_user_settings()
+
+        template.endpoint_section_options = [['webrtc', 'no']]
+        self.session.flush()
+
+        result = asterisk_conf_dao.find_sip_user_settings()
+        assert_that(
+            result,
+            contains_exactly(
+                has_entries(
+                    endpoint_section_options=all_of(
+                        has_items(contains_exactly('webrtc', 'no')),
+                        not_(has_items(contains_exactly('webrtc', 'yes'))),
+                    )
+                )
+            ),
+        )
+
 
 class TestFindSipTrunkSettings(BaseFindSIPSettings):
     def setUp(self):
@@ -2350,3 +2505,205 @@ class TestFindSipTrunkSettings(BaseFindSIPSettings):
                 ),
             ),
         )
+
+
+class TestFindPJSIPSettings(BaseFindSIPSettings, PickupHelperMixin):
+    def add_sip_line(self):
+        endpoint = self.add_endpoint_sip(
+            template=False,
+            templates=[self.general_config_template],
+            auth_section_options=[['username', self._random_name()]],
+        )
+        voicemail = self.add_voicemail()
+        user = self.add_user(voicemailid=voicemail.uniqueid)
+        line = self.add_line(endpoint_sip_uuid=endpoint.uuid)
+        extension = self.add_extension()
+        self.add_user_line(user_id=user.id, line_id=line.id)
+        self.add_line_extension(line_id=line.id, extension_id=extension.id)
+        return user, line
+
+    def test_that_endpoints_are_the_same_as_the_individual_finders(self):
+        user, _ = self.add_sip_line()
+        self.add_pickup_member_user(self.add_pickup(), user.id)
+        trunk_endpoint = self.add_endpoint_sip(
+            template=False,
+            templates=[self.general_config_template],
+            registration_section_options=[['client_uri', 'sip:foo@example.com']],
+        )
+        self.add_trunk(
+            endpoint_sip_uuid=trunk_endpoint.uuid, context=self.add_context().name
+        )
+        meeting_endpoint = self.add_endpoint_sip(
+            template=False, templates=[self.general_config_template]
+        )
+        self.add_meeting(guest_endpoint_sip_uuid=meeting_endpoint.uuid)
+
+        result = asterisk_conf_dao.find_pjsip_settings()
+
+        assert_that(
+            result,
+            has_entries(
+                lines=equal_to(asterisk_conf_dao.find_sip_user_settings()),
+                trunks=equal_to(asterisk_conf_dao.find_sip_trunk_settings()),
+                meeting_guests=equal_to(
+                    asterisk_conf_dao.find_sip_meeting_guests_settings()
+                ),
+                pickup_members=equal_to(asterisk_conf_dao.find_pickup_members('sip')),
+            ),
+        )
+
+    def test_that_templates_and_transports_are_included(self):
+        transport = self.add_transport(options=[['protocol', 'udp']])
+
+        result = asterisk_conf_dao.find_pjsip_settings()
+
+        assert_that(
+            result,
+            has_entries(
+                templates=contains_exactly(
+                    has_entries(
+                        uuid=self.general_config_template.uuid,
+                        label='General config',
+                        endpoint_section_options=has_items(
+                            contains_exactly('callerid', 'wazo'),
+                        ),
+                    ),
+                ),
+                transports=has_items(
+                    has_entries(
+                        uuid=transport.uuid,
+                        name=transport.name,
+                        options=contains_exactly(contains_exactly('protocol', 'udp')),
+                    ),
+                ),
+            ),
+        )
+
+    def test_that_the_number_of_queries_does_not_grow_with_the_endpoints(self):
+        self.add_sip_line()
+        with self.recorded_statements() as statements:
+            asterisk_conf_dao.find_pjsip_settings()
+        expected = len(statements)
+
+        for _ in range(10):
+            self.add_sip_line()
+        with self.recorded_statements() as statements:
+            result = asterisk_conf_dao.find_pjsip_settings()
+
+        assert_that(result['lines'], has_length(11))
+        assert_that(statements, has_length(expected))
+
+
+@requires_benchmark
+class TestFindPJSIPSettingsBenchmark(BaseFindSIPSettings):
+    def setUp(self):
+        super().setUp()
+        self.size = benchmark_size(5000)
+        context = self.add_context()
+        endpoint_uuids = [self._generate_uuid() for _ in range(self.size)]
+        self.session.execute(
+            EndpointSIP.__table__.insert(),
+            [
+                {
+                    'uuid': uuid,
+                    'name': f'endpoint-{uuid}',
+                    'tenant_uuid': self.default_tenant.uuid,
+                    'template': False,
+                }
+                for uuid in endpoint_uuids
+            ],
+        )
+        self.session.execute(
+            EndpointSIPTemplate.__table__.insert(),
+            [
+                {
+                    'child_uuid': uuid,
+                    'parent_uuid': self.general_config_template.uuid,
+                    'priority': 0,
+                }
+                for uuid in endpoint_uuids
+            ],
+        )
+        sections = [
+            (self._generate_uuid(), type_, uuid)
+            for uuid in endpoint_uuids
+            for type_ in ('aor', 'auth', 'endpoint')
+        ]
+        self.session.execute(
+            EndpointSIPSection.__table__.insert(),
+            [
+                {'uuid': uuid, 'type': type_, 'endpoint_sip_uuid': endpoint_uuid}
+                for uuid, type_, endpoint_uuid in sections
+            ],
+        )
+        self.session.execute(
+            EndpointSIPSectionOption.__table__.insert(),
+            [
+                {
+                    'key': key,
+                    'value': self._random_name(),
+                    'endpoint_sip_section_uuid': uuid,
+                }
+                for uuid, type_, _ in sections
+                for key in _BENCHMARK_OPTIONS[type_]
+            ],
+        )
+        self.session.execute(
+            LineFeatures.__table__.insert(),
+            [
+                {
+                    'name': f'line-{uuid}',
+                    'context': context.name,
+                    'provisioningid': 123456,
+                    'endpoint_sip_uuid': uuid,
+                }
+                for uuid in endpoint_uuids
+            ],
+        )
+
+    def test_find_pjsip_settings(self):
+        with self.recorded_statements() as finders_statements:
+            finders = measure(_find_with_finders)
+        with self.recorded_statements() as bulk_statements:
+            bulk = measure(asterisk_conf_dao.find_pjsip_settings)
+
+        report(
+            f'pjsip settings, {self.size} lines',
+            finders=f'{finders}, {len(finders_statements) // 2} queries',
+            find_pjsip_settings=f'{bulk}, {len(bulk_statements) // 2} queries',
+        )
+        assert_that(
+            _comparable(bulk.result['lines']),
+            equal_to(_comparable(finders.result['lines'])),
+        )
+
+
+_BENCHMARK_OPTIONS = {
+    'aor': ('mailboxes', 'max_contacts'),
+    'auth': ('username', 'password'),
+    'endpoint': ('callerid', 'set_var'),
+}
+
+
+def _comparable(endpoints):
+    # Options of a section are not ordered by either implementation
+    return sorted(
+        (
+            {
+                key: sorted(map(tuple, value)) if key.endswith('_options') else value
+                for key, value in endpoint.items()
+            }
+            for endpoint in endpoints
+        ),
+        key=itemgetter('uuid'),
+    )
+
+
+def _find_with_finders():
+    # Rendering of pjsip.conf with the individual finders, used as a reference
+    return {
+        'lines': asterisk_conf_dao.find_sip_user_settings(),
+        'trunks': asterisk_conf_dao.find_sip_trunk_settings(),
+        'meeting_guests': asterisk_conf_dao.find_sip_meeting_guests_settings(),
+        'pickup_members': asterisk_conf_dao.find_pickup_members('sip'),
+    }
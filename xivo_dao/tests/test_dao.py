@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -11,6 +11,7 @@ import unittest
 import string
 import uuid
 
+from contextlib import contextmanager
 from sqlalchemy.engine import create_engine
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
@@ -1136,3 +1137,21 @@ class DAOTestCase(unittest.TestCase, ItemInserter):
         self.session.close()
         self.session.remove()
         self.trans.rollback()
+
+    @contextmanager
+    def recorded_statements(self):
+        '''
+        Records the SQL statements executed on the test connection in the block
+        '''
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.connection, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(
+                self.connection, 'before_cursor_execute', before_cursor_execute
+            )
@@ -0,0 +1,21 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from hamcrest import assert_that, equal_to
+
+from xivo_dao import endpoint_sip_options_dao
+from xivo_dao.alchemy.endpoint_sip_options import EndpointSIPOptions
+from xivo_dao.tests.test_dao import DAOTestCase
+
+
+class TestBackfill(DAOTestCase):
+    def test_backfill(self):
+        template = self.add_endpoint_sip(endpoint_section_options=[('key', 'value')])
+        sip = self.add_endpoint_sip(templates=[template])
+        self.session.query(EndpointSIPOptions).delete()
+
+        endpoint_sip_options_dao.backfill()
+
+        self.session.expire(sip)
+        assert_that(sip.get_option_value('key'), equal_to('value'))
+        assert_that(self.session.query(EndpointSIPOptions).count(), equal_to(2))
@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import random
@@ -11,6 +11,12 @@ from xivo_dao import queue_log_dao
 from xivo_dao.alchemy.stat_agent import StatAgent
 from xivo_dao.alchemy.queue_log import QueueLog
 from xivo_dao.helpers.db_utils import flush_session
+from xivo_dao.tests.benchmark import (
+    benchmark_size,
+    measure,
+    report,
+    requires_benchmark,
+)
 from xivo_dao.tests.test_dao import DAOTestCase
 
 ONE_HOUR = timedelta(hours=1)
@@ -173,6 +179,63 @@ class TestQueueLogDAO(DAOTestCase):
 
         assert result == expected
 
+    def test_get_wrapup_time_spanning_many_periods(self):
+        _, agent_id = self._insert_agent('Agent/1')
+        start = datetime(2012, 10, 1, 6, tzinfo=UTC)
+        end = datetime(2012, 10, 1, 7, 59, 59, 999999, tzinfo=UTC)
+        quarter_hour = timedelta(minutes=15)
+        queue_log_data = '''\
+| time                            | callid | queuename | agent   | event       | data1 | data2 | data3 | data4 | data5 |
+| 2012-10-01 05:59:00.000000+0000 | NONE   | NONE      | Agent/1 | WRAPUPSTART |  1800 |       |       |       |       |
+| 2012-10-01 07:40:00.000000+0000 | NONE   | NONE      | Agent/1 | WRAPUPSTART |  3600 |       |       |       |       |
+'''
+        self._insert_queue_log_data(queue_log_data)
+
+        result = queue_log_dao.get_wrapup_times(self.session, start, end, quarter_hour)
+
+        expected = {
+            datetime(2012, 10, 1, 6, tzinfo=UTC): {
+                agent_id: {'wrapup_time': timedelta(minutes=15)},
+            },
+            datetime(2012, 10, 1, 6, 15, tzinfo=UTC): {
+                agent_id: {'wrapup_time': timedelta(minutes=14)},
+            },
+            datetime(2012, 10, 1, 7, 30, tzinfo=UTC): {
+                agent_id: {'wrapup_time': timedelta(minutes=5)},
+            },
+            datetime(2012, 10, 1, 7, 45, tzinfo=UTC): {
+                agent_id: {'wrapup_time': timedelta(minutes=15)},
+            },
+        }
+
+        assert result == expected
+
+    def test_get_wrapup_time_on_period_boundaries(self):
+        _, agent_id_1 = self._insert_agent('Agent/1')
+        _, agent_id_2 = self._insert_agent('Agent/2')
+        start = datetime(2012, 10, 1, 6, tzinfo=UTC)
+        end = datetime(2012, 10, 1, 7, 59, 59, 999999, tzinfo=UTC)
+        queue_log_data = '''\
+| time                            | callid | queuename | agent   | event       | data1 | data2 | data3 | data4 | data5 |
+| 2012-10-01 06:59:30.000000+0000 | NONE   | NONE      | Agent/1 | WRAPUPSTART |    30 |       |       |       |       |
+| 2012-10-01 07:00:00.000000+0000 | NONE   | NONE      | Agent/2 | WRAPUPSTART |    30 |       |       |       |       |
+'''
+        self._insert_queue_log_data(queue_log_data)
+
+        result = queue_log_dao.get_wrapup_times(self.session, start, end, ONE_HOUR)
+
+        # a wrapup starting on a boundary belongs to the period starting there
+        expected = {
+            datetime(2012, 10, 1, 6, tzinfo=UTC): {
+                agent_id_1: {'wrapup_time': timedelta(seconds=30)},
+            },
+            datetime(2012, 10, 1, 7, tzinfo=UTC): {
+                agent_id_2: {'wrapup_time': timedelta(seconds=30)},
+            },
+        }
+
+        assert result == expected
+
     def test_get_first_time(self):
         self.assertRaises(LookupError, queue_log_dao.get_first_time, self.session)
 
@@ -760,3 +823,109 @@ class TestQueueLogDAO(DAOTestCase):
 
     def _strip_content_list(self, lines):
         return [line.strip() for line in lines]
+
+
+@requires_benchmark
+class TestGetWrapupTimesBenchmark(DAOTestCase):
+    def setUp(self):
+        super().setUp()
+        self.size = benchmark_size(20000)
+        self.start = datetime(2012, 10, 1, tzinfo=UTC)
+        self.end = datetime(2012, 10, 7, 23, 59, 59, 999999, tzinfo=UTC)
+        agents = [f'Agent/{number}' for number in range(100)]
+        self.session.execute(
+            StatAgent.__table__.insert(),
+            [
+                {'name': name, 'tenant_uuid': self.default_tenant.uuid}
+                for name in agents
+            ],
+        )
+
+        # Wrapups shorter than a period, never starting or ending on the start
+        # of a period, so that both implementations give the same result
+        generator = random.Random(42)
+        seconds = (self.end - self.start).total_seconds()
+        rows = []
+        for _ in range(self.size):
+            time = self.start + timedelta(seconds=generator.uniform(0, seconds))
+            if time.microsecond == 0:
+                time += ONE_MICROSECOND
+            rows.append(
+                {
+                    'time': time,
+                    'callid': 'NONE',
+                    'queuename': 'NONE',
+                    'agent': generator.choice(agents),
+                    'event': 'WRAPUPSTART',
+                    'data1': str(generator.randint(1, 600)),
+                }
+            )
+        self.session.execute(QueueLog.__table__.insert(), rows)
+
+    def test_get_wrapup_times(self):
+        interval = timedelta(minutes=15)
+        args = (self.session, self.start, self.end, interval)
+        linear = measure(_linear_get_wrapup_times, *args)
+        arithmetic = measure(queue_log_dao.get_wrapup_times, *args)
+
+        report(
+            f'get_wrapup_times, {self.size} wrapups over a week of quarter hours',
+            linear_lookup=linear,
+            arithmetic_lookup=arithmetic,
+        )
+        assert arithmetic.result == linear.result
+
+
+def _linear_get_wrapup_times(session, start, end, interval):
+    # Implementation scanning the list of periods for each wrapup, used as a
+    # reference for the benchmark
+    def find_including_period(periods, t):
+        match = None
+        for period in periods:
+            if t > period:
+                match = period
+        return match
+
+    rows = session.execute(
+        '''\
+SELECT
+    queue_log.time AS start,
+    (queue_log.time + (queue_log.data1 || ' seconds')::INTERVAL) AS end,
+    stat_agent.id AS agent_id
+FROM
+    queue_log
+INNER JOIN
+    stat_agent ON stat_agent.name = queue_log.agent
+WHERE
+  queue_log.event = 'WRAPUPSTART'
+AND
+  queue_log.time BETWEEN :start AND :end
+''',
+        {'start': start - timedelta(minutes=2), 'end': end},
+    )
+
+    periods = []
+    period = start
+    while period <= end:
+        periods.append(period)
+        period += interval
+
+    results = {}
+    for wstart, wend, agent_id in rows:
+        starting_period = find_including_period(periods, wstart)
+        ending_period = find_including_period(periods, wend)
+        for period in (starting_period, ending_period):
+            if period is not None:
+                results.setdefault(period, {}).setdefault(
+                    agent_id, {'wrapup_time': timedelta(seconds=0)}
+                )
+
+        if starting_period is not None:
+            wend_in_start = min(wend, starting_period + interval)
+            times = results[starting_period][agent_id]
+            times['wrapup_time'] += wend_in_start - wstart
+
+        if ending_period != starting_period:
+            results[ending_period][agent_id]['wrapup_time'] += wend - ending_period
+
+    return results
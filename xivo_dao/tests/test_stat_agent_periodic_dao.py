@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from datetime import datetime as dt
@@ -6,10 +6,18 @@ from datetime import timedelta
 from sqlalchemy import func
 from pytz import UTC
 
+from hamcrest import assert_that, contains_exactly, has_properties
+
 from xivo_dao import stat_agent_periodic_dao
 from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
 from xivo_dao.alchemy.stat_agent import StatAgent
 from xivo_dao.helpers.db_utils import flush_session
+from xivo_dao.tests.benchmark import (
+    benchmark_size,
+    measure,
+    report,
+    requires_benchmark,
+)
 from xivo_dao.tests.test_dao import DAOTestCase
 
 
@@ -77,6 +85,49 @@ class TestStatAgentPeriodicDAO(DAOTestCase):
         except LookupError:
             self.fail('Should have found a row')
 
+    def test_insert_many(self):
+        _, agent_id_1 = self._insert_agent_to_stat_agent()
+        _, agent_id_2 = self._insert_agent_to_stat_agent()
+        rows = [
+            (
+                dt(2012, 1, 1, 1, tzinfo=UTC),
+                ONE_HOUR,
+                ONE_HOUR,
+                timedelta(0),
+                agent_id_1,
+            ),
+            (
+                dt(2012, 1, 1, 2, tzinfo=UTC),
+                timedelta(minutes=50),
+                timedelta(minutes=13),
+                timedelta(seconds=30, microseconds=500),
+                agent_id_2,
+            ),
+        ]
+
+        stat_agent_periodic_dao.insert_many(self.session, iter(rows))
+
+        result = self.session.query(StatAgentPeriodic).order_by(StatAgentPeriodic.time)
+        assert_that(
+            result.all(),
+            contains_exactly(
+                has_properties(
+                    time=dt(2012, 1, 1, 1, tzinfo=UTC),
+                    login_time=ONE_HOUR,
+                    pause_time=ONE_HOUR,
+                    wrapup_time=timedelta(0),
+                    stat_agent_id=agent_id_1,
+                ),
+                has_properties(
+                    time=dt(2012, 1, 1, 2, tzinfo=UTC),
+                    login_time=timedelta(minutes=50),
+                    pause_time=timedelta(minutes=13),
+                    wrapup_time=timedelta(seconds=30, microseconds=500),
+                    stat_agent_id=agent_id_2,
+                ),
+            ),
+        )
+
     def test_clean_table(self):
         _, agent_id = self._insert_agent_to_stat_agent()
         stats = {
@@ -128,3 +179,63 @@ class TestStatAgentPeriodicDAO(DAOTestCase):
 
         assert res.count() == 1
         assert res[0].time == dt(2012, 1, 1, tzinfo=UTC)
+
+
+@requires_benchmark
+class TestInsertBenchmark(DAOTestCase):
+    def setUp(self):
+        super().setUp()
+        self.size = benchmark_size(1000000)
+        self.session.execute(
+            StatAgent.__table__.insert(),
+            [
+                {'name': f'Agent/{number}', 'tenant_uuid': self.default_tenant.uuid}
+                for number in range(1000)
+            ],
+        )
+        agent_ids = [id_ for id_, in self.session.query(StatAgent.id)]
+        start = dt(2012, 1, 1, tzinfo=UTC)
+        self.stats = {}
+        for index in range(self.size // len(agent_ids)):
+            self.stats[start + index * ONE_HOUR] = {
+                agent_id: {
+                    'login_time': ONE_HOUR,
+                    'pause_time': timedelta(minutes=13),
+                    'wrapup_time': timedelta(seconds=30),
+                }
+                for agent_id in agent_ids
+            }
+
+    def test_insert(self):
+        orm = measure(self._insert_stats)
+        bulk = measure(self._insert_many)
+
+        report(
+            f'stat_agent_periodic, {self.size} rows',
+            orm_objects=orm,
+            copy=bulk,
+        )
+
+    def _insert_stats(self):
+        for period_start, period_stats in self.stats.items():
+            stat_agent_periodic_dao.insert_stats(
+                self.session, period_stats, period_start
+            )
+        self.session.flush()
+        self.session.expunge_all()
+
+    def _insert_many(self):
+        stat_agent_periodic_dao.insert_many(
+            self.session,
+            (
+                (
+                    period_start,
+                    times['login_time'],
+                    times['pause_time'],
+                    times['wrapup_time'],
+                    agent_id,
+                )
+                for period_start, period_stats in self.stats.items()
+                for agent_id, times in period_stats.items()
+            ),
+        )
@@ -1,18 +1,22 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from datetime import datetime as dt
 from datetime import timedelta
 from pytz import UTC
+from unittest.mock import Mock, patch
 
 from hamcrest import assert_that
 from hamcrest import contains_exactly
+from hamcrest import has_entries
+from hamcrest import has_properties
 from sqlalchemy import func
 
 from xivo_dao import stat_call_on_queue_dao
 from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
 from xivo_dao.alchemy.stat_queue import StatQueue
 from xivo_dao.alchemy.stat_agent import StatAgent
+from xivo_dao.helpers.instrumentation import Instrumentation
 from xivo_dao.tests.test_dao import DAOTestCase
 
 
@@ -45,6 +49,66 @@ class TestStatCallOnQueueDAO(DAOTestCase):
         stat_call_on_queue_dao.add_full_call(self.session, 'callid', t1, q1)
         stat_call_on_queue_dao.add_full_call(self.session, 'callid', t2, q2)
 
+    def test_insert_many(self):
+        _, queue_id = self._insert_queue_to_stat_queue()
+        _, agent_id = self._insert_agent_to_stat_agent()
+        t1 = dt(2012, 1, 1, 1, 1, 1, tzinfo=UTC)
+        t2 = dt(2012, 1, 1, 1, 1, 2, 500, tzinfo=UTC)
+        rows = [
+            ('call\t1', t1, 0, 40, 5, 'answered', queue_id, agent_id),
+            ('call\\2', t2, 3, 0, 12, 'abandoned', queue_id, None),
+        ]
+
+        stat_call_on_queue_dao.insert_many(self.session, rows)
+
+        result = self.session.query(StatCallOnQueue).order_by(StatCallOnQueue.time)
+        assert_that(
+            result.all(),
+            contains_exactly(
+                has_properties(
+                    callid='call\t1',
+                    time=t1,
+                    ringtime=0,
+                    talktime=40,
+                    waittime=5,
+                    status='answered',
+                    stat_queue_id=queue_id,
+                    stat_agent_id=agent_id,
+                ),
+                has_properties(
+                    callid='call\\2',
+                    time=t2,
+                    ringtime=3,
+                    waittime=12,
+                    status='abandoned',
+                    stat_agent_id=None,
+                ),
+            ),
+        )
+
+    def test_insert_many_marks_the_session_and_is_instrumented(self):
+        _, queue_id = self._insert_queue_to_stat_queue()
+        t1 = dt(2012, 1, 1, 1, 1, 1, tzinfo=UTC)
+        rows = [
+            ('call1', t1, 0, 40, 5, 'answered', queue_id, None),
+            ('call2', t1, 3, 0, 12, 'abandoned', queue_id, None),
+        ]
+        self.session.info.pop('has_writes', None)
+        instrumentation = Instrumentation()
+        sink = Mock()
+
+        with patch('xivo_dao.helpers.db_utils.dao_instrumentation', instrumentation):
+            instrumentation.enable(sinks=[sink])
+            try:
+                with instrumentation.record('insert_many'):
+                    stat_call_on_queue_dao.insert_many(self.session, rows)
+            finally:
+                instrumentation.disable()
+
+        assert_that(self.session.info, has_entries(has_writes=True))
+        (stats,), _ = sink.record.call_args
+        assert_that(stats, has_properties(statements=1, rows=2))
+
     def test_add_full_call(self):
         timestamp = dt(2012, 1, 2, 0, 0, 0, tzinfo=UTC)
         queue_name, _ = self._insert_queue_to_stat_queue()
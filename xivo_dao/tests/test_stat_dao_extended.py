@@ -1,22 +1,35 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 from typing import Any, Iterator
 import itertools
 import pathlib
-from datetime import datetime as dt
+from datetime import datetime as dt, timedelta
 from pytz import UTC
 
-from xivo_dao import stat_dao
+
+from xivo_dao import queue_log_dao, stat_dao
 from xivo_dao.alchemy.queue_log import QueueLog
 from xivo_dao.alchemy.stat_agent import StatAgent
+from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
 from xivo_dao.alchemy.stat_queue import StatQueue
 from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
+from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
 from xivo_dao.helpers.db_utils import flush_session
 from xivo_dao.tests.test_dao import DAOTestCase
 
-from hamcrest import assert_that, equal_to
+from hamcrest import (
+    all_of,
+    assert_that,
+    contains_exactly,
+    contains_inanyorder,
+    contains_string,
+    equal_to,
+    has_entries,
+    has_properties,
+    not_,
+)
 
 
 def parse_fields(line):
@@ -45,6 +58,67 @@ def group_by(iterable, group_key):
     )
 
 
+# get_pause_intervals_in_range before the pauses were paired in a single scan,
+# to check that the intervals did not change
+CORRELATED_PAUSE_QUERY = '''\
+SELECT stat_agent.id AS agent,
+       MIN(pauseall) AS pauseall,
+       unpauseall
+  FROM (
+    SELECT agent, time AS pauseall,
+      (
+        SELECT time
+        FROM queue_log
+        WHERE event = 'UNPAUSEALL' AND
+          agent = pause_all.agent AND
+          time > pause_all.time
+        ORDER BY time ASC limit 1
+      ) AS unpauseall
+    FROM queue_log AS pause_all
+    WHERE event = 'PAUSEALL'
+    AND time >= :start
+    ORDER BY agent, time DESC
+  ) AS pauseall, stat_agent
+  WHERE stat_agent.name = agent
+  GROUP BY stat_agent.id, unpauseall
+'''
+
+PAUSE_FIXTURES = [
+    '''\
+| time                          | callid | queuename | agent   | event      |
+| 2012-07-21 09:59:09.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-21 10:54:09.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+| 2012-07-21 23:59:19.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-22 02:02:19.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+''',
+    '''\
+| time                          | callid | queuename | agent   | event      |
+| 2012-07-21 09:54:09.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-21 09:59:09.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-21 10:54:09.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+| 2012-07-21 23:59:19.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-22 02:02:19.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+''',
+    '''\
+| time                          | callid | queuename | agent   | event      |
+| 2012-06-30 23:00:00.000000+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-01 00:00:00.000000+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-01 00:10:00.000000+00 | NONE   | NONE      | Agent/2 | UNPAUSEALL |
+| 2012-07-01 00:20:00.000000+00 | NONE   | NONE      | Agent/2 | PAUSEALL   |
+| 2012-07-01 00:30:00.000000+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+| 2012-07-01 00:30:00.000000+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-01 00:40:00.000000+00 | NONE   | NONE      | Agent/2 | UNPAUSEALL |
+| 2012-07-01 00:50:00.000000+00 | NONE   | NONE      | Agent/2 | UNPAUSEALL |
+| 2012-07-01 01:00:00.000000+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+| 2012-07-02 08:00:00.000000+00 | NONE   | NONE      | Agent/3 | PAUSEALL   |
+| 2012-07-02 09:00:00.000000+00 | NONE   | NONE      | Agent/3 | UNPAUSEALL |
+| 2012-07-31 23:00:00.000000+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-31 23:30:00.000000+00 | NONE   | NONE      | Agent/2 | PAUSEALL   |
+| 2012-08-01 00:30:00.000000+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+''',
+]
+
+
 class TestStatDAO(DAOTestCase):
     @classmethod
     def setUpClass(cls):
@@ -369,6 +443,366 @@ class TestStatDAO(DAOTestCase):
 
         assert result == expected
 
+    def test_get_pause_intervals_in_range_same_as_correlated_query(self):
+        self._insert_agent('Agent/1')
+        self._insert_agent('Agent/2')
+        start = dt(2012, 7, 1, tzinfo=UTC)
+        end = dt(2012, 7, 31, 23, 59, 59, 999999, tzinfo=UTC)
+
+        for index, queue_log_data in enumerate(PAUSE_FIXTURES):
+            with self.subTest(fixture=index):
+                self.session.query(QueueLog).delete()
+                self._insert_queue_log_data(queue_log_data)
+
+                rows = self.session.execute(
+                    CORRELATED_PAUSE_QUERY, {'start': start, 'end': end}
+                )
+                expected = {}
+                for agent_id, pauseall, unpauseall in rows:
+                    expected.setdefault(agent_id, []).append((pauseall, unpauseall))
+
+                result = stat_dao.get_pause_intervals_in_range(self.session, start, end)
+
+                assert_that(
+                    {agent: sorted(pauses) for agent, pauses in result.items()},
+                    equal_to(
+                        {agent: sorted(pauses) for agent, pauses in expected.items()}
+                    ),
+                )
+
+    def test_get_pause_intervals_in_range_ignores_pauses_after_end(self):
+        _, agent_id_1 = self._insert_agent('Agent/1')
+        start = dt(2012, 7, 1, tzinfo=UTC)
+        end = dt(2012, 7, 31, 23, 59, 59, 999999, tzinfo=UTC)
+
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event      |
+| 2012-07-21 09:59:09.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-07-21 10:54:09.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+| 2012-08-01 09:59:09.999999+00 | NONE   | NONE      | Agent/1 | PAUSEALL   |
+| 2012-08-01 10:54:09.999999+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL |
+'''
+
+        self._insert_queue_log_data(queue_log_data)
+
+        result = stat_dao.get_pause_intervals_in_range(self.session, start, end)
+
+        expected = {
+            agent_id_1: [
+                (
+                    dt(2012, 7, 21, 9, 59, 9, 999999, tzinfo=UTC),
+                    dt(2012, 7, 21, 10, 54, 9, 999999, tzinfo=UTC),
+                ),
+            ]
+        }
+
+        assert result == expected
+
+    def test_queue_log_aggregator_matches_range_functions(self):
+        self._insert_aggregated_queue_logs()
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+        interval = timedelta(hours=1)
+
+        aggregator = stat_dao.QueueLogAggregator(
+            self.session, start, end, interval
+        ).run()
+
+        assert_that(
+            aggregator.login_intervals(),
+            equal_to(stat_dao.get_login_intervals_in_range(self.session, start, end)),
+        )
+        assert_that(
+            aggregator.pause_intervals(),
+            equal_to(stat_dao.get_pause_intervals_in_range(self.session, start, end)),
+        )
+        assert_that(
+            aggregator.wrapup_times(),
+            equal_to(
+                queue_log_dao.get_wrapup_times(self.session, start, end, interval)
+            ),
+        )
+
+        stat_dao.fill_answered_calls(self.session, start, end)
+        stat_dao.fill_simple_calls(self.session, start, end)
+        stat_dao.fill_leaveempty_calls(self.session, start, end)
+        expected = [
+            (
+                call.callid,
+                call.time,
+                call.talktime,
+                call.waittime,
+                call.stat_queue_id,
+                call.stat_agent_id,
+                call.status,
+            )
+            for call in self.session.query(StatCallOnQueue)
+        ]
+        queue_ids = dict(self.session.query(StatQueue.name, StatQueue.id))
+        for call in itertools.chain(
+            queue_log_dao.get_queue_abandoned_call(self.session, start, end),
+            queue_log_dao.get_queue_timeout_call(self.session, start, end),
+        ):
+            expected.append(
+                (
+                    call['callid'],
+                    call['time'],
+                    call['talktime'],
+                    call['waittime'],
+                    queue_ids[call['queue_name']],
+                    None,
+                    call['event'],
+                )
+            )
+
+        calls = [tuple(call.values()) for call in aggregator.calls()]
+        assert_that(calls, contains_inanyorder(*expected))
+
+    def test_queue_log_aggregator_logins_match_after_the_range(self):
+        self.add_context(name='default')
+        agent_ids = dict(
+            self._insert_agent(name) for name in ('Agent/1', 'Agent/2', 'Agent/3')
+        )
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event               | data1        | data2 |
+| 2012-07-20 22:00:00.000000+00 | NONE   | NONE      | Agent/1 | AGENTCALLBACKLOGIN  | 1001@default |       |
+| 2012-07-21 10:00:00.000000+00 | NONE   | NONE      | Agent/2 | AGENTCALLBACKLOGIN  | 1002@default |       |
+| 2012-07-21 12:00:00.000000+00 | NONE   | NONE      | Agent/3 | AGENTCALLBACKLOGIN  | 1003@default |       |
+| 2012-07-22 01:00:00.000000+00 | NONE   | NONE      | Agent/2 | AGENTCALLBACKLOGOFF | 1002@default | 54000 |
+| 2012-07-22 01:00:00.000000+00 | NONE   | NONE      | Agent/3 | AGENTCALLBACKLOGOFF | 1003@default | 46800 |
+| 2012-07-22 02:00:00.000000+00 | NONE   | NONE      | Agent/3 | AGENTCALLBACKLOGIN  | 1003@default |       |
+'''
+        self._insert_queue_log_data(queue_log_data)
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        aggregator = stat_dao.QueueLogAggregator(
+            self.session, start, end, timedelta(hours=1)
+        ).run()
+
+        # the logouts after the range end the ongoing logins of Agent/2, and
+        # the login of Agent/3 after the range drops the agent
+        assert_that(
+            aggregator.login_intervals(),
+            equal_to({agent_ids['Agent/1']: [(start, end)]}),
+        )
+        assert_that(
+            aggregator.login_intervals(),
+            equal_to(stat_dao.get_login_intervals_in_range(self.session, start, end)),
+        )
+
+    def test_queue_log_aggregator_keeps_answered_calls_with_invalid_durations(self):
+        queue_id = dict([self._insert_queue('q1')])['q1']
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event            | data1 | data2 | data3 | data4 |
+| 2012-07-21 10:00:00.000000+00 | c1     | q1        | NONE    | ENTERQUEUE       |       | 1001  | 1     |       |
+| 2012-07-21 10:05:00.000000+00 | c1     | q1        | Agent/1 | ATTENDEDTRANSFER | OTHER |       |       |       |
+| 2012-07-21 11:05:00.000000+00 | c2     | q1        | Agent/1 | ATTENDEDTRANSFER | OTHER |       |       |       |
+'''
+        self._insert_queue_log_data(queue_log_data)
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        aggregator = stat_dao.QueueLogAggregator(
+            self.session, start, end, timedelta(hours=1)
+        ).run()
+
+        # c2 has no ENTERQUEUE and no durations to find when it started
+        assert_that(
+            aggregator.calls(),
+            contains_exactly(
+                has_entries(
+                    callid='c1',
+                    time=dt(2012, 7, 21, 10, tzinfo=UTC),
+                    talktime=0,
+                    waittime=0,
+                    stat_queue_id=queue_id,
+                    status='answered',
+                )
+            ),
+        )
+
+    def test_queue_log_aggregator_answered_calls_belong_to_the_range_they_entered(
+        self,
+    ):
+        queue_id = dict([self._insert_queue('q1')])['q1']
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event          | data1 | data2 | data3 |
+| 2012-07-21 00:05:00.000000+00 | c0     | q1        | Agent/1 | COMPLETECALLER | 300   | 300   | 1     |
+| 2012-07-21 23:50:00.000000+00 | c1     | q1        | NONE    | ENTERQUEUE     |       | 1001  | 1     |
+| 2012-07-22 00:10:00.000000+00 | c1     | q1        | Agent/1 | COMPLETEAGENT  | 60    | 1140  | 1     |
+'''
+        self._insert_queue_log_data(queue_log_data)
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        aggregator = stat_dao.QueueLogAggregator(
+            self.session, start, end, timedelta(hours=1)
+        ).run()
+        stat_dao.fill_answered_calls(self.session, start, end)
+
+        # c1 ends after the range and c0 started before it: the query counts c0
+        # with the range it ended in, the aggregator counts c1 with the range it
+        # entered
+        assert_that(
+            aggregator.calls(),
+            contains_exactly(
+                has_entries(
+                    callid='c1',
+                    time=dt(2012, 7, 21, 23, 50, tzinfo=UTC),
+                    talktime=1140,
+                    waittime=60,
+                    stat_queue_id=queue_id,
+                )
+            ),
+        )
+        assert_that(
+            self.session.query(StatCallOnQueue).all(),
+            contains_exactly(
+                has_properties(callid='c0', time=dt(2012, 7, 20, 23, 55, tzinfo=UTC))
+            ),
+        )
+
+    def test_queue_log_aggregator_logins_before_the_lookback(self):
+        self.add_context(name='default')
+        agent_ids = dict(self._insert_agent(name) for name in ('Agent/1', 'Agent/2'))
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event              | data1        |
+| 2012-06-01 08:00:00.000000+00 | NONE   | NONE      | Agent/1 | AGENTCALLBACKLOGIN | 1001@default |
+| 2012-07-20 08:00:00.000000+00 | NONE   | NONE      | Agent/2 | AGENTCALLBACKLOGIN | 1002@default |
+'''
+        self._insert_queue_log_data(queue_log_data)
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        aggregator = stat_dao.QueueLogAggregator(
+            self.session, start, end, timedelta(hours=1)
+        ).run()
+
+        # get_login_intervals_in_range reads the whole queue_log and also
+        # returns the login of Agent/1, older than LOGIN_LOOKBACK
+        assert_that(
+            aggregator.login_intervals(),
+            equal_to({agent_ids['Agent/2']: [(start, end)]}),
+        )
+        assert_that(
+            stat_dao.get_login_intervals_in_range(self.session, start, end),
+            equal_to(
+                {
+                    agent_ids['Agent/1']: [(start, end)],
+                    agent_ids['Agent/2']: [(start, end)],
+                }
+            ),
+        )
+
+    def test_queue_log_aggregator_reads_the_range_once(self):
+        self._insert_aggregated_queue_logs()
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        with self.recorded_statements() as statements:
+            stat_dao.QueueLogAggregator(
+                self.session, start, end, timedelta(hours=1)
+            ).run()
+
+        queue_log_reads = [s for s in statements if 'FROM queue_log' in s]
+        # the last logins and logouts before the range, the range itself, then
+        # the end of the pause and the logouts of Agent/2 after the range
+        assert_that(
+            queue_log_reads,
+            contains_exactly(
+                contains_string('GROUP BY queue_log.agent'),
+                all_of(
+                    contains_string('queue_log.time BETWEEN'),
+                    not_(contains_string('queue_log.agent IN')),
+                ),
+                contains_string('queue_log.agent IN'),
+                contains_string('queue_log.agent IN'),
+            ),
+        )
+
+    def test_fill_periodic_stats(self):
+        agent_ids, queue_ids = self._insert_aggregated_queue_logs()
+        start = dt(2012, 7, 21, tzinfo=UTC)
+        end = dt(2012, 7, 21, 23, 59, 59, 999999, tzinfo=UTC)
+
+        stat_dao.fill_periodic_stats(self.session, start, end, timedelta(hours=1))
+
+        assert_that(self.session.query(StatCallOnQueue).count(), equal_to(8))
+        assert_that(
+            self.session.query(StatQueuePeriodic)
+            .filter(StatQueuePeriodic.time == dt(2012, 7, 21, 11, tzinfo=UTC))
+            .all(),
+            contains_exactly(
+                has_properties(
+                    stat_queue_id=queue_ids['q2'], answered=1, abandoned=0, total=1
+                )
+            ),
+        )
+        assert_that(
+            self.session.query(StatAgentPeriodic)
+            .filter(StatAgentPeriodic.time == dt(2012, 7, 21, 10, tzinfo=UTC))
+            .all(),
+            contains_inanyorder(
+                has_properties(
+                    stat_agent_id=agent_ids['Agent/1'],
+                    login_time=timedelta(hours=1),
+                    pause_time=timedelta(minutes=20),
+                    wrapup_time=timedelta(seconds=30),
+                ),
+                has_properties(
+                    stat_agent_id=agent_ids['Agent/2'],
+                    login_time=timedelta(hours=1),
+                    pause_time=timedelta(0),
+                    wrapup_time=timedelta(0),
+                ),
+            ),
+        )
+        assert_that(
+            self.session.query(StatAgentPeriodic)
+            .filter(StatAgentPeriodic.time == dt(2012, 7, 21, 12, tzinfo=UTC))
+            .filter(StatAgentPeriodic.stat_agent_id == agent_ids['Agent/2'])
+            .one(),
+            has_properties(
+                login_time=timedelta(hours=1),
+                wrapup_time=timedelta(minutes=10),
+            ),
+        )
+
+    def _insert_aggregated_queue_logs(self):
+        self.add_context(name='default')
+        agent_ids = dict(self._insert_agent(name) for name in ('Agent/1', 'Agent/2'))
+        queue_ids = dict(self._insert_queue(name) for name in ('q1', 'q2'))
+
+        queue_log_data = '''\
+| time                          | callid | queuename | agent   | event               | data1        | data2 | data3 | data4 | data5 |
+| 2012-07-20 22:00:00.000000+00 | NONE   | NONE      | Agent/2 | AGENTCALLBACKLOGIN  | 1002@default |       |       |       |       |
+| 2012-07-21 00:01:00.000000+00 | c3     | q1        | Agent/1 | COMPLETECALLER      | 20           | 30    | 1     |       |       |
+| 2012-07-21 09:00:00.000000+00 | NONE   | NONE      | Agent/1 | AGENTCALLBACKLOGIN  | 1001@default |       |       |       |       |
+| 2012-07-21 10:00:00.000000+00 | c1     | q1        | NONE    | ENTERQUEUE          |              | 1001  | 1     |       |       |
+| 2012-07-21 10:00:10.000000+00 | c1     | q1        | Agent/1 | CONNECT             | 10           | c1-1  | 1     |       |       |
+| 2012-07-21 10:05:00.000000+00 | c1     | q1        | Agent/1 | COMPLETEAGENT       | 10           | 290   | 1     |       |       |
+| 2012-07-21 10:05:01.000000+00 | c1     | q1        | Agent/1 | WRAPUPSTART         | 30           |       |       |       |       |
+| 2012-07-21 10:20:00.000000+00 | NONE   | NONE      | Agent/1 | PAUSEALL            |              |       |       |       |       |
+| 2012-07-21 10:40:00.000000+00 | NONE   | NONE      | Agent/1 | UNPAUSEALL          |              |       |       |       |       |
+| 2012-07-21 11:00:00.000000+00 | c2     | q2        | NONE    | ENTERQUEUE          |              | 1002  | 1     |       |       |
+| 2012-07-21 11:00:05.000000+00 | c2     | q2        | Agent/2 | CONNECT             | 5            | c2-1  | 1     |       |       |
+| 2012-07-21 11:10:00.000000+00 | c2     | q2        | Agent/2 | BLINDTRANSFER       | 1003         | to    | 5     | 595   | 1     |
+| 2012-07-21 11:10:01.000000+00 | c2     | q2        | Agent/2 | WRAPUPSTART         | 3599         |       |       |       |       |
+| 2012-07-21 12:00:00.000000+00 | c4     | q1        | NONE    | ENTERQUEUE          |              | 1004  | 1     |       |       |
+| 2012-07-21 12:01:00.000000+00 | c4     | q1        | NONE    | ABANDON             | 1            | 1     | 60    |       |       |
+| 2012-07-21 13:00:00.000000+00 | c5     | q2        | NONE    | ENTERQUEUE          |              | 1005  | 1     |       |       |
+| 2012-07-21 13:02:00.000000+00 | c5     | q2        | NONE    | EXITWITHTIMEOUT     | 1            | 1     | 120   |       |       |
+| 2012-07-21 14:00:00.000000+00 | c6     | q1        | NONE    | FULL                |              |       |       |       |       |
+| 2012-07-21 14:30:00.000000+00 | c7     | q2        | NONE    | CLOSED              |              |       |       |       |       |
+| 2012-07-21 15:00:00.000000+00 | c8     | q1        | NONE    | ENTERQUEUE          |              | 1008  | 1     |       |       |
+| 2012-07-21 15:00:30.000000+00 | c8     | q1        | NONE    | LEAVEEMPTY          |              |       |       |       |       |
+| 2012-07-21 16:30:00.000000+00 | NONE   | NONE      | Agent/1 | AGENTCALLBACKLOGOFF | 1001@default | 27000 | Cmd   |       |       |
+| 2012-07-21 23:30:00.000000+00 | NONE   | NONE      | Agent/2 | PAUSEALL            |              |       |       |       |       |
+'''
+        self._insert_queue_log_data(queue_log_data)
+        return agent_ids, queue_ids
+
     def _insert_queue_log_data(self, queue_log_data):
         with flush_session(self.session):
             logs = parse_table(queue_log_data)
@@ -0,0 +1,432 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from datetime import datetime as dt
+from datetime import timedelta
+
+from hamcrest import (
+    assert_that,
+    contains_exactly,
+    empty,
+    equal_to,
+    has_length,
+    has_properties,
+)
+from pytz import UTC
+
+from xivo_dao import stat_period_checkpoint_dao
+from xivo_dao.alchemy.queue_log import QueueLog
+from xivo_dao.alchemy.stat_agent import StatAgent
+from xivo_dao.alchemy.stat_agent_periodic import StatAgentPeriodic
+from xivo_dao.alchemy.stat_call_on_queue import StatCallOnQueue
+from xivo_dao.alchemy.stat_period_checkpoint import StatPeriodCheckpoint
+from xivo_dao.alchemy.stat_queue import StatQueue
+from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
+from xivo_dao.tests.test_dao import DAOTestCase
+
+ONE_HOUR = timedelta(hours=1)
+
+
+class TestStatPeriodCheckpointDAO(DAOTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = dt(2012, 7, 1, tzinfo=UTC)
+        self.end = dt(2012, 7, 1, 23, 59, 59, 999999, tzinfo=UTC)
+        queue = StatQueue(name='q1', tenant_uuid=self.default_tenant.uuid)
+        self.add_me(queue)
+        self.queue_id = queue.id
+
+    def test_find_dirty_periods_never_computed(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 10, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 2, 10, 10, tzinfo=UTC))
+
+        result = stat_period_checkpoint_dao.find_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                dt(2012, 7, 1, 8, tzinfo=UTC), dt(2012, 7, 1, 10, tzinfo=UTC)
+            ),
+        )
+
+    def test_find_dirty_periods_after_regeneration(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 10, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        result = stat_period_checkpoint_dao.find_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(result, empty())
+
+    def test_find_dirty_periods_with_inserted_and_deleted_rows(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        deleted = self._insert_full_call(dt(2012, 7, 1, 10, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 10, 20, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 12, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self._insert_full_call(dt(2012, 7, 1, 8, 20, tzinfo=UTC))
+        self.session.delete(deleted)
+        self.session.flush()
+
+        result = stat_period_checkpoint_dao.find_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                dt(2012, 7, 1, 8, tzinfo=UTC), dt(2012, 7, 1, 10, tzinfo=UTC)
+            ),
+        )
+
+    def test_find_dirty_periods_when_every_row_is_deleted(self):
+        deleted = self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self.session.delete(deleted)
+        self.session.flush()
+
+        result = stat_period_checkpoint_dao.find_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(result, contains_exactly(dt(2012, 7, 1, 8, tzinfo=UTC)))
+
+    def test_regenerate_dirty_periods(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 10, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+        clean_stats = self._get_queue_stats(dt(2012, 7, 1, 10, tzinfo=UTC))
+
+        self._insert_full_call(dt(2012, 7, 1, 8, 20, tzinfo=UTC))
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(result, contains_exactly(dt(2012, 7, 1, 8, tzinfo=UTC)))
+        assert_that(
+            self._get_queue_stats(dt(2012, 7, 1, 8, tzinfo=UTC)),
+            has_properties(stat_queue_id=self.queue_id, full=2, total=2),
+        )
+        assert_that(
+            self._get_queue_stats(dt(2012, 7, 1, 10, tzinfo=UTC)),
+            has_properties(id=clean_stats.id, full=1, total=1),
+        )
+        assert_that(
+            self.session.query(StatPeriodCheckpoint)
+            .filter(StatPeriodCheckpoint.time == dt(2012, 7, 1, 8, tzinfo=UTC))
+            .one(),
+            has_properties(queue_log_count=2),
+        )
+
+    def test_regenerate_dirty_periods_removes_stats_of_emptied_periods(self):
+        deleted = self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self.session.delete(deleted)
+        self.session.flush()
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(self.session.query(StatQueuePeriodic).count(), equal_to(0))
+        assert_that(
+            self.session.query(StatPeriodCheckpoint).all(),
+            contains_exactly(
+                has_properties(time=dt(2012, 7, 1, 8, tzinfo=UTC), queue_log_count=0)
+            ),
+        )
+        assert_that(
+            stat_period_checkpoint_dao.find_dirty_periods(
+                self.session, self.start, self.end, ONE_HOUR
+            ),
+            empty(),
+        )
+
+    def test_regenerate_dirty_periods_keeps_calls_ending_in_a_clean_period(self):
+        self._insert_answered_call(
+            dt(2012, 7, 1, 8, 50, tzinfo=UTC), dt(2012, 7, 1, 9, 10, tzinfo=UTC)
+        )
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self._insert_full_call(dt(2012, 7, 1, 8, 30, tzinfo=UTC))
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(result, contains_exactly(dt(2012, 7, 1, 8, tzinfo=UTC)))
+        assert_that(
+            self._get_queue_stats(dt(2012, 7, 1, 8, tzinfo=UTC)),
+            has_properties(answered=1, full=1, total=2),
+        )
+        assert_that(
+            self.session.query(StatCallOnQueue).filter_by(status='answered').all(),
+            contains_exactly(has_properties(time=dt(2012, 7, 1, 8, 50, tzinfo=UTC))),
+        )
+
+    def test_regenerate_dirty_periods_when_a_call_ends_in_a_later_period(self):
+        enter_time = dt(2012, 7, 1, 8, 50, tzinfo=UTC)
+        self._insert_queue_log(enter_time, 'ENTERQUEUE', callid='c1', queuename='q1')
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self._insert_queue_log(
+            dt(2012, 7, 1, 9, 10, tzinfo=UTC),
+            'COMPLETEAGENT',
+            callid='c1',
+            queuename='q1',
+            agent='Agent/1',
+            data1='300',
+            data2='900',
+        )
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                dt(2012, 7, 1, 8, tzinfo=UTC), dt(2012, 7, 1, 9, tzinfo=UTC)
+            ),
+        )
+        assert_that(
+            self._get_queue_stats(dt(2012, 7, 1, 8, tzinfo=UTC)),
+            has_properties(answered=1, total=1),
+        )
+        assert_that(
+            self.session.query(StatCallOnQueue).all(),
+            contains_exactly(has_properties(callid='c1', time=enter_time)),
+        )
+
+    def test_regenerate_dirty_periods_with_quiet_periods_during_a_login(self):
+        agent_id = self._insert_agent('Agent/1')
+        self._insert_queue_log(
+            dt(2012, 7, 1, 8, 30, tzinfo=UTC),
+            'AGENTCALLBACKLOGIN',
+            agent='Agent/1',
+            data1='1001@default',
+        )
+        self._insert_queue_log(
+            dt(2012, 7, 1, 11, 30, tzinfo=UTC),
+            'AGENTCALLBACKLOGOFF',
+            agent='Agent/1',
+            data1='1001@default',
+            data2='10800',
+        )
+
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                *(dt(2012, 7, 1, hour, tzinfo=UTC) for hour in range(8, 12))
+            ),
+        )
+        assert_that(
+            self.session.query(StatAgentPeriodic)
+            .filter(StatAgentPeriodic.stat_agent_id == agent_id)
+            .order_by(StatAgentPeriodic.time)
+            .all(),
+            contains_exactly(
+                has_properties(login_time=timedelta(minutes=30)),
+                has_properties(login_time=ONE_HOUR),
+                has_properties(login_time=ONE_HOUR),
+                has_properties(login_time=timedelta(minutes=30)),
+            ),
+        )
+
+    def test_regenerate_dirty_periods_with_a_pause_started_in_a_clean_period(self):
+        agent_id = self._insert_agent('Agent/1')
+        self._insert_queue_log(
+            dt(2012, 7, 1, 8, 50, tzinfo=UTC), 'PAUSEALL', agent='Agent/1'
+        )
+        self._insert_queue_log(
+            dt(2012, 7, 1, 9, 10, tzinfo=UTC), 'UNPAUSEALL', agent='Agent/1'
+        )
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        self._insert_full_call(dt(2012, 7, 1, 9, 30, tzinfo=UTC))
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                dt(2012, 7, 1, 8, tzinfo=UTC), dt(2012, 7, 1, 9, tzinfo=UTC)
+            ),
+        )
+        assert_that(
+            self.session.query(StatAgentPeriodic)
+            .filter(StatAgentPeriodic.stat_agent_id == agent_id)
+            .order_by(StatAgentPeriodic.time)
+            .all(),
+            contains_exactly(
+                has_properties(pause_time=timedelta(minutes=10)),
+                has_properties(pause_time=timedelta(minutes=10)),
+            ),
+        )
+
+    def test_find_dirty_periods_with_quiet_periods_during_a_login(self):
+        self._insert_agent('Agent/1')
+        self._insert_queue_log(
+            dt(2012, 7, 1, 21, 30, tzinfo=UTC),
+            'AGENTCALLBACKLOGIN',
+            agent='Agent/1',
+            data1='1001@default',
+        )
+
+        result = stat_period_checkpoint_dao.find_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        assert_that(
+            result,
+            contains_exactly(
+                *(dt(2012, 7, 1, hour, tzinfo=UTC) for hour in range(21, 24))
+            ),
+        )
+
+    def test_regenerate_dirty_periods_reads_the_agent_states_once(self):
+        self._insert_agent('Agent/1')
+        for hour, event in ((8, 'AGENTCALLBACKLOGIN'), (11, 'PAUSEALL')):
+            self._insert_queue_log(
+                dt(2012, 7, 1, hour, 30, tzinfo=UTC),
+                event,
+                agent='Agent/1',
+                data1='1001@default',
+            )
+        self._insert_full_call(dt(2012, 7, 1, 14, 10, tzinfo=UTC))
+        with self.recorded_statements() as statements:
+            stat_period_checkpoint_dao.regenerate_dirty_periods(
+                self.session, self.start, self.end, ONE_HOUR
+            )
+
+        # the last login, logoff, pause and unpause of each agent
+        agent_state_reads = [
+            statement
+            for statement in statements
+            if 'GROUP BY queue_log.agent' in statement and 'max_4' in statement
+        ]
+        assert_that(agent_state_reads, has_length(1))
+
+    def test_checkpoints_are_kept_per_interval(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        result = stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, timedelta(minutes=30)
+        )
+
+        assert_that(result, contains_exactly(dt(2012, 7, 1, 8, tzinfo=UTC)))
+        assert_that(
+            self.session.query(StatPeriodCheckpoint)
+            .order_by(StatPeriodCheckpoint.interval)
+            .all(),
+            contains_exactly(
+                has_properties(
+                    time=dt(2012, 7, 1, 8, tzinfo=UTC),
+                    interval=timedelta(minutes=30),
+                ),
+                has_properties(time=dt(2012, 7, 1, 8, tzinfo=UTC), interval=ONE_HOUR),
+            ),
+        )
+        assert_that(
+            stat_period_checkpoint_dao.find_dirty_periods(
+                self.session, self.start, self.end, ONE_HOUR
+            ),
+            empty(),
+        )
+
+    def test_remove_after(self):
+        self._insert_full_call(dt(2012, 7, 1, 8, 10, tzinfo=UTC))
+        self._insert_full_call(dt(2012, 7, 1, 10, 10, tzinfo=UTC))
+        stat_period_checkpoint_dao.regenerate_dirty_periods(
+            self.session, self.start, self.end, ONE_HOUR
+        )
+
+        stat_period_checkpoint_dao.remove_after(
+            self.session, dt(2012, 7, 1, 9, tzinfo=UTC)
+        )
+
+        assert_that(
+            self.session.query(StatPeriodCheckpoint).all(),
+            contains_exactly(has_properties(time=dt(2012, 7, 1, 8, tzinfo=UTC))),
+        )
+
+    def _insert_agent(self, name):
+        self.add_context(name='default')
+        agent = StatAgent(name=name, tenant_uuid=self.default_tenant.uuid)
+        self.add_me(agent)
+        return agent.id
+
+    def _insert_answered_call(self, enter_time, end_time):
+        callid = f'call-{enter_time.timestamp()}'
+        self._insert_queue_log(enter_time, 'ENTERQUEUE', callid=callid, queuename='q1')
+        talktime = int((end_time - enter_time).total_seconds())
+        self._insert_queue_log(
+            end_time,
+            'COMPLETECALLER',
+            callid=callid,
+            queuename='q1',
+            agent='Agent/1',
+            data1='0',
+            data2=str(talktime),
+        )
+
+    def _insert_queue_log(
+        self, time, event, callid='NONE', queuename='NONE', agent='NONE', **data
+    ):
+        queue_log = QueueLog(
+            time=time,
+            callid=callid,
+            queuename=queuename,
+            agent=agent,
+            event=event,
+            **data,
+        )
+        self.add_me(queue_log)
+        return queue_log
+
+    def _insert_full_call(self, time):
+        queue_log = QueueLog(
+            time=time,
+            callid=f'call-{time.timestamp()}',
+            queuename='q1',
+            agent='NONE',
+            event='FULL',
+        )
+        self.add_me(queue_log)
+        return queue_log
+
+    def _get_queue_stats(self, time):
+        return (
+            self.session.query(StatQueuePeriodic)
+            .filter(StatQueuePeriodic.time == time)
+            .one()
+        )
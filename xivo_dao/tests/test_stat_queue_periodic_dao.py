@@ -1,4 +1,4 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from datetime import datetime as dt
@@ -7,6 +7,8 @@ from pytz import UTC
 
 from sqlalchemy import func
 
+from hamcrest import assert_that, contains_exactly, has_properties
+
 from xivo_dao import stat_queue_periodic_dao
 from xivo_dao.alchemy.stat_queue_periodic import StatQueuePeriodic
 from xivo_dao.alchemy.stat_queue import StatQueue
@@ -67,6 +69,38 @@ class TestStatQueuePeriodicDAO(DAOTestCase):
         except LookupError:
             self.fail('Should have found a row')
 
+    def test_insert_many(self):
+        _, queue_id = self._insert_queue_to_stat_queue()
+        period_start = dt(2012, 1, 1, tzinfo=UTC)
+        rows = [
+            (period_start, queue_id, 27, 7, 4, 5, 2, 11, 22, 15, 5, 98),
+            (period_start + timedelta(hours=1), None, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1),
+        ]
+
+        stat_queue_periodic_dao.insert_many(self.session, rows)
+
+        result = self.session.query(StatQueuePeriodic).order_by(StatQueuePeriodic.time)
+        assert_that(
+            result.all(),
+            contains_exactly(
+                has_properties(
+                    time=period_start,
+                    stat_queue_id=queue_id,
+                    answered=27,
+                    abandoned=7,
+                    full=4,
+                    closed=5,
+                    joinempty=2,
+                    leaveempty=11,
+                    divert_ca_ratio=22,
+                    divert_waittime=15,
+                    timeout=5,
+                    total=98,
+                ),
+                has_properties(stat_queue_id=None, answered=1, total=1),
+            ),
+        )
+
     def test_get_most_recent_time(self):
         self.assertRaises(
             LookupError, stat_queue_periodic_dao.get_most_recent_time, self.session